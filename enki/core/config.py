@@ -248,3 +248,16 @@ class Config():
     def _migrate_to_21(self):
         if not '.*' in self._data['NegativeFileFilter']:
             self._data['NegativeFileFilter'].insert(0, '.*')
+
+    def _migrate_to_22(self):
+        self._data['SearchReplace'] = {'Workers': 0}
+
+    def _migrate_to_23(self):
+        self._data['SearchReplace']['UseIndex'] = True
+
+    def _migrate_to_24(self):
+        self._data['SearchReplace']['LargeFileSize'] = 64
+        self._data['SearchReplace']['LargeFileWindow'] = 65536
+
+    def _migrate_to_25(self):
+        self._data['Project'] = {'UseIgnoreFiles': {}}
@@ -0,0 +1,111 @@
+"""
+filelistcache --- Persistent list of the project files
+======================================================
+
+The list of the project files is stored on disk between Enki sessions, in the ``projectfiles`` directory
+under ``CONFIG_DIR``, one file per project root.
+
+For every directory the cache stores its mtime, names of the files and of the subdirectories.
+Creating, removing or renaming an entry changes mtime of the directory. Therefore only directories
+with changed mtime shall be listed again, when the cache is revalidated.
+
+The cache depends on the file filter and on the ignore files (``.gitignore``) usage.
+It is not used, if they have been changed. mtime of the used ignore files is stored too,
+their content might be changed without changing mtime of the directory
+"""
+
+import hashlib
+import os
+import os.path
+import pickle
+import zlib
+
+from enki.core.defines import CONFIG_DIR
+
+
+_FORMAT_VERSION = 2
+
+_CACHE_DIR = os.path.join(CONFIG_DIR, 'projectfiles')
+
+
+class FileListCache:
+    """Cached directory listings of the project.
+
+    ``dirs`` is a dictionary ``{relative directory path: (mtime, file names, subdirectory names)}``.
+    Root directory path is an empty string. Names are already filtered with the file filter.
+    mtime is None, if the directory listing can't be trusted, it will be listed again.
+
+    ``ignoreFiles`` is a dictionary ``{absolute path: mtime}`` of the read ignore files
+    """
+
+    def __init__(self, root):
+        self._root = root
+        self._path = os.path.join(_CACHE_DIR,
+                                  hashlib.sha1(root.encode('utf8', errors='ignore')).hexdigest())
+        self.filterPattern = None
+        self.useIgnoreFiles = False
+        self.ignoreFiles = {}
+        self.dirs = {}
+
+    def load(self):
+        """Load the cache from disk. Returns False, if there is no cache, or it is broken
+        """
+        try:
+            with open(self._path, 'rb') as cacheFile:
+                data = pickle.loads(zlib.decompress(cacheFile.read()))
+        except (IOError, OSError, EOFError, zlib.error, pickle.UnpicklingError):
+            return False
+        except Exception:  # pylint: disable=W0703
+            return False  # corrupted file
+
+        if not isinstance(data, dict) or \
+           data.get('version') != _FORMAT_VERSION or \
+           data.get('root') != self._root:
+            return False
+
+        self.filterPattern = data['filter']
+        self.useIgnoreFiles = data['useIgnoreFiles']
+        self.ignoreFiles = data['ignoreFiles']
+        self.dirs = data['dirs']
+        return True
+
+    def isValidFor(self, filterPattern, useIgnoreFiles):
+        """Check if the cache has been built with the same filter and ignore files usage
+        """
+        return self.filterPattern == filterPattern and \
+            self.useIgnoreFiles == useIgnoreFiles
+
+    def save(self):
+        """Save the cache to disk
+        """
+        data = {'version': _FORMAT_VERSION,
+                'root': self._root,
+                'filter': self.filterPattern,
+                'useIgnoreFiles': self.useIgnoreFiles,
+                'ignoreFiles': self.ignoreFiles,
+                'dirs': self.dirs}
+
+        tmpPath = self._path + '.tmp'
+        try:
+            if not os.path.isdir(_CACHE_DIR):
+                os.makedirs(_CACHE_DIR)
+            with open(tmpPath, 'wb') as cacheFile:
+                cacheFile.write(zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)))
+            os.replace(tmpPath, self._path)
+        except (IOError, OSError) as ex:
+            print('Failed to save project files list: {}'.format(ex))
+
+    def files(self):
+        """List of the files, relative to the project root, in the ``os.walk()`` order
+        """
+        result = []
+        stack = ['']
+        while stack:
+            relDir = stack.pop()
+            entry = self.dirs.get(relDir)
+            if entry is None:
+                continue
+            _mtime, fileNames, dirNames = entry
+            result.extend(os.path.join(relDir, fileName) for fileName in fileNames)
+            stack.extend(os.path.join(relDir, dirName) for dirName in reversed(dirNames))
+        return result
@@ -7,7 +7,12 @@ Implements widget, which appears, when you press Ctrl+L and it's functionality
 Contains definition of AbstractCommand and AbstractCompleter interfaces
 """
 
+import collections
+import functools
+import logging
 import os
+import statistics
+import time
 
 from PyQt5.QtCore import pyqtSignal, QAbstractItemModel, QEvent, QModelIndex, QObject, Qt, QTimer
 from PyQt5.QtWidgets import QDialog, QLineEdit, QTreeView, QVBoxLayout
@@ -142,6 +147,7 @@ class AbstractCompleter:
     If ``mustBeLoaded`` class attribute is True, ``load()`` method will be called in a thread.
     """
     mustBeLoaded = False
+    _partialResultsCallback = None  # set by the loader thread
 
     def terminate(self):
         """Terminate the completer if necessary.
@@ -154,9 +160,22 @@ class AbstractCompleter:
         """Load necessary data in a thread.
         This method must often check ``stopEvent`` ``threading.Event``
         and return if it is set.
+
+        Call ``publishPartialResults()`` to show the items found so far, if loading takes long.
         """
         pass
 
+    def publishPartialResults(self, makeSnapshot):
+        """Show partial results while ``load()`` is running. Called by ``load()`` in the loader thread.
+
+        ``makeSnapshot`` is a function, which returns an ``AbstractCompleter`` with the items found so far,
+        usually a copy of this completer. The snapshot is used in the GUI thread and must not be changed.
+        Frequent calls are dropped without calling ``makeSnapshot``, so it is cheap to call this method
+        after every found item
+        """
+        if self._partialResultsCallback is not None:
+            self._partialResultsCallback(makeSnapshot)
+
     def rowCount(self):
         """Row count for TreeView
         """
@@ -466,76 +485,173 @@ class _CompletableLineEdit(QLineEdit):
         return text
 
 
+class CompleterTimings:
+    """Timings of completers loading, per command class. In seconds.
+
+    * load time - ``AbstractCompleter.load()`` duration in the loader thread
+    * time to first row - from the loading request until the first rows are shown.
+      Includes delivery to the GUI thread. None, if nothing has been found
+    """
+    _HISTORY_SIZE = 100  # last measurements kept for every command
+
+    def __init__(self):
+        self._timings = {}  # command name: deque of (load time, time to first row)
+
+    def record(self, commandName, loadTime, firstRowTime):
+        if commandName not in self._timings:
+            self._timings[commandName] = collections.deque(maxlen=self._HISTORY_SIZE)
+        self._timings[commandName].append((loadTime, firstRowTime))
+
+        logging.debug('Locator %s: loaded in %.1f ms, first row in %s ms',
+                      commandName, loadTime * 1000,
+                      '%.1f' % (firstRowTime * 1000) if firstRowTime is not None else '-')
+
+    def summary(self):
+        """Get dictionary ``{command name: {'count': N, 'medianLoadTime': T, 'maxLoadTime': T,
+        'medianFirstRowTime': T}}``. ``medianFirstRowTime`` is None, if rows have never been shown
+        """
+        summary = {}
+        for commandName, timings in self._timings.items():
+            loadTimes = [loadTime for loadTime, firstRowTime in timings]
+            firstRowTimes = [firstRowTime for loadTime, firstRowTime in timings if firstRowTime is not None]
+            summary[commandName] = {'count': len(timings),
+                                    'medianLoadTime': statistics.median(loadTimes),
+                                    'maxLoadTime': max(loadTimes),
+                                    'medianFirstRowTime': statistics.median(firstRowTimes) if firstRowTimes else None}
+        return summary
+
+
+class _LoaderTask:
+    """Loading of a completer
+    """
+
+    def __init__(self, command, completer):
+        self.command = command
+        self.completer = completer
+        self.stopEvent = Event()
+        self.requestTime = time.perf_counter()
+        self.loadTime = None  # set by the loader thread
+        self.lastPublishTime = None  # time of the last partial results. Used by the loader thread
+        self.firstRowTime = None
+
+
+class _LoaderNotifier(QObject):
+    """Delivers results of the loader thread to the GUI thread.
+    Lives in the GUI thread, signals are emitted by the loader thread
+    """
+
+    loaded = pyqtSignal(object)
+    """
+    loaded(task)
+
+    **Signal** emitted, when ``task.completer`` has been loaded
+    """
+
+    partiallyLoaded = pyqtSignal(object, object)
+    """
+    partiallyLoaded(task, snapshot)
+
+    **Signal** emitted, when the completer has published partial results
+    """
+
+
 class _CompleterLoaderThread(Thread):
     """Thread constructs Completer
     Sometimes it requires a lot of time, i.e. when expanding "/usr/lib/*"
     andreikop: I tried to use QThread + pyqtSignal, but got tired with crashes and deadlocks
+
+    The thread is a Python thread. Results are delivered with queued signals of a QObject,
+    which lives in the GUI thread.
+    A new task stops the previous one, but the GUI thread doesn't wait for it. Results of stopped tasks are dropped
     """
     daemon = True
 
-    def __init__(self, locator):
+    _PUBLISH_INTERVAL = 0.1  # partial results are shown not more often, than once per this time
+
+    def __init__(self, locator, timings):
         """Works in the GUI thread
         """
         Thread.__init__(self)
 
         self._locator = locator
+        self._timings = timings
 
-        self._taskQueue = Queue()  # completer or None as exit signal
-        self._resultQueue = Queue()
+        self._taskQueue = Queue()  # _LoaderTask or None as exit signal
+        self._currentTask = None  # the last requested task, until it is loaded
 
-        self._checkResultQueueTimer = QTimer()
-        self._checkResultQueueTimer.setInterval(50)
-        self._checkResultQueueTimer.timeout.connect(self._checkResultQueue)
-        self._checkResultQueueTimer.start()
+        self._notifier = _LoaderNotifier()
+        self._notifier.loaded.connect(self._onLoaded, Qt.QueuedConnection)
+        self._notifier.partiallyLoaded.connect(self._onPartiallyLoaded, Qt.QueuedConnection)
 
-        self._stopEvent = Event()
         Thread.start(self)
 
-    def _checkResultQueue(self):
-        """Check if thread constructed a completer and put it to the queue
+    def loadCompleter(self, command, completer):
+        """Start constructing completer. The previous one is stopped, but not waited for
         Works in the GUI thread
         """
-        if not self._resultQueue.empty():
-            command, completer = self._resultQueue.get()
-            self._locator.onCompleterLoaded(command, completer)
+        self.cancel()
+        self._currentTask = _LoaderTask(command, completer)
+        self._taskQueue.put(self._currentTask)
 
-    def loadCompleter(self, command, completer):
-        """Start constructing completer
+    def cancel(self):
+        """Stop the current task, if any. Its results will not be delivered
         Works in the GUI thread
         """
-        # Stop previous
-        self._stopEvent.set()
-        self._taskQueue.join()
-
-        # Drop previous result
-        while not self._resultQueue.empty():
-            self._resultQueue.get()
-
-        # Start new
-        self._stopEvent.clear()
-        task = (command, completer)
-        if not self.is_alive():
-            assert 0
-        self._taskQueue.put(task)
+        if self._currentTask is not None:
+            self._currentTask.stopEvent.set()
+            self._currentTask = None
 
     def terminate(self):
         """Set termination flag
         Works in the GUI thread
         """
         if self.is_alive():
-            self._stopEvent.set()
+            self.cancel()
             self._taskQueue.put(None)
-            self._checkResultQueueTimer.stop()
             self.join()
 
-    def _getNextTask(self):
-        # discard old commands
-        while self._taskQueue.qsize() > 1:
-            self._taskQueue.get()
-            self._taskQueue.task_done()
+    def _updateFirstRowTime(self, task, completer):
+        if task.firstRowTime is None and completer.rowCount() > 0:
+            task.firstRowTime = time.perf_counter() - task.requestTime
+
+    def _onLoaded(self, task):
+        """Works in the GUI thread
+        """
+        if task is not self._currentTask:
+            return  # stopped or superseded by a newer task
 
-        # Get the last command
-        return self._taskQueue.get()
+        self._currentTask = None
+        self._updateFirstRowTime(task, task.completer)
+        self._timings.record(type(task.command).__name__, task.loadTime, task.firstRowTime)
+        self._locator.onCompleterLoaded(task.command, task.completer)
+
+    def _onPartiallyLoaded(self, task, snapshot):
+        """Works in the GUI thread
+        """
+        if task is not self._currentTask:
+            return
+
+        self._updateFirstRowTime(task, snapshot)
+        self._locator.onCompleterPartiallyLoaded(task.command, snapshot)
+
+    def _publishPartialResults(self, task, makeSnapshot):
+        """Works in NEW thread
+        """
+        now = time.perf_counter()
+        if task.lastPublishTime is not None and \
+           now - task.lastPublishTime < self._PUBLISH_INTERVAL:
+            return
+
+        task.lastPublishTime = now
+        self._notifier.partiallyLoaded.emit(task, makeSnapshot())
+
+    def _getNextTask(self):
+        """Get the last task, discard older ones
+        """
+        task = self._taskQueue.get()
+        while not self._taskQueue.empty():
+            task = self._taskQueue.get()
+        return task
 
     def run(self):
         """Thread function
@@ -543,16 +659,18 @@ class _CompleterLoaderThread(Thread):
         """
         while True:
             task = self._getNextTask()
-            try:
-                if task is None:  # exit command
-                    break
+            if task is None:  # exit command
+                break
+            if task.stopEvent.is_set():
+                continue
+
+            task.completer._partialResultsCallback = functools.partial(self._publishPartialResults, task)
+            startTime = time.perf_counter()
+            task.completer.load(task.stopEvent)
+            task.loadTime = time.perf_counter() - startTime
 
-                command, completer = task
-                completer.load(self._stopEvent)
-                if self._taskQueue.empty():
-                    self._resultQueue.put((command, completer))
-            finally:
-                self._taskQueue.task_done()
+            if not task.stopEvent.is_set():
+                self._notifier.loaded.emit(task)
 
 
 def splitLine(text):
@@ -611,6 +729,8 @@ class Locator(QObject):
         QObject.__init__(self)
         self._commandClasses = []
 
+        self._completerTimings = CompleterTimings()
+
         self._action = core.actionManager().addAction("mNavigation/aLocator", "Locator", shortcut='Ctrl+L')
         self._action.triggered.connect(self._onAction)
         self._separator = core.actionManager().menu("mNavigation").addSeparator()
@@ -622,7 +742,7 @@ class Locator(QObject):
     def _onAction(self):
         """Locator action triggered. Show themselves and make focused
         """
-        _LocatorDialog(core.mainWindow(), self._availableCommands()).exec_()
+        _LocatorDialog(core.mainWindow(), self._availableCommands(), self._completerTimings).exec_()
 
     def addCommandClass(self, commandClass):
         """Add new command to the locator. Shall be called by plugins, which provide locator commands
@@ -639,12 +759,17 @@ class Locator(QObject):
         """
         return [cmd for cmd in self._commandClasses if cmd.isAvailable()]
 
+    def completerTimings(self):
+        """::class:`enki.core.locator.CompleterTimings` of the completers loading
+        """
+        return self._completerTimings
+
 
 class _LocatorDialog(QDialog):
     """Locator widget and implementation
     """
 
-    def __init__(self, parent, commandClasses):
+    def __init__(self, parent, commandClasses, completerTimings):
         QDialog.__init__(self, parent)
         self._terminated = False
         self._commandClasses = commandClasses
@@ -656,7 +781,7 @@ class _LocatorDialog(QDialog):
         self._loadingTimer.setInterval(200)
         self._loadingTimer.timeout.connect(self._applyLoadingCompleter)
 
-        self._completerLoaderThread = _CompleterLoaderThread(self)
+        self._completerLoaderThread = _CompleterLoaderThread(self, completerTimings)
 
         self.finished.connect(self._terminate)
 
@@ -740,8 +865,10 @@ class _LocatorDialog(QDialog):
                 self._loadingTimer.start()
                 self._completerLoaderThread.loadCompleter(self._command, completer)
             else:
+                self._completerLoaderThread.cancel()
                 self._applyCompleter(self._command, completer)
         else:
+            self._completerLoaderThread.cancel()
             self._applyCompleter(None, _HelpCompleter(self._commandClasses))
 
     def _applyLoadingCompleter(self):
@@ -755,7 +882,14 @@ class _LocatorDialog(QDialog):
         """
         self._applyCompleter(command, completer)
 
-    def _applyCompleter(self, command, completer):
+    def onCompleterPartiallyLoaded(self, command, snapshot):
+        """The method called from _CompleterLoaderThread when the completer has published partial results.
+        The command is notified only when loading is finished
+        This code works in the GUI thread
+        """
+        self._applyCompleter(None, snapshot, isPartial=True)
+
+    def _applyCompleter(self, command, completer, isPartial=False):
         """Apply completer. Called by _updateCompletion or by thread function when Completer is constructed
         """
         self._loadingTimer.stop()
@@ -766,7 +900,8 @@ class _LocatorDialog(QDialog):
         if completer is None:
             completer = _HelpCompleter([command])
 
-        if self._edit.cursorPosition() == len(self._edit.text()):  # if cursor at the end of text
+        if not isPartial and \
+           self._edit.cursorPosition() == len(self._edit.text()):  # if cursor at the end of text
             self._edit.setInlineCompletion(completer.inline())
 
         self._model.setCompleter(completer)
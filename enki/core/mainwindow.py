@@ -244,6 +244,7 @@ class MainWindow(QMainWindow):
         # Menu or action path                          Name                     Icon            Shortcut        Hint                     enabled  checkable
         menu  ("mFile",                               "File"                  , ""           )
         action("mFile/aOpenProject",                  "Open Pro&ject..."      , "open.png",     "Shift+Ctrl+O" ,"Open a project"         , True)
+        action("mFile/aUseIgnoreFiles",               "Hide files ignored by .gitignore", "",   "",             "Exclude files, ignored by the version control, from the project", True, True)
         separator("mFile")
         menu  ("mFile/mUndoClose",                    "Undo Close"            , "recents.png")
         separator("mFile")
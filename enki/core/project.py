@@ -9,51 +9,143 @@ import os
 import os.path
 import time
 
-from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
 
 from enki.core.core import core
+from enki.core.filelistcache import FileListCache
+from enki.lib.dirwalker import listDirectory, walk
+from enki.lib.dirwatcher import createDirectoryWatcher
+from enki.lib.ignorefiles import IgnoreRules
 
 
 STATUS_UPDATE_TIMEOUT_SEC = 0.25
 STATUS_SHOW_TIMEOUT_MSEC = 3000
 
+# mtime of a directory, modified so recently, is not trusted. Entries might be created in the same mtime tick
+RACY_MTIME_SEC = 2
+
+# Changes of the watched directories are collected and applied together.
+# I.e. ``git checkout`` changes a lot of directories at once
+WATCH_COALESCE_MSEC = 200
+WATCH_MAX_DELAY_MSEC = 1000
+# If more directories have been changed, the project is rescanned in the thread
+MAX_INCREMENTAL_DIRS = 256
+
+
+def _racyMtime():
+    """Get mtime, starting from which directory mtime is not trusted
+    """
+    return (time.time() - RACY_MTIME_SEC) * 1e9
+
+
+def _ignoreFilesModified(ignoreFiles):
+    """Check if any of the ignore files ``{path: mtime}`` has been modified or removed
+    """
+    for path, mtime in ignoreFiles.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def _ignoreFilesIn(ignoreFiles, absDirs):
+    """Paths of the ignore files, which are located in the directories ``absDirs``
+    """
+    return {path for path in ignoreFiles if os.path.dirname(path) in absDirs}
+
 
 class _ScannerThread(QThread):
+    """Scans the project and updates the file list cache.
+    Directories, which haven't been changed since the previous scan, are not listed, their entries are
+    taken from the cache.
+
+    If ignore files are used, and an ignore file has been modified, created or removed, the project is
+    scanned without the cache, because rules of all the subdirectories might be changed
+    """
     itemsReady = pyqtSignal(str, list)
     status = pyqtSignal(str)
 
-    def __init__(self, parent, path):
+    def __init__(self, parent, path, cache, useIgnoreFiles):
         QThread.__init__(self, parent)
         self._path = path
+        self._cache = cache
+        self._useIgnoreFiles = useIgnoreFiles
         self._stop = False
 
-    def run(self):
-        results = []
-
-        filterRe = core.fileFilter().regExp()
+    def _walk(self, filterRe, cachedDirs, ignoreRules):
+        """Walk the project. Returns (new cached directories, absolute paths of the listed directories)
+        """
+        newDirs = {}
+        listedDirs = set()
+        racyMtime = _racyMtime()
 
         basename = os.path.basename(self._path)
+        fileCount = 0
         lastUpdateTime = time.time()
 
-        self.status.emit('Scanning {}: {} files found'.format(basename, len(results)))
-
-        for root, dirnames, filenames in os.walk(self._path):
-            if self._stop:
-                break
-
-            # remove not interesting directories
-            for dirname in dirnames[:]:
-                if filterRe.match(dirname):
-                    dirnames.remove(dirname)
+        self.status.emit('Scanning {}: {} files found'.format(basename, fileCount))
+
+        walker = walk(self._path, filterRe,
+                      ignoreRules=ignoreRules,
+                      cachedDirs=cachedDirs,
+                      shouldStop=lambda: self._stop)
+        for batch in walker:
+            for directory in batch:
+                relPath = directory.relPath
+                mtime = directory.mtime
+                cached = cachedDirs.get(relPath)
+                if cached is None or cached[0] != mtime:
+                    listedDirs.add(os.path.join(self._path, relPath) if relPath else self._path)
+                newDirs[relPath] = (mtime if mtime < racyMtime else None,
+                                    directory.fileNames,
+                                    directory.dirNames)
+                fileCount += len(directory.fileNames)
 
-            for filename in filenames:
-                if not filterRe.match(filename):
-                    results.append(os.path.relpath(os.path.join(root, filename), self._path))
             if time.time() - lastUpdateTime > STATUS_UPDATE_TIMEOUT_SEC:
-                self.status.emit('Scanning {}: {} files found'.format(basename, len(results)))
+                self.status.emit('Scanning {}: {} files found'.format(basename, fileCount))
                 lastUpdateTime = time.time()
 
+        return newDirs, listedDirs
+
+    def run(self):
+        filterRe = core.fileFilter().regExp()
+        if self._cache.isValidFor(filterRe.pattern, self._useIgnoreFiles) and \
+           not (self._useIgnoreFiles and _ignoreFilesModified(self._cache.ignoreFiles)):
+            cachedDirs = self._cache.dirs
+        else:
+            cachedDirs = {}
+
+        ignoreRules = IgnoreRules(self._path) if self._useIgnoreFiles else None
+        newDirs, listedDirs = self._walk(filterRe, cachedDirs, ignoreRules)
+
+        if ignoreRules is not None and cachedDirs and not self._stop and \
+           _ignoreFilesIn(self._cache.ignoreFiles, listedDirs) != \
+           _ignoreFilesIn(ignoreRules.loadedFiles(), listedDirs):
+            cachedDirs = {}  # ignore file created or removed. Rules of the subdirectories have been changed
+            ignoreRules = IgnoreRules(self._path)
+            newDirs, listedDirs = self._walk(filterRe, cachedDirs, ignoreRules)
+
         if not self._stop:
+            ignoreFiles = {}
+            if ignoreRules is not None:
+                # Ignore files of the not changed directories haven't been modified, they are taken from the cache
+                for path, mtime in self._cache.ignoreFiles.items():
+                    absDir = os.path.dirname(path)
+                    relDir = os.path.relpath(absDir, self._path) if absDir != self._path else ''
+                    if relDir in newDirs and absDir not in listedDirs:
+                        ignoreFiles[path] = mtime
+                ignoreFiles.update(ignoreRules.loadedFiles())
+
+            self._cache.filterPattern = filterRe.pattern
+            self._cache.useIgnoreFiles = self._useIgnoreFiles
+            self._cache.ignoreFiles = ignoreFiles
+            self._cache.dirs = newDirs
+            self._cache.save()
+            results = self._cache.files()  # directories are walked in parallel, the order is restored
+
+            basename = os.path.basename(self._path)
             self.status.emit('Scanning {} done: {} files found'.format(basename, len(results)))
             self.itemsReady.emit(self._path, results)
 
@@ -61,6 +153,112 @@ class _ScannerThread(QThread):
         self._stop = True
 
 
+class _TooManyChanges(Exception):
+    pass
+
+
+class _IncrementalUpdate:
+    """Applies changes of the directories to the file list cache.
+    Collects added and removed files, relative to the project root.
+
+    If an ignore file has been created or removed, rules of the subdirectories are changed,
+    the project shall be rescanned
+    """
+
+    def __init__(self, projectPath, cache):
+        self._projectPath = projectPath
+        self._cache = cache
+        self._filterRe = core.fileFilter().regExp()
+        self._ignoreRules = IgnoreRules(projectPath) if cache.useIgnoreFiles else None
+        self._racyMtime = _racyMtime()
+        self._budget = MAX_INCREMENTAL_DIRS
+        self.added = []
+        self.removed = []
+
+    def _list(self, relDir):
+        """List the directory and update the cache entry. Returns (old entry, new entry).
+        Raises OSError, if failed to list the directory
+        """
+        self._budget -= 1
+        if self._budget < 0:
+            raise _TooManyChanges()
+
+        absDir = os.path.join(self._projectPath, relDir) if relDir else self._projectPath
+        mtime = os.stat(absDir).st_mtime_ns
+        fileNames, dirNames = listDirectory(absDir, self._filterRe, ignoreRules=self._ignoreRules, relPath=relDir)
+        if self._ignoreRules is not None:
+            # An ignore file has been created, removed or replaced
+            loadedFiles = self._ignoreRules.loadedFiles()
+            newIgnoreFiles = {path: loadedFiles[path] for path in _ignoreFilesIn(loadedFiles, {absDir})}
+            oldIgnoreFiles = {path: self._cache.ignoreFiles[path]
+                              for path in _ignoreFilesIn(self._cache.ignoreFiles, {absDir})}
+            if relDir in self._cache.dirs and newIgnoreFiles != oldIgnoreFiles:
+                raise _TooManyChanges()
+            self._cache.ignoreFiles.update(newIgnoreFiles)
+        newEntry = (mtime if mtime < self._racyMtime else None, fileNames, dirNames)
+        return self._cache.dirs.get(relDir), newEntry
+
+    def updateDirectory(self, relDir):
+        """Directory has been changed. List it again
+        """
+        if relDir not in self._cache.dirs:  # removed together with the parent
+            return
+
+        try:
+            oldEntry, newEntry = self._list(relDir)
+        except OSError:
+            return  # removed, the parent directory is changed too
+        self._cache.dirs[relDir] = newEntry
+
+        _oldMtime, oldFileNames, oldDirNames = oldEntry
+        _newMtime, newFileNames, newDirNames = newEntry
+
+        oldFileSet = set(oldFileNames)
+        newFileSet = set(newFileNames)
+        self.added.extend(os.path.join(relDir, name) for name in newFileNames if name not in oldFileSet)
+        self.removed.extend(os.path.join(relDir, name) for name in oldFileNames if name not in newFileSet)
+
+        oldDirSet = set(oldDirNames)
+        newDirSet = set(newDirNames)
+        for name in oldDirNames:
+            if name not in newDirSet:
+                self._removeTree(os.path.join(relDir, name))
+        for name in newDirNames:
+            if name not in oldDirSet:
+                self._addTree(os.path.join(relDir, name))
+
+    def _removeTree(self, relDir):
+        """Directory has been removed. Remove it and the subdirectories from the cache
+        """
+        stack = [relDir]
+        while stack:
+            currentDir = stack.pop()
+            entry = self._cache.dirs.pop(currentDir, None)
+            if entry is not None:
+                _mtime, fileNames, dirNames = entry
+                self.removed.extend(os.path.join(currentDir, name) for name in fileNames)
+                stack.extend(os.path.join(currentDir, name) for name in dirNames)
+
+                absDir = os.path.join(self._projectPath, currentDir)
+                for path in _ignoreFilesIn(self._cache.ignoreFiles, {absDir}):
+                    del self._cache.ignoreFiles[path]
+
+    def _addTree(self, relDir):
+        """Directory has been created. Scan it
+        """
+        stack = [relDir]
+        while stack:
+            currentDir = stack.pop()
+            try:
+                _oldEntry, newEntry = self._list(currentDir)
+            except OSError:
+                continue
+            self._cache.dirs[currentDir] = newEntry
+            _mtime, fileNames, dirNames = newEntry
+            self.added.extend(os.path.join(currentDir, name) for name in fileNames)
+            stack.extend(os.path.join(currentDir, name) for name in reversed(dirNames))
+
+
 class Project(QObject):
 
     changed = pyqtSignal(str)
@@ -76,6 +274,16 @@ class Project(QObject):
 
     **Signal** emitted, when list of project files has been loaded
     """
+
+    filesChanged = pyqtSignal(list, list)
+    """
+    filesChanged(added, removed)
+
+    **Signal** emitted, when files have been created, removed or renamed in the scanned project.
+    Parameters are lists of paths, relative to the project root. Renamed file is removed and added.
+    If there are too many changes, the project is rescanned and ``filesReady`` is emitted instead
+    """
+
     scanStatusChanged = pyqtSignal(str)
     """
     scanStatusChanged()
@@ -88,18 +296,29 @@ class Project(QObject):
         QObject.__init__(self, core)
         self._path = None
         self._projectFiles = None
+        self._fileListCache = None
+        self._filesRevalidated = False
         self._thread = None
         self._scanStatus = None
         self._core = core
+
+        self._watcher = None
+        self._changedDirs = set()
+        self._firstChangeTime = None
+        self._changesTimer = QTimer(self)
+        self._changesTimer.setSingleShot(True)
+        self._changesTimer.timeout.connect(self._applyDirectoryChanges)
+
         self.open(os.path.abspath('.'))
         core.fileFilter().regExpChanged.connect(self._onFileFilterChanged)
 
     def terminate(self):
+        self._stopWatching()
         self._stopScannerThread()
 
     def _startScannerThread(self):
         assert self._thread is None
-        self._thread = _ScannerThread(self, self._path)
+        self._thread = _ScannerThread(self, self._path, self._fileListCache, self.useIgnoreFiles())
         self._thread.itemsReady.connect(self._onFilesReady)
         self._thread.status.connect(self._onScanStatus)
         self._scanStatus = ''
@@ -113,6 +332,83 @@ class Project(QObject):
             self._thread.status.disconnect(self._onScanStatus)
             self._thread = None
 
+    def _startWatching(self):
+        """Watch the scanned directories. Directories, which are not scanned anymore, are not watched
+        """
+        if self._watcher is None:
+            self._watcher = createDirectoryWatcher(self)
+            self._watcher.directoryChanged.connect(self._onDirectoryChanged)
+            self._watcher.overflow.connect(self._onWatcherOverflow)
+
+        requiredPaths = {os.path.join(self._path, relDir) if relDir else self._path
+                         for relDir in self._fileListCache.dirs}
+        watchedPaths = set(self._watcher.paths())
+        for path in watchedPaths - requiredPaths:
+            self._watcher.removePath(path)
+        for path in requiredPaths - watchedPaths:
+            self._watcher.addPath(path)
+
+    def _stopWatching(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher.directoryChanged.disconnect(self._onDirectoryChanged)
+            self._watcher.overflow.disconnect(self._onWatcherOverflow)
+            self._watcher.deleteLater()
+            self._watcher = None
+        self._changedDirs = set()
+        self._changesTimer.stop()
+
+    def _rescanChanges(self):
+        """Too many changes to apply them incrementally. Rescan the project.
+        Not changed directories are not listed by the scanner thread
+        """
+        self._filesRevalidated = False  # if the scan is cancelled, it will be repeated
+        if self._thread is None:
+            self._startScannerThread()
+
+    @pyqtSlot(str)
+    def _onDirectoryChanged(self, path):
+        now = time.time()
+        if not self._changedDirs:
+            self._firstChangeTime = now
+        self._changedDirs.add(path)
+
+        waitedMsec = (now - self._firstChangeTime) * 1000
+        self._changesTimer.start(max(0, min(WATCH_COALESCE_MSEC, WATCH_MAX_DELAY_MSEC - waitedMsec)))
+
+    @pyqtSlot()
+    def _onWatcherOverflow(self):
+        self._changedDirs = set()
+        self._rescanChanges()
+
+    @pyqtSlot()
+    def _applyDirectoryChanges(self):
+        """List the changed directories again, update the file list and emit ``filesChanged``
+        """
+        if self._thread is not None or not self._changedDirs:
+            return  # changes are applied, when the scan is finished
+
+        changedDirs = sorted(self._changedDirs)  # parent directories first
+        self._changedDirs = set()
+        if len(changedDirs) > MAX_INCREMENTAL_DIRS:
+            self._rescanChanges()
+            return
+
+        update = _IncrementalUpdate(self._path, self._fileListCache)
+        try:
+            for path in changedDirs:
+                update.updateDirectory('' if path == self._path else os.path.relpath(path, self._path))
+        except _TooManyChanges:
+            self._rescanChanges()
+            return
+
+        self._startWatching()
+
+        if update.added or update.removed:
+            removed = set(update.removed)
+            self._projectFiles = [path for path in self._projectFiles if path not in removed] + update.added
+            self.filesChanged.emit(update.added, update.removed)
+
     def open(self, path):
         """Open project.
         Replaces previous opened project
@@ -121,12 +417,21 @@ class Project(QObject):
         if self._path == path:
             return
 
+        self._stopWatching()
         self._stopScannerThread()
         self._path = path
         self._projectFiles = None
         self._scanStatus = 'Not scanning'
         self._backgroundScan = False
 
+        # Files from the previous session are available immediately. They are revalidated,
+        # when loading files is requested
+        self._fileListCache = FileListCache(path)
+        self._filesRevalidated = False
+        if self._fileListCache.load() and \
+           self._fileListCache.isValidFor(core.fileFilter().regExp().pattern, self.useIgnoreFiles()):
+            self._projectFiles = self._fileListCache.files()
+
         self.changed.emit(path)
 
     def path(self):
@@ -136,10 +441,27 @@ class Project(QObject):
         """
         return self._path
 
+    def useIgnoreFiles(self):
+        """Check if files, ignored by ``.gitignore``, ``.ignore`` and ``.git/info/exclude``,
+        are excluded from the project. The option is stored per project, enabled by default
+        """
+        return core.config()['Project']['UseIgnoreFiles'].get(self._path, True)
+
+    def setUseIgnoreFiles(self, use):
+        """Enable or disable excluding of the ignored files for the current project.
+        The project is scanned again
+        """
+        if use == self.useIgnoreFiles():
+            return
+
+        core.config()['Project']['UseIgnoreFiles'][self._path] = use
+        core.config().flush()
+        self._onFileFilterChanged()
+
     def files(self):
         """List of project files
 
-        ``None`` if not loaded yet
+        ``None`` if not loaded yet. Might be loaded from the cache and not revalidated yet
         """
         return self._projectFiles
 
@@ -147,8 +469,11 @@ class Project(QObject):
         """Start asyncronous loading project files.
 
         It is allowed to call this method multiple times.
+        If the files have been loaded from the cache, they are revalidated. ``filesReady`` is emitted
+        again, if the files have been changed
         """
-        if self._thread is None and self._projectFiles is None:
+        if self._thread is None and \
+           (self._projectFiles is None or not self._filesRevalidated):
             self._startScannerThread()
 
     def cancelLoadingFiles(self):
@@ -190,13 +515,23 @@ class Project(QObject):
                                                             STATUS_SHOW_TIMEOUT_MSEC)
     @pyqtSlot(str, list)
     def _onFilesReady(self, path, files):
+        changed = files != self._projectFiles
         self._projectFiles = files
+        self._filesRevalidated = True
         self._backgroundScan = False
         self._stopScannerThread()
-        self.filesReady.emit()
+
+        # Keep the file list up to date. Changes, which have happened during the scan, are applied
+        self._startWatching()
+        if self._changedDirs:
+            self._changesTimer.start(0)
+
+        if changed:
+            self.filesReady.emit()
 
     @pyqtSlot()
     def _onFileFilterChanged(self):
+        self._stopWatching()
         if self.isScanning():
             self._stopScannerThread()
             self._startScannerThread()
@@ -0,0 +1,198 @@
+"""
+dirwalker --- Walk directory tree with a pool of threads
+========================================================
+
+Used to build list of the project files and list of files for search in directory.
+
+Directories are listed with ``os.scandir()``. Type of an entry is known from the directory listing on
+most of the file systems, therefore entries are not stat'ed. Sibling subtrees are listed by parallel
+threads. Listing a directory releases the GIL, so it is faster on cold cache and on network file systems.
+
+The walker is a generator. It yields batches of listed directories, as they are ready.
+The walk is cancelled, when the generator is closed or ``shouldStop()`` returns True
+"""
+
+import concurrent.futures
+import os
+import os.path
+
+from enki.lib.ignorefiles import IGNORE_FILE_NAMES
+
+
+DEFAULT_WORKER_COUNT = 8
+
+_POLL_TIMEOUT = 0.1  # how often check the stop flag while waiting for the workers
+_BATCH_SIZE = 64  # directories in a batch, when walking without threads
+# Directories, walked by a thread pool task. Not walked subdirectories become new tasks.
+# A task per directory costs more, than listing of a small directory
+_TASK_SIZE = 16
+
+
+class WalkedDirectory:
+    """Listed directory. ``relPath`` is relative to the walk root, empty for the root.
+    ``mtime`` is None, if not requested
+    """
+    __slots__ = ('relPath', 'mtime', 'fileNames', 'dirNames')
+
+    def __init__(self, relPath, mtime, fileNames, dirNames):
+        self.relPath = relPath
+        self.mtime = mtime
+        self.fileNames = fileNames
+        self.dirNames = dirNames
+
+
+def listDirectory(absPath, filterRe=None, followLinks=False, regularFilesOnly=False, skipHidden=False,
+                  ignoreRules=None, relPath=''):
+    """Get names of the files and of the subdirectories to walk into.
+    Names, which match ``filterRe``, are skipped. Names, which start with ``.``, are skipped, if ``skipHidden``.
+    Symbolic links to directories are skipped, if not ``followLinks``.
+    Entries, which are not directories, are files, as for ``os.walk()``. If ``regularFilesOnly``,
+    only the regular files and the links to them are files.
+    ``ignoreRules`` is an optional ``enki.lib.ignorefiles.IgnoreRules`` of the tree, ``relPath`` is path
+    of the directory in the tree. Ignored entries are skipped
+
+    Raises OSError, if failed to list the directory
+    """
+    with os.scandir(absPath) as iterator:
+        entries = list(iterator)
+
+    dirRules = None
+    if ignoreRules is not None:
+        ignoreFileNames = [entry.name for entry in entries if entry.name in IGNORE_FILE_NAMES]
+        dirRules = ignoreRules.forDirectory(relPath, ignoreFileNames)
+
+    fileNames = []
+    dirNames = []
+    for entry in entries:
+        if skipHidden and entry.name.startswith('.'):
+            continue
+        if filterRe is not None and filterRe.match(entry.name):
+            continue
+        try:
+            isDir = entry.is_dir()
+        except OSError:
+            isDir = False
+
+        if dirRules is not None and dirRules.isIgnored(entry.name, isDir):
+            continue
+
+        if isDir:
+            if followLinks or not entry.is_symlink():
+                dirNames.append(entry.name)
+        elif not regularFilesOnly:
+            fileNames.append(entry.name)
+        else:
+            try:
+                if entry.is_file():
+                    fileNames.append(entry.name)
+            except OSError:
+                pass
+    return fileNames, dirNames
+
+
+def _walkedDirectory(root, relPath, cachedDirs, listOptions):
+    """List the directory. Returns WalkedDirectory or None, if failed to list it
+    """
+    absPath = os.path.join(root, relPath) if relPath else root
+    try:
+        if cachedDirs is None:
+            mtime = None
+        else:
+            mtime = os.stat(absPath).st_mtime_ns
+            cached = cachedDirs.get(relPath)
+            if cached is not None and cached[0] == mtime:
+                return WalkedDirectory(relPath, mtime, cached[1], cached[2])
+
+        fileNames, dirNames = listDirectory(absPath, relPath=relPath, **listOptions)
+    except OSError:
+        return None
+
+    return WalkedDirectory(relPath, mtime, fileNames, dirNames)
+
+
+def walk(root, filterRe=None, followLinks=False, regularFilesOnly=False, skipHidden=False, ignoreRules=None,
+         cachedDirs=None, shouldStop=None, workerCount=DEFAULT_WORKER_COUNT):
+    """Walk the directory tree. Generator. Yields lists of WalkedDirectory in not defined order.
+
+    See ``listDirectory()`` for ``filterRe``, ``followLinks``, ``regularFilesOnly``, ``skipHidden``
+    and ``ignoreRules``.
+    If ``cachedDirs`` is not None, mtime of every directory is read. ``cachedDirs`` is a dictionary
+    ``{relative path: (mtime, file names, directory names)}``. If mtime of a directory is the same,
+    it is not listed, names are taken from the dictionary.
+    ``shouldStop`` is an optional callable. The walk is interrupted, when it returns True.
+    If ``workerCount`` is 1, the directories are listed in this thread in ``os.walk()`` order
+    """
+    listOptions = {'filterRe': filterRe,
+                   'followLinks': followLinks,
+                   'regularFilesOnly': regularFilesOnly,
+                   'skipHidden': skipHidden,
+                   'ignoreRules': ignoreRules}
+
+    def walked(relPath):
+        return _walkedDirectory(root, relPath, cachedDirs, listOptions)
+
+    if workerCount <= 1:
+        yield from _walkInThisThread(walked, shouldStop)
+    else:
+        yield from _walkWithThreadPool(walked, shouldStop, workerCount)
+
+
+def _walkInThisThread(walked, shouldStop):
+    stack = ['']
+    batch = []
+    while stack:
+        if shouldStop is not None and shouldStop():
+            return
+
+        directory = walked(stack.pop())
+        if directory is None:
+            continue
+        stack.extend(os.path.join(directory.relPath, name) for name in reversed(directory.dirNames))
+
+        batch.append(directory)
+        if len(batch) >= _BATCH_SIZE:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _walkSubtree(walked, relPath):
+    """Walk the subtree in this thread, but not more than ``_TASK_SIZE`` directories.
+    Returns (list of WalkedDirectory, list of not walked subdirectories)
+    """
+    directories = []
+    stack = [relPath]
+    while stack and len(directories) < _TASK_SIZE:
+        directory = walked(stack.pop())
+        if directory is not None:
+            directories.append(directory)
+            stack.extend(os.path.join(directory.relPath, name) for name in reversed(directory.dirNames))
+    return directories, stack
+
+
+def _walkWithThreadPool(walked, shouldStop, workerCount):
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workerCount)
+    pending = {executor.submit(_walkSubtree, walked, '')}
+    try:
+        while pending:
+            if shouldStop is not None and shouldStop():
+                return
+
+            done, pending = concurrent.futures.wait(pending,
+                                                    timeout=_POLL_TIMEOUT,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            batch = []
+            for future in done:
+                directories, notWalked = future.result()
+                for relPath in notWalked:
+                    pending.add(executor.submit(_walkSubtree, walked, relPath))
+                batch.extend(directories)
+
+            if batch:
+                yield batch
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
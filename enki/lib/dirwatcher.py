@@ -0,0 +1,196 @@
+"""
+dirwatcher --- Watch directories for created, removed and renamed entries
+=========================================================================
+
+On Linux inotify is used directly. It costs one watch descriptor per directory and reports
+only the events, which change the list of entries. On other systems, or if inotify is not available,
+``QFileSystemWatcher`` is used.
+
+Watchers report only the path of the changed directory. The receiver lists the directory to find out
+what has been changed
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+from PyQt5.QtCore import pyqtSignal, QFileSystemWatcher, QObject, QSocketNotifier
+
+
+class DirectoryWatcher(QObject):
+    """Interface of the directory watchers
+    """
+
+    directoryChanged = pyqtSignal(str)
+    """
+    directoryChanged(path)
+
+    **Signal** emitted, when an entry of the watched directory has been created, removed or renamed
+    """
+
+    overflow = pyqtSignal()
+    """
+    overflow()
+
+    **Signal** emitted, when events have been lost. All the watched directories might be changed
+    """
+
+    def addPath(self, path):
+        """Start watching the directory. Returns False, if failed
+        """
+        raise NotImplementedError()
+
+    def removePath(self, path):
+        """Stop watching the directory
+        """
+        raise NotImplementedError()
+
+    def paths(self):
+        """List of the watched directories
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """Stop watching all the directories. The watcher can't be used after it
+        """
+        raise NotImplementedError()
+
+
+class _InotifyWatcher(DirectoryWatcher):
+    """Watcher, which uses Linux inotify API through ctypes
+    """
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONTFOLLOW = 0x02000000
+
+    WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONTFOLLOW
+
+    _EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+    _READ_SIZE = 64 * 1024
+
+    def __init__(self, parent):
+        DirectoryWatcher.__init__(self, parent)
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self._pathByWd = {}
+        self._wdByPath = {}
+
+        self._notifier = QSocketNotifier(self._fd, QSocketNotifier.Read, self)
+        self._notifier.activated.connect(self._onReadable)
+
+    def addPath(self, path):
+        if path in self._wdByPath:
+            return True
+
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            return False
+
+        self._pathByWd[wd] = path
+        self._wdByPath[path] = wd
+        return True
+
+    def removePath(self, path):
+        wd = self._wdByPath.pop(path, None)
+        if wd is not None:
+            del self._pathByWd[wd]
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def paths(self):
+        return list(self._wdByPath.keys())
+
+    def close(self):
+        if self._fd is not None:
+            self._notifier.setEnabled(False)
+            os.close(self._fd)
+            self._fd = None
+            self._pathByWd = {}
+            self._wdByPath = {}
+
+    def _readEvents(self):
+        """Read all available events. Returns bytes
+        """
+        chunks = []
+        while True:
+            try:
+                data = os.read(self._fd, self._READ_SIZE)
+            except BlockingIOError:
+                break
+            except OSError:
+                break
+            if not data:
+                break
+            chunks.append(data)
+        return b''.join(chunks)
+
+    def _onReadable(self):
+        data = self._readEvents()
+
+        changedPaths = []
+        overflow = False
+        pos = 0
+        while pos + self._EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, nameLength = self._EVENT_HEADER.unpack_from(data, pos)
+            pos += self._EVENT_HEADER.size + nameLength
+
+            if mask & self.IN_Q_OVERFLOW:
+                overflow = True
+            elif mask & self.IN_IGNORED:  # directory removed or watch removed
+                path = self._pathByWd.pop(wd, None)
+                if path is not None:
+                    del self._wdByPath[path]
+            else:
+                path = self._pathByWd.get(wd)
+                if path is not None and path not in changedPaths:
+                    changedPaths.append(path)
+
+        for path in changedPaths:
+            self.directoryChanged.emit(path)
+        if overflow:
+            self.overflow.emit()
+
+
+class _QtWatcher(DirectoryWatcher):
+    """Watcher, which uses QFileSystemWatcher
+    """
+
+    def __init__(self, parent):
+        DirectoryWatcher.__init__(self, parent)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.directoryChanged)
+
+    def addPath(self, path):
+        return self._watcher.addPath(path)
+
+    def removePath(self, path):
+        self._watcher.removePath(path)
+
+    def paths(self):
+        return self._watcher.directories()
+
+    def close(self):
+        paths = self._watcher.directories()
+        if paths:
+            self._watcher.removePaths(paths)
+
+
+def createDirectoryWatcher(parent=None):
+    """Create the best watcher available on the system
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            return _InotifyWatcher(parent)
+        except (OSError, AttributeError):  # no inotify in libc or out of instances
+            pass
+    return _QtWatcher(parent)
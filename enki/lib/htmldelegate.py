@@ -1,14 +1,19 @@
 """
 htmldelegate --- QStyledItemDelegate delegate. Draws HTML
 =========================================================
+
+Laid out documents are cached. Views repaint and ask for size hints of the same rows many times,
+parsing HTML again every time is slow
 """
 
+import collections
+
 from PyQt5.QtWidgets import QApplication, \
     QStyledItemDelegate, QStyle, QStyleOptionViewItem, \
     QWidget
 from PyQt5.QtGui import QAbstractTextDocumentLayout, \
     QTextDocument, QPalette
-from PyQt5.QtCore import QSize
+from PyQt5.QtCore import QEvent, QSize
 
 
 _HTML_ESCAPE_TABLE = \
@@ -29,12 +34,27 @@ def htmlEscape(text):
     return "".join(_HTML_ESCAPE_TABLE.get(c, c) for c in text)
 
 
+def _isPlainText(text):
+    """Check if the text is shown the same way as HTML and as a plain text.
+    HTML collapses whitespaces, therefore only single spaces between words are allowed
+    """
+    return '<' not in text and \
+        '&' not in text and \
+        '  ' not in text and \
+        text == text.strip(' ') and \
+        not any(char in text for char in '\t\n\r')
+
+
 class HTMLDelegate(QStyledItemDelegate):
     """QStyledItemDelegate implementation. Draws HTML
 
     http://stackoverflow.com/questions/1956542/how-to-make-item-view-render-rich-html-text-in-qt/1956781#1956781
     """
 
+    _CACHE_SIZE = 256  # laid out documents
+
+    _INVALIDATING_EVENTS = (QEvent.FontChange, QEvent.PaletteChange, QEvent.StyleChange)
+
     def __init__(self, parent=None):
         if isinstance(parent, QWidget):
             self._font = parent.font()
@@ -43,6 +63,51 @@ class HTMLDelegate(QStyledItemDelegate):
 
         QStyledItemDelegate.__init__(self, parent)
 
+        self._documents = collections.OrderedDict()  # (text, font key): (QTextDocument, size hint)
+        if isinstance(parent, QWidget):
+            parent.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        """QStyledItemDelegate.eventFilter implementation. Drops the cache, if the view font or palette changes
+        """
+        if obj is self.parent():
+            if event.type() in self._INVALIDATING_EVENTS:
+                self.clearCache()
+            return False
+        return QStyledItemDelegate.eventFilter(self, obj, event)
+
+    def clearCache(self):
+        """Drop the laid out documents
+        """
+        self._documents.clear()
+
+    def _document(self, text):
+        """Get laid out document and size hint for the text
+        """
+        font = self._font if self._font is not None else QApplication.font()
+        key = (text, font.key())
+        cached = self._documents.get(key)
+        if cached is not None:
+            self._documents.move_to_end(key)
+            return cached
+
+        doc = QTextDocument()
+        if self._font is not None:
+            doc.setDefaultFont(self._font)
+
+        doc.setDocumentMargin(1)
+        #  bad long (multiline) strings processing doc.setTextWidth(options.rect.width())
+        if _isPlainText(text):
+            doc.setPlainText(text)
+        else:
+            doc.setHtml(text)
+
+        cached = (doc, QSize(int(doc.idealWidth()), int(doc.size().height())))
+        self._documents[key] = cached
+        if len(self._documents) > self._CACHE_SIZE:
+            self._documents.popitem(last=False)
+        return cached
+
     def paint(self, painter, option, index):
         """QStyledItemDelegate.paint implementation
         """
@@ -55,13 +120,7 @@ class HTMLDelegate(QStyledItemDelegate):
 
         style = QApplication.style() if options.widget is None else options.widget.style()
 
-        doc = QTextDocument()
-        if self._font is not None:
-            doc.setDefaultFont(self._font)
-
-        doc.setDocumentMargin(1)
-        doc.setHtml(options.text)
-        #  bad long (multiline) strings processing doc.setTextWidth(options.rect.width())
+        doc, size = self._document(options.text)
 
         options.text = ""
         style.drawControl(QStyle.CE_ItemViewItem, options, painter)
@@ -87,10 +146,5 @@ class HTMLDelegate(QStyledItemDelegate):
         options = QStyleOptionViewItem(option)
         self.initStyleOption(options, index)
 
-        doc = QTextDocument()
-        if self._font is not None:
-            doc.setDefaultFont(self._font)
-        doc.setDocumentMargin(1)
-        #  bad long (multiline) strings processing doc.setTextWidth(options.rect.width())
-        doc.setHtml(options.text)
-        return QSize(doc.idealWidth(), doc.size().height())
+        doc, size = self._document(options.text)
+        return QSize(size)
@@ -0,0 +1,287 @@
+"""
+ignorefiles --- Rules of .gitignore and .ignore files
+=====================================================
+
+Files and directories, ignored by the version control, are usually build results, downloaded dependencies
+and generated data. Walking them is useless.
+
+Rules are read hierarchically, as git does: ``.gitignore`` and ``.ignore`` of every directory,
+of the parent directories up to the repository root, and ``.git/info/exclude``.
+Rules of a deeper directory override rules of its parents, ``.ignore`` overrides ``.gitignore``.
+
+Compiled rules are cached per directory. An ignored directory is not walked, therefore files
+inside it can't be included back with ``!`` rules, as in git
+"""
+
+import os
+import os.path
+import re
+
+
+IGNORE_FILE_NAMES = ('.ignore', '.gitignore')  # higher priority first
+
+
+def _translateClass(pattern, index):
+    """Translate ``[...]`` starting at ``index``. Returns (regexp text, index after it)
+    or (None, index), if the class is not closed
+    """
+    end = index + 1
+    if end < len(pattern) and pattern[end] in '!^':
+        end += 1
+    if end < len(pattern) and pattern[end] == ']':
+        end += 1
+    while end < len(pattern) and pattern[end] != ']':
+        end += 1
+    if end >= len(pattern):
+        return None, index
+
+    content = pattern[index + 1:end]
+    negated = content[:1] in ('!', '^')
+    if negated:
+        content = content[1:]
+    content = content.replace('\\', '\\\\').replace('[', '\\[')
+    if negated:
+        return '[^/' + content + ']', end + 1
+    else:
+        return '[' + content + ']', end + 1
+
+
+def translate(pattern):
+    """Translate a gitignore pattern without ``!`` and the trailing ``/`` to a regular expression text.
+    The regular expression matches path relative to the directory of the ignore file
+    """
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+
+    parts = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '*':
+            if pattern.startswith('**', index) and \
+               (index == 0 or pattern[index - 1] == '/') and \
+               (index + 2 == len(pattern) or pattern[index + 2] == '/'):
+                if index + 2 == len(pattern):  # 'dir/**', everything inside
+                    parts.append('.*')
+                    index += 2
+                else:  # '**/name' or 'dir/**/name', any count of directories
+                    parts.append('(?:.*/)?')
+                    index += 3
+            else:
+                parts.append('[^/]*')
+                while index < len(pattern) and pattern[index] == '*':
+                    index += 1
+        elif char == '?':
+            parts.append('[^/]')
+            index += 1
+        elif char == '[':
+            classText, index = _translateClass(pattern, index)
+            if classText is None:
+                parts.append(re.escape(char))
+                index += 1
+            else:
+                parts.append(classText)
+        elif char == '\\' and index + 1 < len(pattern):
+            parts.append(re.escape(pattern[index + 1]))
+            index += 2
+        else:
+            parts.append(re.escape(char))
+            index += 1
+
+    body = ''.join(parts)
+    if anchored:
+        return body + r'\Z'
+    else:
+        return '(?:.*/)?' + body + r'\Z'
+
+
+def parseRules(lines):
+    """Parse lines of an ignore file. Returns list of (regexp text, negated, directory only)
+    """
+    rules = []
+    for line in lines:
+        line = line.rstrip('\n').rstrip('\r')
+        if not line or line.startswith('#'):
+            continue
+        # Trailing spaces are ignored, if not escaped
+        stripped = line.rstrip(' ')
+        if stripped.endswith('\\') and len(stripped) < len(line):
+            stripped += ' '
+        line = stripped
+
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        elif line.startswith('\\!') or line.startswith('\\#'):
+            line = line[1:]
+
+        dirOnly = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+
+        rules.append((translate(line), negated, dirOnly))
+    return rules
+
+
+class _RuleSet:
+    """Rules of one ignore file
+    """
+
+    def __init__(self, rules):
+        self._rules = [(re.compile(text), negated, dirOnly)
+                       for text, negated, dirOnly in rules]
+        # Most of the paths don't match any rule. They are rejected with one regular expression
+        self._anyRe = re.compile('|'.join('(?:{})'.format(text) for text, _negated, _dirOnly in rules))
+
+    def match(self, path, isDir):
+        """Returns True if ignored, False if included back with ``!``, None if no rules matched
+        """
+        if self._anyRe.match(path) is None:
+            return None
+
+        for regExp, negated, dirOnly in reversed(self._rules):
+            if dirOnly and not isDir:
+                continue
+            if regExp.match(path) is not None:
+                return not negated
+        return None
+
+
+class DirectoryIgnoreRules:
+    """Rules, which apply to the entries of a directory
+    """
+
+    def __init__(self, layers):
+        self._layers = layers  # list of (_RuleSet, path prefix relative to the rule set directory)
+
+    def isIgnored(self, name, isDir):
+        if isDir and name == '.git':
+            return True
+
+        for ruleSet, prefix in self._layers:
+            result = ruleSet.match(prefix + name, isDir)
+            if result is not None:
+                return result
+        return False
+
+    def withOwnRuleSets(self, ownRuleSets):
+        """Rules of the same directory, extended with the rule sets of the directory itself
+        """
+        return DirectoryIgnoreRules([(ruleSet, '') for ruleSet in ownRuleSets] + self._layers)
+
+    def child(self, name, ownRuleSets):
+        """Rules of the subdirectory ``name``, which has own rule sets ``ownRuleSets``
+        """
+        inherited = DirectoryIgnoreRules([(ruleSet, prefix + name + '/') for ruleSet, prefix in self._layers])
+        return inherited.withOwnRuleSets(ownRuleSets)
+
+
+def _gitDirectory(path):
+    """Get the git directory of the repository, which working tree is ``path``. None if not a repository
+    """
+    dotGit = os.path.join(path, '.git')
+    if os.path.isdir(dotGit):
+        return dotGit
+    try:
+        with open(dotGit, encoding='utf8') as dotGitFile:  # worktree or submodule
+            content = dotGitFile.read().strip()
+    except (IOError, OSError, UnicodeDecodeError):
+        return None
+    if content.startswith('gitdir:'):
+        return os.path.join(path, content[len('gitdir:'):].strip())
+    return None
+
+
+class IgnoreRules:
+    """Rules of the ignore files for a directory tree.
+
+    ``forDirectory()`` is called from parallel threads of the walker. A rule set might be loaded twice then,
+    it doesn't break the result
+    """
+
+    def __init__(self, root):
+        self._root = root
+        self._loadedFiles = {}  # absolute path: mtime
+        self._dirRules = {}  # relative directory path: DirectoryIgnoreRules
+        self._rootParentRules = self._loadParentRules()
+
+    def _loadRuleSet(self, path):
+        """Load the ignore file. Returns _RuleSet or None, if there is no file or no rules in it
+        """
+        try:
+            with open(path, encoding='utf8', errors='replace') as ignoreFile:
+                mtime = os.fstat(ignoreFile.fileno()).st_mtime_ns
+                rules = parseRules(ignoreFile)
+        except (IOError, OSError):
+            return None
+
+        self._loadedFiles[path] = mtime
+        if rules:
+            return _RuleSet(rules)
+        else:
+            return None
+
+    def _loadDirectoryRuleSets(self, absDir, ignoreFileNames=None):
+        ruleSets = []
+        for name in IGNORE_FILE_NAMES:
+            if ignoreFileNames is None or name in ignoreFileNames:
+                ruleSet = self._loadRuleSet(os.path.join(absDir, name))
+                if ruleSet is not None:
+                    ruleSets.append(ruleSet)
+        return ruleSets
+
+    def _loadParentRules(self):
+        """Find the repository, which contains the root. Load rules of the directories from the repository
+        root to the parent of the tree root
+        """
+        root = os.path.abspath(self._root)
+        parents = []
+        path = root
+        while True:
+            gitDir = _gitDirectory(path)
+            if gitDir is not None:
+                break
+            parentPath = os.path.dirname(path)
+            if parentPath == path:  # not a repository, only own ignore files
+                return DirectoryIgnoreRules([])
+            parents.append(os.path.basename(path))
+            path = parentPath
+
+        excludeRuleSet = self._loadRuleSet(os.path.join(gitDir, 'info', 'exclude'))
+        rules = DirectoryIgnoreRules([(excludeRuleSet, '')] if excludeRuleSet is not None else [])
+        if not parents:  # the root is the repository root
+            return rules
+
+        # Directories from the repository root to the parent of the tree root
+        names = list(reversed(parents))
+        rules = rules.withOwnRuleSets(self._loadDirectoryRuleSets(path))
+        for name in names[:-1]:
+            path = os.path.join(path, name)
+            rules = rules.child(name, self._loadDirectoryRuleSets(path))
+        return rules.child(names[-1], [])
+
+    def forDirectory(self, relDir, ignoreFileNames=None):
+        """Get DirectoryIgnoreRules for the directory ``relDir``, relative to the tree root.
+        ``ignoreFileNames`` is a list of the ignore files, which exist in the directory,
+        if it is known from the directory listing. Otherwise all the ignore files are tried to be opened
+        """
+        rules = self._dirRules.get(relDir)
+        if rules is not None:
+            return rules
+
+        absDir = os.path.join(self._root, relDir) if relDir else self._root
+        ownRuleSets = self._loadDirectoryRuleSets(absDir, ignoreFileNames)
+        if relDir:
+            parentDir, name = os.path.split(relDir)
+            rules = self.forDirectory(parentDir).child(name, ownRuleSets)
+        else:
+            rules = self._rootParentRules.withOwnRuleSets(ownRuleSets)
+
+        self._dirRules[relDir] = rules
+        return rules
+
+    def loadedFiles(self):
+        """Ignore files, which have been read. Dictionary ``{absolute path: mtime}``
+        """
+        return dict(self._loadedFiles)
@@ -1,6 +1,10 @@
 """
 pathcompleter --- Path completer for Locator
 ============================================
+
+Locator creates a new completer on every key press. Directory listings are kept in a short-lived cache,
+shared by the completers, and icons are cached per file extension. Therefore typing a path in the same
+directory doesn't touch the file system
 """
 
 import sip
@@ -8,9 +12,14 @@ from PyQt5.QtCore import QFileInfo
 from PyQt5.QtWidgets import QApplication, QFileIconProvider, QStyle
 from PyQt5.QtGui import QPalette
 
+import collections
+import fnmatch
 import os
 import os.path
 import glob
+import re
+import threading
+import time
 
 from enki.lib.htmldelegate import htmlEscape
 from enki.core.locator import AbstractCompleter
@@ -18,13 +27,161 @@ from enki.core.core import core
 from functools import reduce
 
 
-def makeSuitableCompleter(text):
-    """Returns PathCompleter if text is normal path or GlobCompleter for glob
+class _DirectoryListingCache:
+    """Cache of directory listings. Used from the locator thread.
+
+    A listing is used without any checks during ``_TRUST_TIME``. Later mtime of the directory is checked.
+    A listing made soon after the directory modification is not validated by the mtime, because the next
+    modification might not change it
     """
-    if '*' in text or '?' in text or '[' in text:
-        return GlobCompleter(text)
+    _SIZE = 64
+    _TRUST_TIME = 2.  # seconds
+    _RACY_MTIME = 2.  # seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listings = collections.OrderedDict()  # path: (list time, mtime, {name: is directory})
+
+    def listing(self, path):
+        """Get dictionary ``{name: is directory}``. Symbolic links are followed.
+        Raises OSError, if failed to list the directory
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._listings.get(path)
+            if cached is not None:
+                self._listings.move_to_end(path)
+                listTime, mtime, entries = cached
+                if now - listTime < self._TRUST_TIME:
+                    return entries
+
+        if cached is not None and listTime - mtime > self._RACY_MTIME:
+            try:
+                newMtime = os.stat(path).st_mtime
+            except OSError:
+                newMtime = None
+            if newMtime == mtime:
+                with self._lock:
+                    self._listings[path] = (now, mtime, entries)
+                return entries
+
+        mtime = os.stat(path).st_mtime
+        entries = {}
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                try:
+                    entries[entry.name] = entry.is_dir()
+                except OSError:
+                    entries[entry.name] = False
+
+        with self._lock:
+            self._listings[path] = (now, mtime, entries)
+            self._listings.move_to_end(path)
+            while len(self._listings) > self._SIZE:
+                self._listings.popitem(last=False)
+        return entries
+
+    def isDirectory(self, path):
+        """Check if path is a directory. The listing of the parent directory is used
+        """
+        dirPath, name = os.path.split(path)
+        try:
+            isDir = self.listing(dirPath or os.curdir).get(name)
+        except OSError:
+            isDir = None
+
+        if isDir is None:  # '..' or failed to list
+            return os.path.isdir(path)
+        return isDir
+
+
+_listingCache = _DirectoryListingCache()
+_iconCache = {}  # file extension or None for directories: QIcon. Used in the GUI thread
+
+
+def _matchingNames(dirPath, matchRe, matchHidden, filterRe, dirsOnly=False):
+    """Sorted (name, is directory) in the directory, which match ``matchRe``, or all if it is None.
+    Names, which start with ``.``, match only if ``matchHidden``.
+    Names, which match ``filterRe``, are skipped
+    """
+    try:
+        listing = _listingCache.listing(dirPath or os.curdir)
+    except OSError:
+        return []
+
+    result = []
+    for name, isDir in sorted(listing.items()):
+        if dirsOnly and not isDir:
+            continue
+        if name.startswith('.') and not matchHidden:
+            continue
+        if filterRe is not None and filterRe.match(name):
+            continue
+        if matchRe is None or matchRe.match(name):
+            result.append((name, isDir))
+    return result
+
+
+def iterGlob(pattern, filterRe=None, stopEvent=None):
+    """Generator of (path, is directory), which match the glob pattern.
+
+    ``**`` segment matches any count of directories, including none. Symbolic links to directories
+    are not followed by ``**``.
+    Directories are walked depth first, in order of the names. Directories, which match ``filterRe``,
+    are not walked. The generator returns, when ``stopEvent`` is set. It is checked between directories
+    """
+    drive, pattern = os.path.splitdrive(pattern)
+    if os.altsep:
+        pattern = pattern.replace(os.altsep, os.sep)
+    parts = pattern.split(os.sep)
+    if parts[0] == '':  # absolute path
+        root = drive + os.sep
+        parts = parts[1:]
     else:
-        return PathCompleter(text)
+        root = drive
+
+    # Literal prefix
+    while len(parts) > 1 and not glob.has_magic(parts[0]):
+        root = os.path.join(root, parts[0])
+        parts = parts[1:]
+
+    lastIndex = len(parts) - 1
+    regExps = [re.compile(fnmatch.translate(part)) if glob.has_magic(part) and part != '**' else None
+               for part in parts]
+
+    stack = [(root, 0)]  # (directory path, index of the segment to match in it)
+    while stack:
+        if stopEvent is not None and stopEvent.is_set():
+            return
+
+        dirPath, index = stack.pop()
+        part = parts[index]
+        if part == '**':
+            matching = _matchingNames(dirPath, None, False, filterRe)
+            if index == lastIndex:  # everything inside
+                for name, isDir in matching:
+                    yield os.path.join(dirPath, name), isDir
+
+            subDirs = [os.path.join(dirPath, name) for name, isDir in matching if isDir]
+            subDirs = [path for path in subDirs if not os.path.islink(path)]
+            stack.extend((path, index) for path in reversed(subDirs))
+            if index < lastIndex:
+                stack.append((dirPath, index + 1))  # none directories matched
+        elif regExps[index] is not None:
+            matching = _matchingNames(dirPath, regExps[index], part.startswith('.'), filterRe,
+                                      dirsOnly=index < lastIndex)
+            if index == lastIndex:
+                for name, isDir in matching:
+                    yield os.path.join(dirPath, name), isDir
+            else:
+                stack.extend((os.path.join(dirPath, name), index + 1) for name, isDir in reversed(matching))
+        else:
+            path = os.path.join(dirPath, part)
+            if index == lastIndex:
+                if os.path.lexists(path):
+                    yield path, _listingCache.isDirectory(path)
+            elif os.path.isdir(path):
+                stack.append((path, index + 1))
 
 
 class AbstractPathCompleter(AbstractCompleter):
@@ -107,10 +264,18 @@ class AbstractPathCompleter(AbstractCompleter):
             count += len(self._files)
             return count
 
-    def _iconForPath(self, path):
-        """Get icon for file or directory path.
+    def _iconForPath(self, path, isDir):
+        """Get icon for file or directory path. Cached for the file extension
         """
-        return QFileIconProvider().icon(QFileInfo(path))
+        key = None if isDir else os.path.splitext(path)[1].lower()
+        icon = _iconCache.get(key)
+        if icon is None:
+            if isDir:
+                icon = QFileIconProvider().icon(QFileIconProvider.Folder)
+            else:
+                icon = QFileIconProvider().icon(QFileInfo(path))
+            _iconCache[key] = icon
+        return icon
 
     def text(self, row, column):
         """Item text in the list of completions
@@ -138,9 +303,9 @@ class AbstractPathCompleter(AbstractCompleter):
         elif rowType == self._STATUS:
             return None
         elif rowType == self._DIRECTORY:
-            return self._iconForPath(self._dirs[index])
+            return self._iconForPath(self._dirs[index], True)
         elif rowType == self._FILE:
-            return self._iconForPath(self._files[index])
+            return self._iconForPath(self._files[index], False)
 
     def isSelectable(self, row, column):
         rowType, index = self._classifyRowIndex(row)
@@ -188,16 +353,17 @@ class PathCompleter(AbstractPathCompleter):
         if self._path != '/':
             self._path += '/'
 
-        if not os.path.isdir(self._path):
+        try:
+            listing = _listingCache.listing(self._path)
+        except (FileNotFoundError, NotADirectoryError):
             self._status = 'No directory %s' % self._path
             return
-
-        try:
-            filesAndDirs = os.listdir(self._path)
         except OSError as ex:
             self._error = str(ex)
             return
 
+        filesAndDirs = list(listing)
+
         if not filesAndDirs:
             self._status = 'Empty directory'
             return
@@ -218,7 +384,7 @@ class PathCompleter(AbstractPathCompleter):
 
         for variant in variants:
             absPath = os.path.join(self._path, variant)
-            if os.path.isdir(absPath):
+            if listing[variant]:
                 self._dirs.append(absPath)
             else:
                 self._files.append(absPath)
@@ -278,24 +444,54 @@ class PathCompleter(AbstractPathCompleter):
 class GlobCompleter(AbstractPathCompleter):
     """Path completer for Locator. Supports globs, does not support inline completion
 
-    Used by Open command
+    Used by Open command.
+    Paths are searched by ``iterGlob()``, found paths are published while searching.
+    Only ``_MAX_SHOWN`` paths are shown, the rest are counted
     """
+    _MAX_SHOWN = 500
 
     def __init__(self, text):
         AbstractPathCompleter.__init__(self, text)
+        self._moreCount = 0
 
     def load(self, stopEvent):
-        variants = glob.iglob(os.path.expanduser(self._originalText) + '*')
-        variants = sorted(self._filterHidden(variants))
-
-        for path in sorted(variants):
-            if os.path.isdir(path):
+        pattern = os.path.expanduser(self._originalText) + '*'
+        for path, isDir in iterGlob(pattern, core.fileFilter().regExp(), stopEvent):
+            if len(self._dirs) + len(self._files) >= self._MAX_SHOWN:
+                self._moreCount += 1
+            elif isDir:
                 self._dirs.append(path)
             else:
                 self._files.append(path)
+            self.publishPartialResults(self._snapshot)
 
-        if not self._dirs and not self._files:
-            self._status = 'No matching files'
+        if stopEvent.is_set():
+            return
+
+        self._dirs.sort()
+        self._files.sort()
+        self._status = self._statusText(True)
+
+    def _statusText(self, finished):
+        if self._moreCount:
+            status = '{} more...'.format(self._moreCount)
+        elif finished and not self._dirs and not self._files:
+            status = 'No matching files'
+        else:
+            status = None
+
+        if not finished:
+            status = 'Searching... ' + status if status else 'Searching...'
+        return status
+
+    def _snapshot(self):
+        """Copy of the completer with the paths found so far
+        """
+        snapshot = GlobCompleter(self._originalText)
+        snapshot._dirs = sorted(self._dirs)
+        snapshot._files = sorted(self._files)
+        snapshot._status = self._statusText(False)
+        return snapshot
 
     def _formatPath(self, path, isDir):
         """GlobCompleter shows paths as is
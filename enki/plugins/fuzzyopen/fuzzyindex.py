@@ -0,0 +1,325 @@
+"""
+fuzzyindex --- Fuzzy search in the project files
+================================================
+
+Paths are lowercased once per file list, not on every key press.
+
+If a file doesn't match a pattern, it doesn't match any pattern, which contains the first one as
+a subsequence. Therefore, when the pattern grows, only files, which have matched the previous pattern,
+are checked.
+
+Only the best items are shown. They are kept in a bounded heap, matching files are not sorted.
+
+A matching path can't get a score better than ``basename length + 2 - pattern length``. Files are
+checked in order of the basename length. When the bound is worse than all the shown items,
+the rest of the files are not checked.
+
+If NumPy is installed, big file lists are packed by ``packedpaths``. Candidates are prefiltered by
+the character masks, and many candidates are scored at once instead of one by one
+"""
+
+import heapq
+import os
+
+from enki.plugins.fuzzyopen import packedpaths
+
+
+def fuzzyMatch(reversed_pattern, text):
+    """Match text with pattern and return
+        (score, list of matching indexes)
+        or None
+
+    Score is a summa or distances of continuos matched peaces from the end of the text.
+    Less peaces -> better mathing
+    Peaces close to the end -> better matching
+
+    Reverse matching is used because symbols at the end of the path are usually more impotant.
+
+    pattern shall be already reversed for performance reasons
+    """
+    indexes = []
+    score = 0
+    text_len = len(text)
+
+    index = text_len + 1
+    prev_match = index
+    for char in reversed_pattern:
+        index = text.rfind(char, 0, index)
+        if index == -1:
+            return None, None
+
+        indexes.append(index)
+        if index + 1 != prev_match:
+            score += text_len - index
+
+        prev_match = index
+
+    # find next /. Closer - better
+    slash_index = text.rfind(os.sep, 0, index)
+    if slash_index != -1:
+        score += index - slash_index
+
+    return score, indexes
+
+
+def fuzzyScore(reversedPattern, text):
+    """Score of ``fuzzyMatch()`` without the list of indexes. None if the text doesn't match
+    """
+    textLen = len(text)
+    rfind = text.rfind
+    score = 0
+
+    index = textLen + 1
+    prevMatch = index
+    for char in reversedPattern:
+        index = rfind(char, 0, index)
+        if index == -1:
+            return None
+        if index + 1 != prevMatch:
+            score += textLen - index
+        prevMatch = index
+
+    slashIndex = rfind(os.sep, 0, index)
+    if slashIndex != -1:
+        score += index - slashIndex
+
+    return score
+
+
+def _isSubsequence(short, long_):
+    """Check if all characters of ``short`` are in ``long_`` in the same order
+    """
+    iterator = iter(long_)
+    return all(char in iterator for char in short)
+
+
+class FuzzyIndex:
+    """Index of the project files for the fuzzy search.
+
+    ``search()`` is called from the locator thread. Calls are not parallel
+    """
+    _STOP_CHECK_PERIOD = 1000  # check the stop event every this count of files
+    _PACK_MIN_COUNT = 10000  # smaller lists are searched in pure Python, if NumPy is available
+    _VECTORIZE_MIN_COUNT = 5000  # less candidates are scored one by one
+    _VECTORIZE_CHUNK_SIZE = 4096  # the first chunk of the candidates, scored at once
+
+    def __init__(self, files):
+        self.files = files
+        self._lowerFiles = None
+        self._lowerLengthChanged = False  # some characters are longer in the lower case
+        self._order = None  # file indexes ordered by the basename length
+        self._orderKeys = None  # basename length + 1, 0 if there is no separator in the path
+        self._lastPattern = None
+        self._lastCandidates = None  # indexes of the files, which match _lastPattern
+        self._orderArray = None  # _order as a NumPy array
+        self._orderKeysArray = None
+        self._packed = {}  # case sensitive: PackedPaths
+
+    def _texts(self, caseSensitive):
+        if caseSensitive:
+            return self.files
+
+        if self._lowerFiles is None:
+            self._lowerFiles = [path.lower() for path in self.files]
+            self._lowerLengthChanged = sum(map(len, self._lowerFiles)) != sum(map(len, self.files))
+        return self._lowerFiles
+
+    def _candidates(self, pattern):
+        """Indexes of the files, which might match the pattern, ordered by the basename length
+        """
+        if self._lastPattern is not None and _isSubsequence(self._lastPattern, pattern):
+            return self._lastCandidates
+
+        if self._order is None:
+            sep = os.sep
+            self._orderKeys = [len(path) - path.rfind(sep) if sep in path else 0
+                               for path in self.files]
+            self._order = sorted(range(len(self.files)), key=self._orderKeys.__getitem__)
+        return self._order
+
+    def _packedPaths(self, caseSensitive):
+        """PackedPaths of the texts, or None if NumPy is not available or the list is small
+        """
+        if packedpaths.numpy is None or len(self.files) < self._PACK_MIN_COUNT:
+            return None
+
+        packed = self._packed.get(caseSensitive)
+        if packed is None:
+            packed = packedpaths.PackedPaths(self._texts(caseSensitive))
+            self._packed[caseSensitive] = packed
+        return packed
+
+    def search(self, pattern, openFiles, maxCount, stopEvent):
+        """Find ``maxCount`` best matching files. Opened files get a bonus.
+        Search is case sensitive, if the pattern contains upper case characters.
+
+        Returns list of (path, score, matching indexes), or None if ``stopEvent`` is set
+        """
+        caseSensitive = any(char.isupper() for char in pattern)
+        if not caseSensitive:
+            pattern = pattern.lower()
+        reversedPattern = pattern[::-1]
+
+        openTexts = openFiles if caseSensitive else [path.lower() for path in openFiles]
+        matching = []
+        for path, text in zip(openFiles, openTexts):
+            score, indexes = fuzzyMatch(reversedPattern, text)
+            if indexes:
+                matching.append((path, score / 100, indexes))  # bonus for opened files
+        openTexts = set(openTexts)
+
+        texts = self._texts(caseSensitive)
+        candidates = self._candidates(pattern)
+        packed = self._packedPaths(caseSensitive)
+        if packed is not None:
+            if candidates is self._order:
+                if self._orderArray is None:
+                    self._orderArray = packedpaths.numpy.array(self._order, dtype=packedpaths.numpy.int64)
+                candidates = self._orderArray
+            candidates = packed.prefilter(candidates, pattern)
+            if len(candidates) >= self._VECTORIZE_MIN_COUNT:
+                best = self._bestVectorized(packed, candidates, pattern, texts, openTexts, maxCount, stopEvent)
+            else:
+                best = self._best(candidates.tolist(), pattern, texts, openTexts, maxCount, stopEvent)
+        else:
+            best = self._best(candidates, pattern, texts, openTexts, maxCount, stopEvent)
+
+        if best is None:
+            return None
+
+        self._lastPattern = pattern
+        for fileIndex in best:
+            score, indexes = fuzzyMatch(reversedPattern, texts[fileIndex])
+            matching.append((self.files[fileIndex], score, indexes))
+
+        matching.sort(key=lambda item: item[1])  # opened files first, if the score is the same
+        return matching[:maxCount]
+
+    def _best(self, candidates, pattern, texts, openTexts, maxCount, stopEvent):
+        """Score the candidates one by one. Returns indexes of the best not opened files
+        ordered by the score, or None if stopped. Sets the candidates for the next search
+        """
+        reversedPattern = pattern[::-1]
+        orderKeys = self._orderKeys
+        # The bound is calculated for the original case paths
+        useBound = texts is self.files or not self._lowerLengthChanged
+        boundOffset = 1 - len(pattern)
+        newCandidates = []
+        best = []  # heap of (-score, -index), the worst of the best items is the first
+        worstScore = None  # the worst of the best items, when the heap is full
+        worstIndex = None
+        for counter, fileIndex in enumerate(candidates):
+            if not counter % self._STOP_CHECK_PERIOD and stopEvent.is_set():
+                return None
+
+            if worstScore is not None and useBound and orderKeys[fileIndex] + boundOffset > worstScore:
+                # This and the following files can't be better. They might match the next pattern
+                newCandidates.extend(candidates[counter:])
+                break
+
+            text = texts[fileIndex]
+            score = fuzzyScore(reversedPattern, text)
+            if score is None:
+                continue
+
+            newCandidates.append(fileIndex)
+            # Most of the files are worse than the best ones
+            if worstScore is not None and \
+               (score > worstScore or (score == worstScore and fileIndex > worstIndex)):
+                continue
+            if text in openTexts:
+                continue
+
+            if worstScore is None:
+                heapq.heappush(best, (-score, -fileIndex))
+                if len(best) < maxCount:
+                    continue
+            else:
+                heapq.heapreplace(best, (-score, -fileIndex))
+            worstScore, worstIndex = -best[0][0], -best[0][1]
+
+        self._lastCandidates = newCandidates
+        return [-negIndex for negScore, negIndex in sorted(best, reverse=True)]
+
+    def _bestVectorized(self, packed, candidates, pattern, texts, openTexts, maxCount, stopEvent):
+        """Score the candidates with PackedPaths by chunks. Same result as ``_best()``.
+        The chunks grow, until the bound stops the search
+        """
+        numpy = packedpaths.numpy
+        reversedPattern = pattern[::-1]
+        bounds = None
+        if texts is self.files or not self._lowerLengthChanged:
+            bounds = self._orderKeyArray()[candidates] + (1 - len(pattern))
+
+        matchedParts = []
+        scoreParts = []
+        best = []
+        worstScore = None
+        processed = 0
+        chunkSize = self._VECTORIZE_CHUNK_SIZE
+        while processed < len(candidates):
+            if stopEvent.is_set():
+                return None
+
+            end = processed + chunkSize
+            if worstScore is not None and bounds is not None:
+                # The rest of the candidates can't be better. They might match the next pattern
+                end = min(end, int(numpy.searchsorted(bounds, worstScore, side='right')))
+                if end <= processed:
+                    break
+
+            matched, scores = packed.scores(candidates[processed:end], reversedPattern)
+            matchedParts.append(matched)
+            scoreParts.append(scores)
+            processed = end
+            chunkSize *= 2
+            best, worstScore = self._selectBest(numpy.concatenate(matchedParts), numpy.concatenate(scoreParts),
+                                                texts, openTexts, maxCount)
+
+        self._lastCandidates = numpy.concatenate(matchedParts + [candidates[processed:]])
+        return best
+
+    def _selectBest(self, matched, scores, texts, openTexts, maxCount):
+        """Select the best not opened files of the scored ones.
+        Returns (file indexes ordered by the score, the worst score if ``maxCount`` files are selected)
+        """
+        numpy = packedpaths.numpy
+        # Unique key, ordered by the score, then by the file index
+        keys = scores.astype(numpy.int64) * len(self.files) + matched
+        count = min(maxCount + len(openTexts), len(keys))
+        while True:
+            if count < len(keys):
+                selected = numpy.argpartition(keys, count - 1)[:count]
+            else:
+                selected = numpy.arange(len(keys))
+            selected = selected[numpy.argsort(keys[selected])]
+            best = [(fileIndex, score)
+                    for fileIndex, score in zip(matched[selected].tolist(), scores[selected].tolist())
+                    if texts[fileIndex] not in openTexts]
+            # Several files might be skipped as opened, if their lower case paths are the same
+            if len(best) >= maxCount or count == len(keys):
+                break
+            count = min(count * 2, len(keys))
+
+        best = best[:maxCount]
+        worstScore = best[-1][1] if len(best) == maxCount else None
+        return [fileIndex for fileIndex, score in best], worstScore
+
+    def _orderKeyArray(self):
+        """``_orderKeys`` as a NumPy array
+        """
+        if self._orderKeysArray is None:
+            self._orderKeysArray = packedpaths.numpy.array(self._orderKeys, dtype=packedpaths.numpy.int64)
+        return self._orderKeysArray
+
+    def firstFiles(self, openFiles, maxCount):
+        """Files to show, when the pattern is empty. Opened files first
+        """
+        openFileSet = set(openFiles)
+        result = list(openFiles[:maxCount])
+        for path in self.files:
+            if len(result) >= maxCount:
+                break
+            if path not in openFileSet:
+                result.append(path)
+        return result
@@ -4,47 +4,21 @@ import os.path
 from enki.core.core import core
 
 from enki.core.locator import AbstractCommand, AbstractCompleter, StatusCompleter, InvalidCmdArgs
+from enki.plugins.fuzzyopen.fuzzyindex import FuzzyIndex
 
 
-def fuzzyMatch(reversed_pattern, text):
-    """Match text with pattern and return
-        (score, list of matching indexes)
-        or None
+_MAX_COUNT = 32
 
-    Score is a summa or distances of continuos matched peaces from the end of the text.
-    Less peaces -> better mathing
-    Peaces close to the end -> better matching
+_fuzzyIndex = None
 
-    Reverse matching is used because symbols at the end of the path are usually more impotant.
 
-    pattern shall be already reversed for performance reasons
+def _indexForFiles(files):
+    """Get FuzzyIndex of the file list. The index is kept, until the project files are changed
     """
-    indexes = []
-    score = 0
-    text_len = len(text)
-
-    index = text_len + 1
-    prev_match = index
-    for char in reversed_pattern:
-        index = text.rfind(char, 0, index)
-        if index == -1:
-            return None, None
-
-        indexes.append(index)
-        if index + 1 != prev_match:
-            score += text_len - index
-
-        prev_match = index
-
-    # find next /. Closer - better
-    slash_index = text.rfind(os.sep, 0, index)
-    if slash_index != -1:
-        score += index - slash_index
-
-    return score, indexes
-
-
-_MAX_COUNT = 32
+    global _fuzzyIndex
+    if _fuzzyIndex is None or _fuzzyIndex.files is not files:
+        _fuzzyIndex = FuzzyIndex(files)
+    return _fuzzyIndex
 
 
 class FuzzyOpenCompleter(AbstractCompleter):
@@ -58,7 +32,7 @@ class FuzzyOpenCompleter(AbstractCompleter):
             '<div style="margin: 15px; font-size:{smallerFont}pt">{{}}</div>'.format(smallerFont=smallerFont))
 
         self._pattern = pattern
-        self._files = files
+        self._index = _indexForFiles(files)
         self._items = []
 
     def _openFiles(self):
@@ -75,53 +49,14 @@ class FuzzyOpenCompleter(AbstractCompleter):
 
 
     def load(self, stopEvent):
-        origCaseOpenFiles = self._openFiles()
-
-        origCaseFiles = self._files
-
-        caseSensitive = any([c.isupper() for c in self._pattern])
-
-        if not caseSensitive:
-            self._pattern = self._pattern.lower()
+        openFiles = self._openFiles()
 
         if self._pattern:
-            if caseSensitive:
-                pattern = self._pattern
-                openFiles = origCaseOpenFiles
-                files = origCaseFiles
-            else:
-                pattern = self._pattern.lower()
-                openFiles = [f.lower() for f in origCaseOpenFiles]
-                files = [f.lower() for f in origCaseFiles]
-
-            reversed_pattern = pattern[::-1]
-
-            matching = []
-
-            for i, path in enumerate(openFiles):
-                score, indexes = fuzzyMatch(reversed_pattern, path)
-                if indexes:
-                    score /= 100  # bonus for opened files
-                    # Using original case path here
-                    matching.append((origCaseOpenFiles[i], score, indexes))
-
-            for i, path in enumerate(files):
-                if path not in openFiles:
-                    score, indexes = fuzzyMatch(reversed_pattern, path)
-                    if indexes:
-                        matching.append((origCaseFiles[i], score, indexes))
-
-                    if not (i % 100):
-                        if stopEvent.is_set():
-                            return
-
-            matching.sort(key=lambda item: item[1])  # sort starting from minimal score
-            self._items = matching[:_MAX_COUNT]
+            items = self._index.search(self._pattern, openFiles, _MAX_COUNT, stopEvent)
+            if items is not None:
+                self._items = items
         else:
-            allFiles = origCaseOpenFiles + [f
-                                            for f in origCaseFiles
-                                            if f not in origCaseOpenFiles]
-            self._items = [(item, 0, []) for item in allFiles[:_MAX_COUNT]]
+            self._items = [(item, 0, []) for item in self._index.firstFiles(openFiles, _MAX_COUNT)]
 
     def rowCount(self):
         return len(self._items)
@@ -164,6 +99,7 @@ class FuzzyOpenCommand(AbstractCommand):
         self._clickedPath = None
 
         core.project().filesReady.connect(self.updateCompleter)
+        core.project().filesChanged.connect(self.updateCompleter)
         core.project().scanStatusChanged.connect(self.updateCompleter)
         if not core.project().isScanning():
             core.project().startLoadingFiles()
@@ -176,6 +112,7 @@ class FuzzyOpenCommand(AbstractCommand):
             core.project().cancelLoadingFiles()
 
         core.project().filesReady.disconnect(self.updateCompleter)
+        core.project().filesChanged.disconnect(self.updateCompleter)
         core.project().scanStatusChanged.disconnect(self.updateCompleter)
 
     def setArgs(self, args):
@@ -0,0 +1,153 @@
+"""
+packedpaths --- Vectorized fuzzy matching with NumPy
+====================================================
+
+Paths are packed into one contiguous array of character codes. Path ``i`` is
+``codes[starts[i]:ends[i]]``.
+
+Every path has a 64 bit mask of the characters it contains. Files, which don't contain all the
+characters of the pattern, are rejected in bulk by the masks.
+
+The survivors are matched by the same algorithm as ``fuzzyindex.fuzzyScore()``, but for all the files
+at once. The last occurrence of a character before a position is found with a binary search
+in the sorted list of the character positions in the packed array. The lists are built on the first use
+of a character and are kept with the packed paths.
+
+NumPy is optional. ``numpy`` is None, if it is not installed
+"""
+
+import os
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_MASK_CHUNK_SIZE = 1 << 20  # characters processed at once, when building the masks
+
+# Letters and digits have own bits in the character mask. Other ASCII characters share
+# _OTHER_ASCII_BIT, all the non ASCII characters share _NON_ASCII_BIT
+_OWN_BIT_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+_OTHER_ASCII_BIT = 62
+_NON_ASCII_BIT = 63
+
+
+def _charBit(char):
+    bit = _OWN_BIT_CHARS.find(char)
+    if bit != -1:
+        return bit
+    return _OTHER_ASCII_BIT if ord(char) < 128 else _NON_ASCII_BIT
+
+
+def _bitTable():
+    """Bits of the character codes 0..128. Code 128 stands for all the non ASCII characters
+    """
+    return numpy.array([_charBit(chr(code)) for code in range(128)] + [_NON_ASCII_BIT], dtype=numpy.uint64)
+
+
+class PackedPaths:
+    """Paths, packed for the vectorized matching
+    """
+
+    def __init__(self, texts):
+        try:
+            data = ''.join(texts).encode('latin-1')
+            self._codes = numpy.frombuffer(data, dtype=numpy.uint8)
+        except UnicodeEncodeError:
+            data = ''.join(texts).encode('utf-32-le')
+            self._codes = numpy.frombuffer(data, dtype=numpy.uint32)
+
+        # Positions are stored in the smallest type. Searching an array of another type converts it
+        self._positionType = numpy.int32 if len(self._codes) < 2 ** 31 else numpy.int64
+        lengths = numpy.fromiter(map(len, texts), dtype=self._positionType, count=len(texts))
+        self._ends = numpy.cumsum(lengths, dtype=self._positionType)
+        self._starts = self._ends - lengths
+        self._masks = self._buildMasks(lengths)
+        self._charPositions = {}  # character: sorted positions in the packed array
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _buildMasks(self, lengths):
+        masks = numpy.zeros(len(lengths), dtype=numpy.uint64)
+        nonEmpty = numpy.flatnonzero(lengths)
+        if not len(nonEmpty):
+            return masks
+
+        table = _bitTable()
+        one = numpy.uint64(1)
+        starts = self._starts[nonEmpty]
+        chunkBegin = 0
+        while chunkBegin < len(nonEmpty):
+            # Chunks are aligned to the path boundaries
+            chunkEnd = int(numpy.searchsorted(starts, starts[chunkBegin] + _MASK_CHUNK_SIZE))
+            chunkEnd = max(chunkEnd, chunkBegin + 1)
+            codeBegin = int(starts[chunkBegin])
+            codeEnd = int(self._ends[nonEmpty[chunkEnd - 1]])
+
+            codes = numpy.minimum(self._codes[codeBegin:codeEnd], 128)
+            bits = numpy.left_shift(one, table[codes])
+            masks[nonEmpty[chunkBegin:chunkEnd]] = numpy.bitwise_or.reduceat(
+                bits, starts[chunkBegin:chunkEnd] - codeBegin)
+            chunkBegin = chunkEnd
+        return masks
+
+    def _positions(self, char):
+        """Sorted positions of the character in the packed array. Cached
+        """
+        positions = self._charPositions.get(char)
+        if positions is None:
+            code = ord(char)
+            if code > numpy.iinfo(self._codes.dtype).max:
+                positions = numpy.zeros(0, dtype=self._positionType)
+            else:
+                positions = numpy.flatnonzero(self._codes == code).astype(self._positionType)
+            self._charPositions[char] = positions
+        return positions
+
+    def prefilter(self, indexes, pattern):
+        """Indexes of the files, which contain all the characters of the pattern. The order is kept
+        """
+        patternMask = 0
+        for char in set(pattern):
+            patternMask |= 1 << _charBit(char)
+        patternMask = numpy.uint64(patternMask)
+
+        indexes = numpy.asarray(indexes, dtype=numpy.int64)
+        return indexes[(self._masks[indexes] & patternMask) == patternMask]
+
+    def scores(self, indexes, reversedPattern):
+        """Score the files as ``fuzzyScore()`` does.
+        Returns (indexes of the matching files in the same order, their scores)
+        """
+        indexes = numpy.asarray(indexes, dtype=numpy.int64)
+        starts = self._starts[indexes]
+        ends = self._ends[indexes]
+        scores = numpy.zeros(len(indexes), dtype=self._positionType)
+        # Positions are global in the codes array. The search is done before the limit
+        limits = ends
+        previous = ends + 1
+
+        for char in reversedPattern:
+            positions = self._positions(char)
+            found = numpy.searchsorted(positions, limits) - 1
+            matches = positions[numpy.maximum(found, 0)] if len(positions) else found
+            alive = (found >= 0) & (matches >= starts)
+            if not alive.all():
+                alive = numpy.flatnonzero(alive)
+                indexes, starts, ends, scores, limits, previous, matches = \
+                    (array[alive] for array in (indexes, starts, ends, scores, limits, previous, matches))
+
+            scores += numpy.where(matches + 1 != previous, ends - matches, 0)
+            limits = previous = matches
+
+        # find next /. Closer - better
+        sepPositions = self._positions(os.sep)
+        if len(sepPositions):
+            found = numpy.searchsorted(sepPositions, limits) - 1
+            slashes = sepPositions[numpy.maximum(found, 0)]
+            hasSlash = (found >= 0) & (slashes >= starts)
+            scores += numpy.where(hasSlash, limits - slashes, 0)
+
+        return indexes, scores
@@ -0,0 +1,264 @@
+# .. -*- coding: utf-8 -*-
+# *****************************************************************************
+# alignment_map.py - map locations between the source text and the preview text
+# *****************************************************************************
+# An AlignmentMap_ is computed once per rendered preview. It pairs blocks of
+# identical text in a source document and in the plain text of its preview.
+# Afterwards, mapping a location in one text to the other is a binary search for
+# the enclosing block. A location between blocks is refined by the LCS
+# algorithm of refineSearchResult_, applied only to the short stretch of text
+# between the neighbouring blocks.
+#
+# When a location lies in a long stretch of text without blocks (for example,
+# text which the preview renders very differently), the map returns None, and
+# the caller falls back to findApproxTextInTarget_.
+#
+# Imports
+# =======
+# These are listed in the order prescribed by `PEP 8
+# <http://www.python.org/dev/peps/pep-0008/#imports>`_.
+#
+# Library imports
+# ---------------
+import bisect
+import collections
+#
+# Local application imports
+# -------------------------
+from .approx_match import refineSearchResult
+#
+# Tuning
+# ======
+# Blocks are found from strings of this length which occur exactly once in each
+# text.
+GRAM_LENGTH = 10
+# A location in a longer stretch of text between two blocks isn't mapped.
+MAX_GAP = 500
+# The number of characters of the neighbouring blocks included in the text
+# which refineSearchResult_ aligns, so that LCS is anchored by them.
+GAP_CONTEXT = 20
+#
+# AlignmentMap
+# ============
+class AlignmentMap:
+    def __init__(self,
+      # The text of the source document.
+      sourceText,
+      # The plain text of the preview.
+      targetText,
+      # An AlignmentMap of the previous versions of these texts, or None. The
+      # blocks of the text which didn't change are reused from it, so that only
+      # the changed part of the texts is aligned.
+      previous=None):
+
+        self.sourceText = sourceText
+        self.targetText = targetText
+        if previous is None:
+            blocks = _matchingBlocks(sourceText, 0, len(sourceText),
+                                     targetText, 0, len(targetText))
+        else:
+            blocks = previous._updatedBlocks(sourceText, targetText)
+        blocks = _extendBlocks(sourceText, targetText, blocks)
+        # Each block is ``sourceText[sourceStart:sourceStart + length] ==
+        # targetText[targetStart:targetStart + length]``. Blocks are ordered
+        # and don't overlap in both texts.
+        self._sourceStarts = [block[0] for block in blocks]
+        self._targetStarts = [block[1] for block in blocks]
+        self._lengths = [block[2] for block in blocks]
+
+    # Return the index in the targetText which corresponds to the given index
+    # in the sourceText, or None if it isn't known.
+    def sourceToTarget(self, sourceIndex):
+        return self._map(sourceIndex, self.sourceText, self._sourceStarts,
+                         self.targetText, self._targetStarts)
+
+    # Return the index in the sourceText which corresponds to the given index
+    # in the targetText, or None if it isn't known.
+    def targetToSource(self, targetIndex):
+        return self._map(targetIndex, self.targetText, self._targetStarts,
+                         self.sourceText, self._sourceStarts)
+
+    def _map(self, index, fromText, fromStarts, toText, toStarts):
+        lengths = self._lengths
+        block = bisect.bisect_right(fromStarts, index) - 1
+        # An index inside a block, or just after it, has an exact counterpart.
+        if block >= 0 and index <= fromStarts[block] + lengths[block]:
+            return toStarts[block] + index - fromStarts[block]
+
+        # Otherwise, the index lies in a gap between two blocks (or a text
+        # boundary). Include a little of the neighbouring blocks in the gap.
+        if block >= 0:
+            context = min(GAP_CONTEXT, lengths[block])
+            fromBegin = fromStarts[block] + lengths[block] - context
+            toBegin = toStarts[block] + lengths[block] - context
+        else:
+            fromBegin = toBegin = 0
+        if block + 1 < len(fromStarts):
+            context = min(GAP_CONTEXT, lengths[block + 1])
+            fromEnd = fromStarts[block + 1] + context
+            toEnd = toStarts[block + 1] + context
+        else:
+            fromEnd = len(fromText)
+            toEnd = len(toText)
+
+        if fromEnd - fromBegin > MAX_GAP + 2*GAP_CONTEXT or \
+           toEnd - toBegin > MAX_GAP + 2*GAP_CONTEXT:
+            return None
+        offset = refineSearchResult(fromText[fromBegin:fromEnd],
+                                    index - fromBegin,
+                                    toText[toBegin:toEnd])[0]
+        if offset == -1:
+            return None
+        return toBegin + offset
+
+    # Return the blocks for new versions of the texts. The blocks in the
+    # common prefix and suffix of the old and new texts are kept; only the
+    # text between them is matched.
+    def _updatedBlocks(self, sourceText, targetText):
+        sourcePrefix, sourceSuffix = _commonEnds(self.sourceText, sourceText)
+        targetPrefix, targetSuffix = _commonEnds(self.targetText, targetText)
+        oldSourceEnd = len(self.sourceText) - sourceSuffix
+        oldTargetEnd = len(self.targetText) - targetSuffix
+        sourceShift = len(sourceText) - len(self.sourceText)
+        targetShift = len(targetText) - len(self.targetText)
+
+        oldBlocks = list(zip(self._sourceStarts, self._targetStarts,
+                             self._lengths))
+        # Keep the parts of the blocks which lie in both prefixes.
+        blocks = []
+        for sourceStart, targetStart, length in oldBlocks:
+            length = min(length, sourcePrefix - sourceStart,
+                         targetPrefix - targetStart)
+            if length <= 0:
+                break
+            blocks.append((sourceStart, targetStart, length))
+
+        blocks += _matchingBlocks(sourceText, sourcePrefix,
+                                  oldSourceEnd + sourceShift,
+                                  targetText, targetPrefix,
+                                  oldTargetEnd + targetShift)
+
+        # Keep the parts of the blocks which lie in both suffixes, moved by
+        # the change of the text lengths.
+        for sourceStart, targetStart, length in oldBlocks:
+            skip = max(0, oldSourceEnd - sourceStart, oldTargetEnd - targetStart)
+            if skip < length:
+                blocks.append((sourceStart + skip + sourceShift,
+                               targetStart + skip + targetShift,
+                               length - skip))
+        return blocks
+#
+# Finding blocks
+# ==============
+# Return the blocks of identical text in ``a[aBegin:aEnd]`` and
+# ``b[bBegin:bEnd]`` as a list of (aStart, bStart, length). This is the
+# approach of patience diff: strings of GRAM_LENGTH characters which occur
+# exactly once in each text are paired, then the longest chain of pairs which
+# are ordered in both texts is selected.
+def _matchingBlocks(a, aBegin, aEnd, b, bBegin, bEnd):
+    aGrams = [a[index:index + GRAM_LENGTH]
+              for index in range(aBegin, aEnd - GRAM_LENGTH + 1)]
+    bGrams = [b[index:index + GRAM_LENGTH]
+              for index in range(bBegin, bEnd - GRAM_LENGTH + 1)]
+    aCounts = collections.Counter(aGrams)
+    bCounts = collections.Counter(bGrams)
+    bIndices = {gram: index for index, gram in enumerate(bGrams, bBegin)
+                if bCounts[gram] == 1}
+    # Pairs of (index in a, index in b), ordered by the index in a.
+    pairs = [(index, bIndices[gram]) for index, gram in enumerate(aGrams, aBegin)
+             if gram in bIndices and aCounts[gram] == 1]
+
+    # Find the longest chain of pairs with increasing b indices (the a indices
+    # already increase). ``tails[n]`` is the index in pairs of the smallest b
+    # index which ends a chain of length n + 1.
+    tails = []
+    tailBIndices = []
+    previous = [None]*len(pairs)
+    for pairIndex, (aIndex, bIndex) in enumerate(pairs):
+        n = bisect.bisect_left(tailBIndices, bIndex)
+        if n:
+            previous[pairIndex] = tails[n - 1]
+        if n == len(tails):
+            tails.append(pairIndex)
+            tailBIndices.append(bIndex)
+        else:
+            tails[n] = pairIndex
+            tailBIndices[n] = bIndex
+    chain = []
+    pairIndex = tails[-1] if tails else None
+    while pairIndex is not None:
+        chain.append(pairs[pairIndex])
+        pairIndex = previous[pairIndex]
+    chain.reverse()
+
+    # Join the pairs into blocks. The strings of neighbouring pairs overlap;
+    # cut the overlapping part from the later block.
+    blocks = []
+    aEndOfLast = aBegin
+    bEndOfLast = bBegin
+    for aIndex, bIndex in chain:
+        skip = max(0, aEndOfLast - aIndex, bEndOfLast - bIndex)
+        length = GRAM_LENGTH - skip
+        if length <= 0:
+            continue
+        aIndex += skip
+        bIndex += skip
+        if blocks and aIndex == aEndOfLast and bIndex == bEndOfLast:
+            aStart, bStart, lastLength = blocks[-1]
+            blocks[-1] = (aStart, bStart, lastLength + length)
+        else:
+            blocks.append((aIndex, bIndex, length))
+        aEndOfLast = aIndex + length
+        bEndOfLast = bIndex + length
+    return blocks
+
+# Grow the blocks while the characters before and after them are identical,
+# then join the blocks which touch.
+def _extendBlocks(a, b, blocks):
+    extended = []
+    aEndOfLast = bEndOfLast = 0
+    for blockIndex, (aStart, bStart, length) in enumerate(blocks):
+        while aStart > aEndOfLast and bStart > bEndOfLast and \
+              a[aStart - 1] == b[bStart - 1]:
+            aStart -= 1
+            bStart -= 1
+            length += 1
+
+        if blockIndex + 1 < len(blocks):
+            aLimit, bLimit = blocks[blockIndex + 1][:2]
+        else:
+            aLimit, bLimit = len(a), len(b)
+        while aStart + length < aLimit and bStart + length < bLimit and \
+              a[aStart + length] == b[bStart + length]:
+            length += 1
+
+        if extended and aStart == aEndOfLast and bStart == bEndOfLast:
+            aStart, bStart, lastLength = extended.pop()
+            length += lastLength
+        extended.append((aStart, bStart, length))
+        aEndOfLast = aStart + length
+        bEndOfLast = bStart + length
+    return extended
+
+# Return the lengths of the common prefix and of the common suffix of two
+# strings. The suffix doesn't overlap the prefix in either string. Slices are
+# compared by binary search, which is much faster than comparing characters
+# one by one in Python.
+def _commonEnds(a, b):
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1)//2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = low
+
+    low, high = 0, min(len(a), len(b)) - prefix
+    while low < high:
+        middle = (low + high + 1)//2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return prefix, low
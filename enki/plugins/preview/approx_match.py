@@ -18,7 +18,9 @@
 # ---------------
 # For debugging.
 import codecs
+import functools
 import html
+import math
 import os
 #
 # Third-party imports
@@ -114,41 +116,90 @@ def writeHtmlLog(htmlText):
 # ==============
 # This function performs a single approximate match using the regex_ library.
 #
-# Return value:
-#   - If there is no unique value, (None, 0, 0)
-#   - Otherwise, it returns (match, beginInTarget, endInTarget) where:
+# A fuzzy search of the whole target text is slow. So, when the position at
+# which the match is expected is known, the search first looks in a window
+# around this position. A match found there is accepted if it lies inside the
+# window, has few errors and is unique in the window. Otherwise, the window
+# grows geometrically, until it covers the whole target text, which is
+# searched without the error limit.
 #
-#     match
-#       A regex_ match object.
+# Return value:
+#   - If there is no unique value, None.
+#   - Otherwise, a regex_ match object. Its ``start()`` and ``end()`` give the
+#     indices into the target string at which the approximate match begins and
+#     ends.
 #
-#     beginInTarget
-#       The index into the target string at which the approximate match begins.
+# The initial radius of the window is the length of the searchText multiplied
+# by this factor. The radius is multiplied by WINDOW_GROWTH each time the
+# window grows.
+WINDOW_RADIUS_FACTOR = 16
+WINDOW_GROWTH = 4
+# A match found in a window may have at most ``len(searchText) //
+# WINDOW_ERROR_DIVISOR`` errors. A worse match is more likely to be a
+# coincidence than the text searched for.
+WINDOW_ERROR_DIVISOR = 4
 #
-#     endInTarget
-#       The index into the target string at which the approximate match ends.
 def findApproxText(
   # Text to search for
   searchText,
   # Text in which to find the searchText
-  targetText):
+  targetText,
+  # The index in the targetText near which the match is expected, or None to
+  # search the whole targetText.
+  expectedPosition=None):
+
+    if expectedPosition is not None:
+        # A windowed match may contain at most this many errors.
+        maxErrors = len(searchText)//WINDOW_ERROR_DIVISOR
+        radius = len(searchText)*WINDOW_RADIUS_FACTOR
+        while radius < expectedPosition or \
+              expectedPosition + radius < len(targetText):
+            begin = max(0, expectedPosition - radius)
+            end = min(len(targetText), expectedPosition + radius)
+            mo = _findUniqueApproxText(searchText, targetText, begin, end,
+                                       maxErrors)
+            # A match touching an edge of the window inside the targetText
+            # may be a part of a better match, which crosses the edge.
+            if mo and (begin == 0 or mo.start() > begin) and \
+               (end == len(targetText) or mo.end() < end):
+                return mo
+            radius *= WINDOW_GROWTH
+
+    # A match never needs more errors than the length of the searchText, so
+    # this limit finds the same match as a search without a limit.
+    return _findUniqueApproxText(searchText, targetText, 0, len(targetText),
+                                 len(searchText))
+
+# Find the best match of searchText in ``targetText[begin:end]`` with at most
+# ``maxErrors`` errors. Return it if it is unique enough; otherwise, return
+# None.
+def _findUniqueApproxText(searchText, targetText, begin, end, maxErrors):
+    # A search with fewer allowed errors is much faster. Most matches are
+    # close, so try small limits first.
+    step = max(1, len(searchText)//16)
+    errors = min(maxErrors, step)
+    mo = regexFuzzySearch(searchText, targetText, begin, end, errors)
+    while not mo and errors < maxErrors:
+        errors = min(maxErrors, errors + step)
+        mo = regexFuzzySearch(searchText, targetText, begin, end, errors)
 
-    mo = regexFuzzySearch(searchText, targetText)
     if mo:
         # See if this match is unique enough by looking for the next best match
         # by searching in the string before then the string after the match.
-        moPre = regexFuzzySearch(searchText, targetText[:mo.start()])
-        moPost = regexFuzzySearch(searchText, targetText[mo.end():])
-
-        # Compute an error based on the fuzzyness. If there wasn't a match, use
-        # maximum error of moError + 6, so that the test below passes.
+        # Make sure the difference between the match and any other match is
+        # high enough to consider this match unique: it requires an error of at
+        # least moError*1.1 for another match. So, another match with fewer
+        # errors than that makes this match not unique.
         moError = sum(mo.fuzzy_counts)
-        moPreError = sum(moPre.fuzzy_counts) if moPre else moError*2
-        moPostError = sum(moPost.fuzzy_counts) if moPost else moError*2
-
-        # Make sure the difference between the match and any other match is high
-        # enough to consider this match unique.
-        if moError*1.1 <= moPreError and moError*1.1 <= moPostError:
+        otherMaxErrors = math.ceil(moError*1.1) - 1
+        if otherMaxErrors < 0:
             return mo
+        for otherBegin, otherEnd in ((begin, mo.start()), (mo.end(), end)):
+            moOther = regexFuzzySearch(searchText, targetText, otherBegin,
+                                       otherEnd, otherMaxErrors)
+            if moOther:
+                return None
+        return mo
 
     # If a match couldn't be found or wasn't good enough, return a failure.
     return None
@@ -158,17 +209,34 @@ def regexFuzzySearch(
   # Text to search for. It is NOT treated as a regex.
   searchText,
   # Text in which to find the searchText
-  targetText):
+  targetText,
+  # Search only ``targetText[pos:endpos]``. The indices of a match are still
+  # relative to the whole targetText.
+  pos=0,
+  endpos=None,
+  # The maximum number of errors in the match, or None for no limit.
+  maxErrors=None):
+
+    return _compileFuzzyPattern(searchText, maxErrors).search(
+        targetText, pos, len(targetText) if endpos is None else endpos)
 
+# Compile the pattern used by regexFuzzySearch_. The preview is synchronized
+# with every cursor movement, so the same patterns are searched for repeatedly;
+# compiled patterns are cached.
+@functools.lru_cache(maxsize=64)
+def _compileFuzzyPattern(searchText, maxErrors):
     # Escape any characters in searchText that would be treated as a regexp.
     searchText = regex.escape(searchText)
     # The regex_ library supports fuzzy matching. Quoting from the manual:
     #
     # - ``(item){e}`` means perform a fuzzy match of the given ``item``,
     #   allowing insertions, deletions, or substitutions.
+    # - ``(item){e<=n}`` allows at most ``n`` errors.
     # - The BESTMATCH flag searches for the best possible match, rather than the
     #   match found first.
-    return regex.search('(' + searchText + '){e}', targetText, regex.BESTMATCH)
+    errors = 'e' if maxErrors is None else 'e<=%d' % maxErrors
+    return regex.compile('(' + searchText + '){' + errors + '}',
+                         regex.BESTMATCH)
 
 #
 # findApproxTextInTarget
@@ -201,14 +269,16 @@ def findApproxTextInTarget(
     # Empty documents are easy to search.
     if end <= begin:
         return 0
-    # Look for a match.
+    # Look for a match near the same relative position in the targetText.
+    expectedPosition = searchAnchor*len(targetText)//len(searchText)
     # record left and right search radii.
-    mo = findApproxText(searchText[begin:end], targetText)
+    mo = findApproxText(searchText[begin:end], targetText, expectedPosition)
     # If no unique match is found, try again with an increased search radius.
     if not mo:
         begin = max(0, searchAnchor - int(searchRange * 1.5))
         end = min(len(searchText), searchAnchor + int(searchRange * 1.5))
-        mo = findApproxText(searchText[begin:end], targetText)
+        mo = findApproxText(searchText[begin:end], targetText,
+                            expectedPosition)
         if not mo:
             if ENABLE_LOG:
                 si = htmlFormatSearchInput(searchText, begin, searchAnchor, end)
@@ -283,25 +353,22 @@ def refineSearchResult(
     # So, a given x or y value refers to a table index or, equivalently, an
     # anchor to their right.
     #
-    # Initialize the substring length table entries to 0.
-    lengths = [[0 for j in range(len(targetText) + 1)]
-               for i in range(len(searchText) + 1)]
-
-    # Determine the length of the longest common subsequence and store this in
-    # the table.
-    for i, x in enumerate(searchText):
-        for j, y in enumerate(targetText):
-            # When characters match, increase the substring length. Otherwise,
-            # the use maximum substring length found thus far.
-            if x == y:
-                lengths[i + 1][j + 1] = lengths[i][j] + 1
-            else:
-                lengths[i + 1][j + 1] = max(lengths[i + 1][j], lengths[i][j + 1])
+    # The table isn't stored. Instead, each row of it is computed by the
+    # bit-parallel algorithm of `Allison-Dix and Hyyrö
+    # <http://www.sciencedirect.com/science/article/pii/002001908690091X>`_,
+    # which keeps a row as a single Python int: bit ``j - 1`` of ``rows[i]`` is
+    # 0 if ``lengths[i][j] == lengths[i][j - 1] + 1``; otherwise, it is 1. So,
+    # ``lengths[i][j]`` is ``j`` minus the count of 1 bits below bit ``j``. A
+    # row is computed by a few big integer operations instead of an inner loop
+    # over the targetText, and the whole table takes ``len(searchText) + 1``
+    # ints.
+    rows = _lcsRows(searchText, targetText)
 
     # If LCS fails to find a common subsequence, then set the offset to -1 and
     # inform ``findApproxTextInTarget`` that no match is found. This rarely
-    # happens since regex has preprocessed input string.
-    if lengths[-1][-1] == 0:
+    # happens since regex has preprocessed input string. The last row has no 0
+    # bits in this case.
+    if rows[-1] == (1 << len(targetText)) - 1:
         return -1, ''
 
     # Walk through the table, read the LCS string out from the table and
@@ -363,11 +430,23 @@ def refineSearchResult(
     lcsLen = 0
     # No anchor placement ambiguioty yet exists.
     matchIndices = None
+    # The table entries are compared by the count of 1 bits below bit y in the
+    # current row (``ones``) and in the row above it (``onesAbove``), so that
+    # ``lengths[x][y] == lengths[x - 1][y]`` if ``ones == onesAbove``. The
+    # counts are updated as y decreases and are computed again only when
+    # moving to the row above.
+    ones = _countOnes(rows[x], y)
+    onesAbove = _countOnes(rows[x - 1], y) if x else 0
     while x != 0 and y != 0:
-        if lengths[x][y] == lengths[x - 1][y]:
+        if ones == onesAbove:
             x -= 1
-        elif lengths[x][y] == lengths[x][y - 1]:
+            ones = onesAbove
+            onesAbove = _countOnes(rows[x - 1], y) if x else 0
+        elif (rows[x] >> (y - 1)) & 1:
+            # ``lengths[x][y] == lengths[x][y - 1]``.
             y -= 1
+            ones -= 1
+            onesAbove -= (rows[x - 1] >> y) & 1
         else:
             assert searchText[x - 1] == targetText[y - 1]
             # For debug purposes, uncomment the line below.
@@ -417,6 +496,10 @@ def refineSearchResult(
             lcsLen += 1
             x -= 1
             y -= 1
+            # Bit y of the new row x is 1, since its lengths[x][y] and
+            # lengths[x][y + 1] were both one less than the matched length.
+            ones = onesAbove - 1
+            onesAbove = _countOnes(rows[x - 1], y) if x else 0
 
     # Resolve an ambiguius anchor if necessary.
     if matchIndices:
@@ -448,3 +531,32 @@ def refineSearchResult(
     #   targetText = 'ab', then x == 1 when y == 0, which is the beginning
     #   of the targetText.
     return y, lcsString
+
+#
+# _lcsRows
+# --------
+# Compute the rows of the LCS table in the bit-parallel form described in
+# refineSearchResult_. ``rows[0]`` has all ``len(targetText)`` bits set, since
+# the first row of the table contains only zeros.
+def _lcsRows(searchText, targetText):
+    # Bit j of the match mask of a character is 1 if ``targetText[j]`` is this
+    # character.
+    matchMasks = {}
+    for j, y in enumerate(targetText):
+        matchMasks[y] = matchMasks.get(y, 0) | (1 << j)
+
+    allBits = (1 << len(targetText)) - 1
+    row = allBits
+    rows = [row]
+    for x in searchText:
+        # This is the recurrence of H. Hyyrö, "Bit-Parallel LCS-length
+        # Computation Revisited", 2004. Since ``matches`` is a subset of
+        # ``row``, ``row - matches`` is ``row`` without the matching bits.
+        matches = row & matchMasks.get(x, 0)
+        row = ((row + matches) | (row - matches)) & allBits
+        rows.append(row)
+    return rows
+
+# Return the count of 1 bits of ``row`` below the given bit.
+def _countOnes(row, bit):
+    return bin(row & ((1 << bit) - 1)).count('1')
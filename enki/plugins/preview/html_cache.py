@@ -0,0 +1,94 @@
+# .. -*- coding: utf-8 -*-
+# ***************************************************
+# html_cache.py - a cache of the rendered preview HTML
+# ***************************************************
+# Converting a document to HTML with Markdown, docutils or CodeChat takes from
+# tens of milliseconds to seconds. The preview converts the current document
+# again whenever it changes, including when the user switches back to a
+# document which was already rendered, or undoes an edit. The HtmlCache_ keeps
+# the recent results of the conversions, so that these cases don't convert the
+# text again.
+#
+# Results are looked up by the content of the text which was converted (not
+# by the document it came from) together with everything else the conversion
+# depends on; see htmlCacheKey_. The size of the cache is limited by an
+# estimate of the memory used by the results, since rendered documents vary
+# from a few bytes to megabytes.
+#
+# Imports
+# =======
+# These are listed in the order prescribed by `PEP 8
+# <http://www.python.org/dev/peps/pep-0008/#imports>`_.
+#
+# Library imports
+# ---------------
+import collections
+import hashlib
+import sys
+#
+# htmlCacheKey
+# ============
+# Return a key for a conversion of ``text``. The ``settings`` must contain
+# everything other than the text which the result of the conversion depends on
+# (the language, the converter used, the file path and so on). The text is
+# represented by its digest, so that the key doesn't keep a copy of it.
+def htmlCacheKey(text, *settings):
+    return settings + (hashlib.sha1(text.encode('utf-8', 'surrogatepass')).digest(),)
+#
+# HtmlCache
+# =========
+# A least recently used cache of conversion results. A result is a tuple, as
+# returned by ``PreviewDock.getHtml``.
+class HtmlCache:
+    def __init__(self,
+      # The maximum estimated size of the cached results, in bytes.
+      maxBytes):
+
+        self.maxBytes = maxBytes
+        # Maps a key to (result, size), ordered from the least to the most
+        # recently used.
+        self._results = collections.OrderedDict()
+        self._bytes = 0
+        # Statistics, for tests and for tuning the size.
+        self.hits = 0
+        self.misses = 0
+
+    # Return the cached result for the key, or None.
+    def get(self, key):
+        entry = self._results.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._results.move_to_end(key)
+        return entry[0]
+
+    # Add a result for the key. A result larger than the whole cache isn't
+    # added.
+    def put(self, key, result):
+        self.remove(key)
+        size = _resultSize(result)
+        if size > self.maxBytes:
+            return
+        self._results[key] = (result, size)
+        self._bytes += size
+        while self._bytes > self.maxBytes:
+            self._bytes -= self._results.popitem(last=False)[1][1]
+
+    # Remove the result for the key, if it is cached.
+    def remove(self, key):
+        entry = self._results.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        self._results.clear()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._results)
+
+# Estimate the memory used by a result. Only the strings in it (the HTML and
+# the error messages) are counted; the rest of the result is small.
+def _resultSize(result):
+    return sum(sys.getsizeof(item) for item in result if isinstance(item, str))
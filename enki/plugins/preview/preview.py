@@ -14,6 +14,7 @@ import html
 import sys
 import shlex
 import codecs
+import logging
 from queue import Queue
 #
 # Third-party imports
@@ -33,6 +34,7 @@ from enki.widgets.dockwidget import DockWidget
 from enki.plugins.preview import isHtmlFile, canUseCodeChat, \
     sphinxEnabledForFile
 from .preview_sync import PreviewSync
+from .html_cache import HtmlCache, htmlCacheKey
 from enki.lib.get_console_output import open_console_output
 from enki.lib.future import AsyncController, RunLatest
 
@@ -378,6 +380,8 @@ class QWebEnginePageExtLink(QWebEnginePage):
 # AfterLoaded
 # ===========
 # Run functions after the web page is loaded. This avoids errors such as  ``js: Uncaught ReferenceError: clearHighlight is not defined``, which (I think) occurs when JavaScript is run before the PreviewSync window is able to inject its JavaScript.
+#
+# This class also caches the plain text of the loaded page: getting it from the web engine is an asynchronous round trip, which serializes the whole page, while the text only changes when a new page is loaded.
 class AfterLoaded(QObject):
     def __init__(self,
       # The QWebEnginePage to watch for loading/load complete.
@@ -386,6 +390,16 @@ class AfterLoaded(QObject):
         super().__init__()
         self._runList = []
         self._isLoading = False
+        self._webEnginePage = webEnginePage
+        # Incremented when a page starts loading.
+        self._loadCount = 0
+        # The plain text of the loaded page, or None if it wasn't fetched yet.
+        self._plainText = None
+        # Callbacks waiting for the plain text being fetched for the current load, or None.
+        self._plainTextCallbacks = None
+        # Statistics of plainText_: requests served without a round trip to the web engine, and round trips.
+        self.plainTextHits = 0
+        self.plainTextMisses = 0
         webEnginePage.loadStarted.connect(self.onLoadStarted)
         webEnginePage.loadFinished.connect(self.onLoadFinished)
 
@@ -396,6 +410,9 @@ class AfterLoaded(QObject):
 
     def onLoadStarted(self):
         self._isLoading = True
+        self._loadCount += 1
+        self._plainText = None
+        self._plainTextCallbacks = None
 
     def onLoadFinished(self, ok):
         self._isLoading = False
@@ -415,6 +432,32 @@ class AfterLoaded(QObject):
     # Unschedule all functions scheduled to run, but not yet run.
     def clearAll(self):
         self._runList.clear()
+
+    # _`plainText`: Invoke ``callback(text)`` with the plain text of the page, like ``QWebEnginePage.toPlainText``. The text of a loaded page is fetched once; later requests are served from memory until the next load starts. So, the callback may be invoked before this method returns.
+    def plainText(self, callback):
+        if self._plainText is not None:
+            self.plainTextHits += 1
+            callback(self._plainText)
+        elif self._plainTextCallbacks is not None:
+            # Wait for the text already requested.
+            self.plainTextHits += 1
+            self._plainTextCallbacks.append(callback)
+        else:
+            self.plainTextMisses += 1
+            logging.debug('Preview plain text: %d hits, %d misses', self.plainTextHits, self.plainTextMisses)
+            callbacks = [callback]
+            # Text requested while the page is loading may be incomplete; don't keep it.
+            if not self._isLoading:
+                self._plainTextCallbacks = callbacks
+            loadCount = self._loadCount
+            self._webEnginePage.toPlainText(lambda text: self._havePlainText(text, loadCount, callbacks))
+
+    def _havePlainText(self, text, loadCount, callbacks):
+        if callbacks is self._plainTextCallbacks and loadCount == self._loadCount:
+            self._plainText = text
+            self._plainTextCallbacks = None
+        for callback in callbacks:
+            callback(text)
 #
 # Core class
 # ==========
@@ -424,6 +467,9 @@ class PreviewDock(DockWidget):
     # Emitted when this window is closed.
     closed = pyqtSignal()
 
+    # The memory limit of the cache of rendered HTML, in bytes.
+    _HTML_CACHE_BYTES = 32 * 1024 * 1024
+
     def __init__(self):
         DockWidget.__init__(self, core.mainWindow(), "Previe&w", QIcon(':/enkiicons/internet.png'), "Alt+W")
 
@@ -454,6 +500,10 @@ class PreviewDock(DockWidget):
         # a signal indicating that the CodeChat setting dialog has been opened. Save
         # core.config()['Sphinx'] and core.config()['CodeChat']. After dialogAccepted
         # is detected, compare current settings with the old one. Build if necessary.
+        #
+        # The changed settings may change the HTML of any document, so drop the
+        # cached HTML first.
+        core.uiSettingsManager().dialogAccepted.connect(self._clearHtmlCache)
         core.uiSettingsManager().dialogAccepted.connect(
             self._scheduleDocumentProcessing)
 
@@ -469,6 +519,9 @@ class PreviewDock(DockWidget):
 
         self._sphinxConverter = SphinxConverter(self)  # stopped
         self._runLatest = RunLatest('QThread', parent=self)
+        # Recently rendered HTML, so that switching back to a document or
+        # undoing an edit doesn't convert the same text again.
+        self._htmlCache = HtmlCache(self._HTML_CACHE_BYTES)
 
         self._visiblePath = None
 
@@ -588,6 +641,9 @@ class PreviewDock(DockWidget):
 
     def _onDocumentModificationChanged(self, document, modified):
         if not modified:  # probably has been saved just now
+            # A saved file may be included by other documents (for example, by
+            # a reST ``include`` directive), so their cached HTML may be stale.
+            self._clearHtmlCache()
             if not self._ignoreDocumentChanged:
                 self._scheduleDocumentProcessing()
 
@@ -905,9 +961,20 @@ class PreviewDock(DockWidget):
             if ((not sphinxCanProcess) or
                     (sphinxCanProcess and not internallyModified) or
                     saveThenBuild):
-                # Build the HTML in a separate thread.
-                self._runLatest.start(self._setHtmlFuture, self.getHtml,
-                                language, text, document.filePath())
+                filePath = document.filePath()
+                cacheKey = self._htmlCacheKey(language, text, filePath)
+                cachedHtml = self._htmlCache.get(cacheKey) if cacheKey else None
+                if cachedHtml is not None:
+                    # Reuse the HTML of this text. Pass it through the thread
+                    # anyway, so that the result of a build which is still
+                    # running can't replace it.
+                    self._runLatest.start(self._setHtmlFuture,
+                                          lambda: cachedHtml)
+                else:
+                    # Build the HTML in a separate thread.
+                    self._runLatest.start(
+                        lambda future: self._setHtmlFuture(future, cacheKey),
+                        self.getHtml, language, text, filePath)
             # Warn.
             if (sphinxCanProcess and internallyModified and
                     externallyModified and not buildOnSave):
@@ -929,6 +996,21 @@ class PreviewDock(DockWidget):
         else:
             return filePath, 'No preview for this type of file', None, QUrl()
 
+    def _htmlCacheKey(self, language, text, filePath):
+        """Get the key of the cached result of ``getHtml``, or None if the
+        result can't be cached.
+        """
+        # Sphinx builds the files on disk, not the text.
+        if filePath and sphinxEnabledForFile(filePath):
+            return None
+        # The Markdown template is a part of the text. The result of CodeChat
+        # depends on the file name, which selects the lexer.
+        return htmlCacheKey(text, language, filePath,
+                            bool(filePath and canUseCodeChat(filePath)))
+
+    def _clearHtmlCache(self):
+        self._htmlCache.clear()
+
     def _copySphinxProjectTemplate(self, documentFilePath):
         """Add conf.py, CodeChat.css and index.rst (if ther're missing)
         to the Sphinx project directory.
@@ -992,9 +1074,12 @@ class PreviewDock(DockWidget):
 
         return errors
 
-    def _setHtmlFuture(self, future):
-        """Receives a future and unpacks the result, calling _setHtml."""
+    def _setHtmlFuture(self, future, cacheKey=None):
+        """Receives a future and unpacks the result, calling _setHtml. If
+        ``cacheKey`` is given, the result is cached with this key."""
         filePath, htmlText, errString, baseUrl = future.result
+        if cacheKey is not None:
+            self._htmlCache.put(cacheKey, future.result)
         self._setHtml(filePath, htmlText, errString, baseUrl)
 
     def _setHtml(self, filePath, htmlText, errString, baseUrl):
@@ -32,8 +32,10 @@ from enki.lib.future import RunLatest
 # disable the sync feature.
 try:
     from .approx_match import findApproxTextInTarget
+    from .alignment_map import AlignmentMap
 except ImportError as e:
     findApproxTextInTarget = None
+    AlignmentMap = None
 #
 # CallbackManager
 # ===============
@@ -173,6 +175,7 @@ class PreviewSync(QObject):
         self._callbackManager = CallbackManager()
         self._initPreviewToTextSync()
         self._initTextToPreviewSync()
+        self._initAlignmentMaps()
         self._unitTest = False
 
     def terminate(self):
@@ -184,6 +187,8 @@ class PreviewSync(QObject):
             # then discard its output.
             self._runLatest.future.cancel(True)
             self._runLatest.terminate()
+            self._runLatestAlignment.future.cancel(True)
+            self._runLatestAlignment.terminate()
             # End all callbacks.
             self._callbackManager.skipAllCallbacks()
             self._callbackManager.waitForAllCallbacks()
@@ -495,11 +500,72 @@ class PreviewSync(QObject):
     # text in the other pane provides the corresponding location in the other pane
     # to highlight.
     #
-    # Bugs / to-do items
-    ##------------------
-    # #. I call ``toPlainText()`` several times. In the past, this was quite slow
-    #    in a ``QTextEdit``. Check performance and possibly cache this value; it
-    #    should be easy to update by adding a few lines to _setHtml().
+    # The plain text of the preview is requested through
+    # ``AfterLoaded.plainText``, which fetches it from the web engine once per
+    # page load.
+    #
+    # Alignment maps
+    ##--------------
+    # An approximate search is slow. So, after each page load, the plain text
+    # of the page is aligned with the text of the document in the background,
+    # producing an AlignmentMap_ for each direction of the sync: the click
+    # handler reports indices into ``document.body.textContent``, while the
+    # text to preview sync uses ``toPlainText()``. While the document text
+    # and the page don't change, each sync is a lookup in a map. When the map
+    # can't tell the location or is out of date (the document was edited
+    # after the render), the approximate search is used instead. The maps of
+    # the previous load are passed to the new ones, so that only the changed
+    # part of the texts is aligned again.
+    def _initAlignmentMaps(self):
+        page = self._dock._widget.webEngineView.page()
+        # Maps of the document text to the plain text of the page and to its
+        # ``textContent``.
+        self._alignmentMap = None
+        self._clickAlignmentMap = None
+        # True if the maps were built for the page currently loaded.
+        self._alignmentMapsCurrent = False
+        # Incremented on every page load, so that the maps of an outdated page
+        # are discarded.
+        self._loadCount = 0
+        self._runLatestAlignment = RunLatest('QThread', self)
+        self._runLatestAlignment.ac.defaultPriority = QThread.LowPriority
+        page.loadStarted.connect(self._onLoadStarted)
+        page.loadFinished.connect(self._onLoadFinished)
+
+    def _onLoadStarted(self):
+        self._loadCount += 1
+        self._alignmentMapsCurrent = False
+
+    def _onLoadFinished(self, ok):
+        self._dock._afterLoaded.plainText(
+            self._callbackManager.callback(self._haveAlignmentPlainText))
+
+    def _haveAlignmentPlainText(self, plainText):
+        self._dock._widget.webEngineView.page().runJavaScript(
+            'document.body ? document.body.textContent.toString() : "";',
+            QWebEngineScript.ApplicationWorld,
+            self._callbackManager.callback(
+                lambda textContent: self._buildAlignmentMaps(plainText,
+                                                             textContent or '')))
+
+    def _buildAlignmentMaps(self, plainText, textContent):
+        document = core.workspace().currentDocument()
+        if document is None:
+            return
+        sourceText = document.qutepart.text
+        loadCount = self._loadCount
+        alignmentMap = self._alignmentMap
+        clickAlignmentMap = self._clickAlignmentMap
+        self._runLatestAlignment.start(
+            lambda future: self._haveAlignmentMaps(loadCount, future),
+            lambda: (AlignmentMap(sourceText, plainText, alignmentMap),
+                     AlignmentMap(sourceText, textContent, clickAlignmentMap)))
+
+    def _haveAlignmentMaps(self, loadCount, future):
+        # Ignore maps of a page, which was replaced while they were built.
+        if loadCount == self._loadCount:
+            self._alignmentMap, self._clickAlignmentMap = future.result
+            self._alignmentMapsCurrent = True
     #
     # Preview-to-text sync
     ##--------------------
@@ -680,9 +746,17 @@ class PreviewSync(QObject):
         self._onWebviewClick_(tc, webIndex)
         # Get the qutepart text.
         qp = core.workspace().currentDocument().qutepart
-        # Perform an approximate match between the clicked webpage text and the
-        # qutepart text.
-        textIndex = findApproxTextInTarget(tc, webIndex, qp.text)
+        qp_text = qp.text
+        textIndex = None
+        # Look up the index in the alignment map, if it's up to date.
+        clickMap = self._clickAlignmentMap
+        if (self._alignmentMapsCurrent and clickMap.targetText == tc and
+                clickMap.sourceText == qp_text):
+            textIndex = clickMap.targetToSource(webIndex)
+        # Otherwise, perform an approximate match between the clicked webpage
+        # text and the qutepart text.
+        if textIndex is None:
+            textIndex = findApproxTextInTarget(tc, webIndex, qp_text)
         # Move the cursor to textIndex in qutepart, assuming corresponding text
         # was found.
         if textIndex >= 0:
@@ -779,10 +853,19 @@ class PreviewSync(QObject):
             return
         # Stop the timer; the next cursor movement will restart it.
         self._cursorMovementTimer.stop()
-        # Get a plain text rendering of the web view. Continue execution in a callback.
+        # Look up the cursor position in the alignment map, if it's up to date.
         qp = core.workspace().currentDocument().qutepart
-        qp_text = qp.text
-        self._dock._widget.webEngineView.page().toPlainText(
+        if self._alignmentMapsCurrent and \
+           self._alignmentMap.sourceText == qp.text:
+            webIndex = self._alignmentMap.sourceToTarget(qp.textCursor().position())
+            if webIndex is not None:
+                # Discard the result of a search still running for an earlier
+                # cursor position.
+                self._runLatest.future.cancel(True)
+                self._highlightPreviewIndex(webIndex, self._alignmentMap.targetText)
+                return
+        # Get a plain text rendering of the web view. Continue execution in a callback.
+        self._dock._afterLoaded.plainText(
             self._callbackManager.callback(self._havePlainText))
 
     # Perform an approximate match in a separate thread, then update
@@ -814,6 +897,10 @@ class PreviewSync(QObject):
             lambda: (findApproxTextInTarget(qp_text, qp_position, html_text), html_text))
 
     def _movePreviewPaneToIndex(self, future):
+        # Retrieve the return value from findApproxTextInTarget.
+        self._highlightPreviewIndex(*future.result)
+
+    def _highlightPreviewIndex(self, webIndex, txt):
         """Highlights webIndex in the preview pane, per item 4 above.
 
         Params:
@@ -822,9 +909,6 @@ class PreviewSync(QObject):
           pane.
         - txt - The text of the webpage, returned by mainFrame.toPlainText().
         """
-        # Retrieve the return value from findApproxTextInTarget.
-        webIndex, txt = future.result
-
         view = self._dock._widget.webEngineView
         page = view.page()
         ft = txt[:webIndex]
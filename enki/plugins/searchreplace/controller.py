@@ -13,7 +13,10 @@ from PyQt5.QtGui import QIcon
 
 
 from enki.core.core import core
+from enki.core.uisettings import CheckableOption, NumericOption
 from . import substitutions
+from .searchcache import SearchCache
+from .highlighter import FoundItemsHighlighter
 
 MODE_FLAG_SEARCH = 0x1
 MODE_FLAG_REPLACE = 0x2
@@ -28,9 +31,6 @@ MODE_REPLACE_DIRECTORY = MODE_FLAG_REPLACE | MODE_FLAG_DIRECTORY
 MODE_SEARCH_OPENED_FILES = MODE_FLAG_SEARCH | MODE_FLAG_FILES
 MODE_REPLACE_OPENED_FILES = MODE_FLAG_REPLACE | MODE_FLAG_FILES
 
-# Too many extra se
-MAX_EXTRA_SELECTIONS_COUNT = 256
-
 
 class Controller(QObject):
     """S&R module business logic
@@ -40,6 +40,7 @@ class Controller(QObject):
         QObject.__init__(self)
         self._mode = None
         self._searchThread = None
+        self._searchCache = SearchCache()
         self._replaceThread = None
         self._widget = None
         self._dock = None
@@ -51,11 +52,14 @@ class Controller(QObject):
         self._cachedText = None
         self._catchedMatches = None
 
+        self._highlighter = FoundItemsHighlighter(self._findAllMatches, self)
+
         self._createActions()
 
         core.workspace().currentDocumentChanged.connect(self._onCurrentDocumentChanged)
         core.workspace().currentDocumentChanged.connect(self._resetSearchInFileStartPoint)
         QApplication.instance().focusChanged.connect(self._resetSearchInFileStartPoint)
+        core.uiSettingsManager().aboutToExecute.connect(self._onSettingsDialogAboutToExecute)
 
     def terminate(self):
         """Explicitly called destructor
@@ -69,6 +73,8 @@ class Controller(QObject):
             core.actionManager().removeAction(action)
         self._menuSeparator.parent().removeAction(self._menuSeparator)
 
+        self._highlighter.clear()
+
         if self._widget is not None:
             core.workspace().currentDocumentChanged.disconnect(self._updateFileActionsState)
             self._widget.visibilityChanged.disconnect(self._updateSearchWidgetFoundItemsHighlighting)
@@ -82,6 +88,19 @@ class Controller(QObject):
         core.workspace().currentDocumentChanged.disconnect(self._onCurrentDocumentChanged)
         core.workspace().currentDocumentChanged.disconnect(self._resetSearchInFileStartPoint)
         QApplication.instance().focusChanged.disconnect(self._resetSearchInFileStartPoint)
+        core.uiSettingsManager().aboutToExecute.disconnect(self._onSettingsDialogAboutToExecute)
+
+    def _onSettingsDialogAboutToExecute(self, dialog):
+        """UI settings dialogue is about to execute.
+        """
+        from .settingspage import SettingsPage
+        page = SettingsPage(dialog)
+        dialog.appendPage("Search", page, QIcon(':enkiicons/search.png'))
+
+        dialog.appendOption(NumericOption(dialog, core.config(), "SearchReplace/Workers", page.sbWorkers))
+        dialog.appendOption(CheckableOption(dialog, core.config(), "SearchReplace/UseIndex", page.cbUseIndex))
+        dialog.appendOption(NumericOption(dialog, core.config(), "SearchReplace/LargeFileSize",
+                                          page.sbLargeFileSize))
 
     def _createActions(self):
         """Create main menu actions
@@ -244,6 +263,7 @@ class Controller(QObject):
         if not self._widget.isVisible() or \
            not self._widget.isSearchRegExpValid()[0] or \
            not self._widget.getRegExp().pattern:
+            self._highlighter.clear()
             document.qutepart.setExtraSelections([])
             return
 
@@ -251,19 +271,11 @@ class Controller(QObject):
 
     def _updateFoundItemsHighlighting(self, regExp):
         """(Re)highlight found items with yellow color
-        Called by _updateSearchWidgetFoundItemsHighlighting and by word search highlighting
+        Called by _updateSearchWidgetFoundItemsHighlighting and by word search highlighting.
+        Only the visible part of the document is highlighted, see highlighter module
         """
         document = core.workspace().currentDocument()
-
-        matches = self._findAllMatches(document.qutepart.text, regExp)
-
-        if len(matches) <= MAX_EXTRA_SELECTIONS_COUNT:
-            selections = [(match.start(), len(match.group(0)))
-                          for match in matches]
-        else:
-            selections = []
-
-        document.qutepart.setExtraSelections(selections)
+        self._highlighter.highlight(document.qutepart, regExp)
 
     def _onCurrentDocumentChanged(self, old, new):
         """Current document changed. Clear highlighted items
@@ -275,6 +287,7 @@ class Controller(QObject):
         am.action("mNavigation/mSearchReplace/aReplaceOpenedFiles").setEnabled(new is not None)
 
         if self._widget is not None:
+            self._highlighter.clear()
             if old is not None:
                 old.qutepart.setExtraSelections([])
 
@@ -486,7 +499,7 @@ class Controller(QObject):
             self._createDockWidget()
 
         from .threads import SearchThread
-        self._searchThread = SearchThread()
+        self._searchThread = SearchThread(self._searchCache)
         self._searchThread.progressChanged.connect(self._widget.onSearchProgressChanged)
         self._searchThread.resultsAvailable.connect(self._dock.appendResults)
         self._searchThread.finished.connect(self._onSearchThreadFinished)
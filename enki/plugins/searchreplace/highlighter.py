@@ -0,0 +1,268 @@
+"""
+highlighter --- Highlight found items in the current document
+=============================================================
+
+Only the visible part of the document and some margin around it is highlighted. The highlighting is
+updated, when the document is scrolled.
+
+If a match of the regular expression can't contain a line break, every line (text block) is searched
+separately. Matches of a line are cached by the line text, therefore after an edit only the changed
+lines are searched again. Other regular expressions are searched in the whole text.
+"""
+
+import bisect
+import collections
+import re
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from PyQt5.QtCore import QObject, QTimer
+
+
+# Too many extra selections slow down the editor. Limit for the highlighted part of the document
+MAX_EXTRA_SELECTIONS_COUNT = 2048
+
+_NEWLINE = ord('\n')
+
+# Categories, which contain the line break
+_NEWLINE_CATEGORIES = tuple(getattr(sre_parse, name)
+                            for name in ('CATEGORY_SPACE', 'CATEGORY_NOT_WORD', 'CATEGORY_NOT_DIGIT',
+                                         'CATEGORY_LINEBREAK', 'CATEGORY_NOT_SPACE')
+                            if hasattr(sre_parse, name))
+
+_REPEAT_OPS = tuple(getattr(sre_parse, name)
+                    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                    if hasattr(sre_parse, name))
+
+
+def _setMatchesNewline(items):
+    for op, arg in items:
+        if op is sre_parse.NEGATE:
+            return True
+        elif op is sre_parse.LITERAL and arg == _NEWLINE:
+            return True
+        elif op is sre_parse.RANGE and arg[0] <= _NEWLINE <= arg[1]:
+            return True
+        elif op is sre_parse.CATEGORY and arg in _NEWLINE_CATEGORIES:
+            return True
+    return False
+
+
+def _isLineLocal(items, flags):
+    """Check if the parsed regular expression finds the same matches in a line, as in the whole text.
+    It is so if a match can't contain a line break and the pattern doesn't check the text begin and end
+    """
+    for op, arg in items:
+        if op is sre_parse.LITERAL:
+            if arg == _NEWLINE:
+                return False
+        elif op is sre_parse.NOT_LITERAL:
+            if arg != _NEWLINE:
+                return False
+        elif op is sre_parse.ANY:
+            if flags & re.DOTALL:
+                return False
+        elif op is sre_parse.IN:
+            if _setMatchesNewline(arg):
+                return False
+        elif op is sre_parse.AT:
+            if arg in (sre_parse.AT_BEGINNING_STRING, sre_parse.AT_END_STRING):
+                return False
+            if arg in (sre_parse.AT_BEGINNING, sre_parse.AT_END) and not flags & re.MULTILINE:
+                return False
+        elif op is sre_parse.SUBPATTERN:
+            _group, addFlags, delFlags, subItems = arg
+            if not _isLineLocal(subItems, (flags | addFlags) & ~delFlags):
+                return False
+        elif op in _REPEAT_OPS:
+            if not _isLineLocal(arg[2], flags):
+                return False
+        elif op is sre_parse.BRANCH:
+            if not all(_isLineLocal(branch, flags) for branch in arg[1]):
+                return False
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if not _isLineLocal(arg[1], flags):
+                return False
+        elif op is sre_parse.GROUPREF_EXISTS:
+            _group, yesItems, noItems = arg
+            if not _isLineLocal(yesItems, flags):
+                return False
+            if noItems is not None and not _isLineLocal(noItems, flags):
+                return False
+        elif op is sre_parse.GROUPREF:
+            pass  # group is checked by itself
+        else:
+            return False
+
+    return True
+
+
+def isLineLocal(regExp):
+    """Check if the regular expression can be searched in every line separately
+    """
+    try:
+        parsed = sre_parse.parse(regExp.pattern, regExp.flags)
+    except Exception:  # pylint: disable=W0703
+        return False
+    return _isLineLocal(list(parsed), regExp.flags)
+
+
+class FoundItemsHighlighter(QObject):
+    """Highlights matches of the regular expression in the visible part of the document.
+
+    ``findAllMatches`` is a function ``(text, regExp) -> list of matches``. It is used for the regular
+    expressions, which can't be searched line by line
+    """
+    MAX_CACHED_LINES_COUNT = 20000
+
+    def __init__(self, findAllMatches, parent=None):
+        QObject.__init__(self, parent)
+        self._findAllMatches = findAllMatches
+        self._qutepart = None
+        self._regExp = None
+        self._lineLocal = False
+        self._lineMatches = collections.OrderedDict()  # line text: list of (start, length)
+
+        self._updateTimer = QTimer(self)
+        self._updateTimer.setSingleShot(True)
+        self._updateTimer.setInterval(0)
+        self._updateTimer.timeout.connect(self.update)
+
+    def highlight(self, qutepart, regExp):
+        """Highlight the regular expression in the document
+        """
+        if qutepart is not self._qutepart:
+            self._disconnectQutepart()
+            self._qutepart = qutepart
+            self._qutepart.verticalScrollBar().valueChanged.connect(self._onScrolled)
+            self._qutepart.destroyed.connect(self._onQutepartDestroyed)
+
+        if regExp != self._regExp:
+            self._regExp = regExp
+            self._lineLocal = isLineLocal(regExp)
+            self._lineMatches.clear()
+
+        self.update()
+
+    def clear(self):
+        """Remove highlighting and stop tracking the document
+        """
+        if self._qutepart is not None:
+            self._qutepart.setExtraSelections([])
+        self._disconnectQutepart()
+        self._regExp = None
+        self._lineMatches.clear()
+
+    def _disconnectQutepart(self):
+        self._updateTimer.stop()
+        if self._qutepart is not None:
+            try:
+                self._qutepart.verticalScrollBar().valueChanged.disconnect(self._onScrolled)
+                self._qutepart.destroyed.disconnect(self._onQutepartDestroyed)
+            except (RuntimeError, TypeError):  # already deleted
+                pass
+        self._qutepart = None
+
+    def _onScrolled(self):
+        """Update highlighting after the scrolling is done. Several scroll steps cause one update
+        """
+        self._updateTimer.start()
+
+    def _onQutepartDestroyed(self):
+        self._updateTimer.stop()
+        self._qutepart = None
+
+    def _visibleBlockNumbers(self):
+        """Get numbers of the first and the last block to highlight.
+        Visible blocks plus one screen before and one after
+        """
+        qpart = self._qutepart
+        firstBlock = qpart.firstVisibleBlock()
+        lastBlock = firstBlock
+        offset = qpart.contentOffset()
+        height = qpart.viewport().height()
+
+        block = firstBlock
+        while block.isValid() and \
+                qpart.blockBoundingGeometry(block).translated(offset).top() <= height:
+            lastBlock = block
+            block = block.next()
+
+        margin = lastBlock.blockNumber() - firstBlock.blockNumber() + 1
+        return max(0, firstBlock.blockNumber() - margin), lastBlock.blockNumber() + margin
+
+    def _matchesInLine(self, text):
+        """Get matches of the line. Cached by the line text
+        """
+        matches = self._lineMatches.get(text)
+        if matches is None:
+            matches = [(match.start(), len(match.group(0)))
+                       for match in self._regExp.finditer(text)]
+            self._lineMatches[text] = matches
+            if len(self._lineMatches) > self.MAX_CACHED_LINES_COUNT:
+                self._lineMatches.popitem(last=False)
+        return matches
+
+    def _selectionsLineByLine(self, firstBlockNumber, lastBlockNumber):
+        selections = []
+        block = self._qutepart.document().findBlockByNumber(firstBlockNumber)
+        while block.isValid() and block.blockNumber() <= lastBlockNumber:
+            blockPosition = block.position()
+            for start, length in self._matchesInLine(block.text()):
+                selections.append((blockPosition + start, length))
+            if len(selections) > MAX_EXTRA_SELECTIONS_COUNT:
+                break
+            block = block.next()
+        return selections
+
+    def _selectionsInWholeText(self, firstBlockNumber, lastBlockNumber):
+        document = self._qutepart.document()
+        startPos = document.findBlockByNumber(firstBlockNumber).position()
+        lastBlock = document.findBlockByNumber(lastBlockNumber)
+        if not lastBlock.isValid():
+            lastBlock = document.lastBlock()
+        endPos = lastBlock.position() + lastBlock.length()
+
+        matches = self._findAllMatches(self._qutepart.text, self._regExp)
+        firstIndex = bisect.bisect_left(_MatchStarts(matches), startPos)
+
+        selections = []
+        for index in range(firstIndex, len(matches)):
+            match = matches[index]
+            if match.start() > endPos or len(selections) > MAX_EXTRA_SELECTIONS_COUNT:
+                break
+            selections.append((match.start(), len(match.group(0))))
+        return selections
+
+    def update(self):
+        """Update highlighting after the text has been changed or scrolled
+        """
+        if self._qutepart is None or self._regExp is None:
+            return
+
+        firstBlockNumber, lastBlockNumber = self._visibleBlockNumbers()
+        if self._lineLocal:
+            selections = self._selectionsLineByLine(firstBlockNumber, lastBlockNumber)
+        else:
+            selections = self._selectionsInWholeText(firstBlockNumber, lastBlockNumber)
+
+        if len(selections) > MAX_EXTRA_SELECTIONS_COUNT:
+            selections = []
+        self._qutepart.setExtraSelections(selections)
+
+
+class _MatchStarts:
+    """Sequence of match start positions. Used for bisect without creating the list
+    """
+
+    def __init__(self, matches):
+        self._matches = matches
+
+    def __len__(self):
+        return len(self._matches)
+
+    def __getitem__(self, index):
+        return self._matches[index].start()
@@ -0,0 +1,101 @@
+"""
+replacer --- Replace found matches in the file contents
+=======================================================
+
+Functions, which do replacements in the text and in the files.
+
+The module doesn't depend on Qt and on Enki core. Therefore it can be used by the
+worker processes of the replace thread
+"""
+
+import os
+import os.path
+import tempfile
+
+from . import substitutions
+
+
+def doReplacements(content, matches, replaceText):
+    """Replace matches in the text in one pass.
+    ``matches`` is a list of search results. Every result has ``.match`` attribute
+    """
+    segments = []
+    pos = 0
+    for result in sorted(matches, key=lambda result: result.match.start()):
+        segments.append(content[pos:result.match.start()])
+        segments.append(substitutions.makeSubstitutions(replaceText, result.match))
+        pos = result.match.end()
+    segments.append(content[pos:])
+
+    return ''.join(segments)
+
+
+def readFile(fileName):
+    """Read file text.
+    Returns tuple ``(text, error message)``. Text is None, if failed to read the file
+    """
+    try:
+        with open(fileName, 'rb') as openFile:
+            content = openFile.read()
+    except IOError as ex:
+        return None, "Error opening file: %s" % str(ex)
+
+    try:
+        return str(content, 'utf8'), None
+    except UnicodeDecodeError as ex:
+        return None, "File %s not read: unicode error '%s'. File may be corrupted" % (fileName, str(ex))
+
+
+def saveFile(fileName, content):
+    """Write text to the file atomically.
+    The text is written to a temporary file in the same directory, which replaces the file.
+    Returns error message or None
+    """
+    try:
+        data = content.encode('utf8')
+    except UnicodeEncodeError as ex:
+        return "Failed to encode file to utf8: %s" % str(ex)
+
+    dirPath, baseName = os.path.split(fileName)
+    try:
+        fd, tmpPath = tempfile.mkstemp(dir=dirPath, prefix='.' + baseName + '.', suffix='.tmp')
+    except OSError as ex:
+        return "Error while saving replaced content: %s" % str(ex)
+
+    try:
+        with os.fdopen(fd, 'wb') as tmpFile:
+            tmpFile.write(data)
+        try:
+            os.chmod(tmpPath, os.stat(fileName).st_mode & 0o7777)  # mkstemp creates file with 0600 mode
+        except OSError:
+            pass
+        os.replace(tmpPath, fileName)
+    except OSError as ex:
+        try:
+            os.unlink(tmpPath)
+        except OSError:
+            pass
+        return "Error while saving replaced content: %s" % str(ex)
+
+    return None
+
+
+def replaceInFile(fileName, matches, replaceText):
+    """Do replacements in the file on disk.
+    Returns tuple ``(handled, error message or None)``. Matches are not handled, if failed to read the file
+    """
+    content, error = readFile(fileName)
+    if content is None:
+        return False, error
+
+    return True, saveFile(fileName, doReplacements(content, matches, replaceText))
+
+
+def replaceInFiles(items, replaceText):
+    """Do replacements in the files. Entry point of the replace worker process.
+
+    ``items`` is a list of tuples ``(fileName, matches)``.
+    Returns list of tuples ``(fileName, handled, error message or None)``
+    """
+    return [(fileName,) + replaceInFile(fileName, matches, replaceText)
+            for fileName, matches in items]
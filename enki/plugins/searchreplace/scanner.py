@@ -0,0 +1,771 @@
+"""
+scanner --- Search in the file contents
+=======================================
+
+Functions, which read files and find matches of a regular expression in them.
+
+The module doesn't depend on Qt and on Enki core. Therefore it can be used by the
+worker processes of the search thread
+
+Files on disk are searched without decoding, if it is possible. The file is memory mapped and the
+bytes version of the regular expression runs over the mapping. Only found matches are decoded.
+It is possible only if the bytes regular expression finds exactly the same matches in the UTF-8 text,
+as the original one, see ``bytesRegExp()``
+
+Literal patterns and alternations of literals are searched without the regular expression engine,
+see ``LiteralMatcher``
+
+Files, which are larger than the memory budget, are never read at once, see ``searchInLargeFile()``
+"""
+
+import codecs
+import collections
+import mmap
+import os
+import re
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+
+_BINARY_CHECK_SIZE = 4096
+
+LARGE_FILE_CHUNK_SIZE = 4 * 1024 * 1024  # bytes, which are read at once, when a large file is searched
+
+
+def _isBinary(fileObject):
+    """Expects, that file position is 0, when exits, file position is 0
+    """
+    binary = b'\0' in fileObject.read(_BINARY_CHECK_SIZE)
+    fileObject.seek(0)
+    return binary
+
+
+def fileContent(fileName):
+    """Read text from file.
+    Returns empty string for binary and not readable files
+    """
+    try:
+        with open(fileName, 'rb') as openedFile:
+            if _isBinary(openedFile):
+                return ''
+            return str(openedFile.read(), 'utf8', errors='ignore')
+    except IOError as ex:
+        print(ex)
+        return ''
+
+
+def fileLines(fileName, lineNumbers):
+    """Read text of the lines from the file. The file is read line by line, not at once.
+    Returns dict ``{line number: text}``. Empty for binary and not readable files
+    """
+    texts = {}
+    if not lineNumbers:
+        return texts
+
+    lastLine = max(lineNumbers)
+    try:
+        with open(fileName, 'rb') as openedFile:
+            if _isBinary(openedFile):
+                return texts
+            for lineNumber, data in enumerate(openedFile):
+                if lineNumber in lineNumbers:
+                    texts[lineNumber] = str(data, 'utf8', errors='ignore').rstrip('\n')
+                if lineNumber >= lastLine:
+                    break
+    except IOError as ex:
+        print(ex)
+    return texts
+
+
+class MatchData:
+    """Found match of the regular expression.
+
+    Provides the part of the ``re`` match object interface, which is used by the
+    search results and the replace code. Unlike the ``re`` match object, it doesn't
+    keep a reference to the searched text and can be pickled
+    """
+    __slots__ = ('_start', '_end', '_groups')
+
+    def __init__(self, start, end, groups):
+        self._start = start
+        self._end = end
+        self._groups = groups  # tuple. Whole match and all the groups
+
+    @classmethod
+    def fromMatch(cls, match):
+        """Construct from the ``re`` match object
+        """
+        return cls(match.start(), match.end(), (match.group(0),) + match.groups())
+
+    def __getstate__(self):
+        return (self._start, self._end, self._groups)
+
+    def __setstate__(self, state):
+        self._start, self._end, self._groups = state
+
+    def start(self):
+        return self._start
+
+    def end(self):
+        return self._end
+
+    def group(self, index=0):
+        """Text of the group. Raises IndexError if no such group
+        """
+        return self._groups[index]
+
+    def groups(self):
+        return self._groups[1:]
+
+
+def searchInText(regExp, content, shouldStop=None):
+    """Find all matches of regExp in the content.
+    ``regExp`` is a compiled regular expression or a LiteralMatcher.
+
+    Returns list of tuples ``(line, column, MatchData)``.
+    Text of the lines is not returned. It is loaded only, when the search result is shown
+    ``shouldStop`` is an optional callable. Search is interrupted, when it returns True
+    """
+    lastPos = 0
+    eolCount = 0
+    results = []
+    eol = "\n"
+
+    # Process result for all occurrences
+    for match in regExp.finditer(content):
+        start = match.start()
+
+        eolStart = content.rfind(eol, 0, start)
+        eolCount += content[lastPos:start].count(eol)
+        lastPos = start
+
+        column = start - eolStart
+        if eolStart != 0:
+            column -= 1
+
+        results.append((eolCount, column, MatchData.fromMatch(match)))
+
+        if shouldStop is not None and shouldStop():
+            break
+    return results
+
+
+# Letters, which match also non-ASCII characters, when case is ignored. I.e. ``k`` matches Kelvin sign
+_NON_ASCII_CASE_LETTERS = frozenset('iksIKS')
+
+_ASCII_CATEGORIES = (sre_parse.CATEGORY_DIGIT, sre_parse.CATEGORY_SPACE, sre_parse.CATEGORY_WORD)
+
+# Items, which check the text around the current position, but don't consume it
+_POSITIONAL_OPS = (sre_parse.ASSERT, sre_parse.ASSERT_NOT, sre_parse.GROUPREF)
+
+_REPEAT_OPS = tuple(getattr(sre_parse, name)
+                    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                    if hasattr(sre_parse, name))
+
+
+class _AsciiOnlyChecker:
+    """Checks, that the parsed regular expression can match only ASCII characters.
+
+    Exception is the greedy ``.*``. It matches whole UTF-8 sequences, if the pattern doesn't
+    contain lookarounds, back references and ``\\B``, which could stop them in the middle of a character
+    """
+
+    def __init__(self):
+        self.usesAny = False
+        self.usesPositional = False
+
+    def _isAsciiLiteral(self, code, flags):
+        if code >= 0x80:
+            return False
+        if flags & re.IGNORECASE and \
+           not flags & re.ASCII and \
+           chr(code) in _NON_ASCII_CASE_LETTERS:
+            return False
+        return True
+
+    def _isAsciiRange(self, low, high, flags):
+        if high >= 0x80:
+            return False
+        return all(self._isAsciiLiteral(code, flags) for code in range(low, high + 1))
+
+    def _isAsciiSet(self, items, flags):
+        for op, arg in items:
+            if op is sre_parse.LITERAL:
+                if not self._isAsciiLiteral(arg, flags):
+                    return False
+            elif op is sre_parse.RANGE:
+                if not self._isAsciiRange(arg[0], arg[1], flags):
+                    return False
+            elif op is sre_parse.CATEGORY:
+                if not (flags & re.ASCII and arg in _ASCII_CATEGORIES):
+                    return False
+            else:  # NEGATE and others
+                return False
+        return True
+
+    def check(self, items, flags):
+        for op, arg in items:
+            if op is sre_parse.LITERAL:
+                if not self._isAsciiLiteral(arg, flags):
+                    return False
+            elif op is sre_parse.IN:
+                if not self._isAsciiSet(arg, flags):
+                    return False
+            elif op is sre_parse.AT:
+                if arg in (sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY):
+                    if not flags & re.ASCII:
+                        return False
+                    if arg is sre_parse.AT_NON_BOUNDARY:
+                        self.usesPositional = True
+            elif op is sre_parse.SUBPATTERN:
+                _group, addFlags, delFlags, subItems = arg
+                if not self.check(subItems, (flags | addFlags) & ~delFlags):
+                    return False
+            elif op in _REPEAT_OPS:
+                minCount, maxCount, subItems = arg
+                if len(subItems) == 1 and subItems[0][0] is sre_parse.ANY:
+                    if op is not sre_parse.MAX_REPEAT or \
+                       minCount > 0 or \
+                       maxCount != sre_parse.MAXREPEAT:
+                        return False
+                    self.usesAny = True
+                elif not self.check(subItems, flags):
+                    return False
+            elif op is sre_parse.BRANCH:
+                if not all(self.check(branch, flags) for branch in arg[1]):
+                    return False
+            elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                self.usesPositional = True
+                if not self.check(arg[1], flags):
+                    return False
+            elif op is sre_parse.GROUPREF:
+                if flags & re.IGNORECASE:
+                    return False
+                self.usesPositional = True
+            elif op is sre_parse.GROUPREF_EXISTS:
+                _group, yesItems, noItems = arg
+                if not self.check(yesItems, flags):
+                    return False
+                if noItems is not None and not self.check(noItems, flags):
+                    return False
+            else:  # ANY, NOT_LITERAL and other items, which match non-ASCII characters
+                return False
+
+        return not (self.usesAny and self.usesPositional)
+
+
+def bytesRegExp(regExp):
+    """Compile bytes version of the str regular expression.
+
+    Returns None, if the bytes version might find different matches in the UTF-8 encoded text.
+    It is so, if the pattern might match non-ASCII characters or an empty string
+    """
+    if not regExp.pattern.isascii():
+        return None
+
+    try:
+        parsed = sre_parse.parse(regExp.pattern, regExp.flags)
+    except Exception:  # pylint: disable=W0703
+        return None
+
+    if parsed.getwidth()[0] == 0:
+        return None  # Empty matches are found on every byte, not on every character
+
+    if not _AsciiOnlyChecker().check(list(parsed), regExp.flags):
+        return None
+
+    try:
+        return re.compile(regExp.pattern.encode('ascii'), regExp.flags & ~re.UNICODE)
+    except re.error:  # i.e. (?u) in the pattern
+        return None
+
+
+_MAX_LITERAL_COUNT = 10000  # limit of literals, when expanding a pattern to the list of literals
+
+
+def _isWordChar(char, asciiOnly):
+    """Check if the character is a word character as ``\\w`` in the regular expression
+    """
+    if not char:  # begin or end of the text
+        return False
+    if asciiOnly and not char.isascii():
+        return False
+    return char.isalnum() or char == '_'
+
+
+def _charBefore(text, pos):
+    """Get character before the position. Text is str or UTF-8 bytes
+    """
+    if pos == 0:
+        return ''
+    if isinstance(text, str):
+        return text[pos - 1]
+
+    start = pos - 1
+    while start > 0 and pos - start < 4 and 0x80 <= text[start] < 0xc0:  # continuation byte
+        start -= 1
+    return str(text[start:pos], 'utf8', errors='ignore')[-1:]
+
+
+def _charAfter(text, pos):
+    """Get character after the position. Text is str or UTF-8 bytes
+    """
+    if isinstance(text, str):
+        return text[pos:pos + 1]
+    return str(text[pos:pos + 4], 'utf8', errors='ignore')[:1]
+
+
+def _triePattern(literals):
+    """Build regular expression, which matches any of the literals.
+    Alternatives are organized as a trie, therefore the regular expression engine doesn't try
+    every literal at every position. Works for str and bytes
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for index in range(len(literal)):
+            node = node.setdefault(literal[index:index + 1], {})
+        node[None] = {}  # end of a literal
+
+    empty = literals[0][:0]
+
+    def nodePattern(node):
+        branches = [re.escape(key) + nodePattern(child)
+                    for key, child in sorted(node.items(), key=lambda item: item[0] or empty)
+                    if key is not None]
+        if not branches:
+            return empty
+        if len(branches) == 1 and None not in node:
+            return branches[0]
+
+        if isinstance(empty, str):
+            pattern = '(?:' + '|'.join(branches) + ')'
+            return pattern + '?' if None in node else pattern
+        else:
+            pattern = b'(?:' + b'|'.join(branches) + b')'
+            return pattern + b'?' if None in node else pattern
+
+    return nodePattern(trie)
+
+
+class LiteralMatcher:
+    """Finds matches of a pattern, which is a literal string or an alternation of literal strings,
+    optionally surrounded by ``\\b``.
+
+    Provides ``finditer()`` of the regular expression and finds the same matches. Single literal
+    is found with ``str.find()``, alternation of literals - with one regular expression, which is built as
+    a trie. As the regular expression does, at every position the first of the literals in the pattern
+    order wins. Works for str and UTF-8 bytes
+    """
+
+    def __init__(self, literals, wordStart=False, wordEnd=False, asciiWords=False):
+        self._literals = literals
+        self._wordStart = wordStart
+        self._wordEnd = wordEnd
+        self._asciiWords = asciiWords
+
+        if len(literals) > 1:
+            self._finder = re.compile(_triePattern(literals))
+        else:
+            self._finder = None
+
+        # First item: list of tuples (literal, is first char word, is last char word), in the pattern order
+        self._candidates = {}
+        for literal in literals:
+            text = literal if isinstance(literal, str) else str(literal, 'utf8')
+            self._candidates.setdefault(literal[:1], []).append(
+                (literal,
+                 _isWordChar(text[:1], asciiWords),
+                 _isWordChar(text[-1:], asciiWords)))
+
+    def encoded(self):
+        """Get the matcher for the UTF-8 encoded text
+        """
+        return LiteralMatcher([literal.encode('utf8') for literal in self._literals],
+                              self._wordStart, self._wordEnd, self._asciiWords)
+
+    def _findCandidate(self, text, pos):
+        """Find position, where one of literals starts. Returns -1 if not found
+        """
+        if self._finder is None:
+            return text.find(self._literals[0], pos)
+
+        match = self._finder.search(text, pos)
+        return match.start() if match is not None else -1
+
+    def _literalAt(self, text, start):
+        """Find the first literal, which matches at the position, taking word boundaries into account
+        """
+        if self._wordStart:
+            prevIsWord = _isWordChar(_charBefore(text, start), self._asciiWords)
+
+        for literal, firstIsWord, lastIsWord in self._candidates.get(text[start:start + 1], ()):
+            end = start + len(literal)
+            if text[start:end] != literal:
+                continue
+            if self._wordStart and prevIsWord == firstIsWord:
+                continue
+            if self._wordEnd and lastIsWord == _isWordChar(_charAfter(text, end), self._asciiWords):
+                continue
+            return literal
+
+        return None
+
+    def maxWidth(self):
+        """Count of characters after the match start, which are checked to find the match
+        """
+        return max(len(literal) for literal in self._literals) + 1  # and the char after the literal
+
+    def finditer(self, text, pos=0):
+        """Generator. Yields MatchData for every match, which starts at or after ``pos``
+        """
+        while True:
+            start = self._findCandidate(text, pos)
+            if start == -1:
+                return
+
+            literal = self._literalAt(text, start)
+            if literal is None:  # word boundary is not found
+                pos = start + 1
+                continue
+
+            end = start + len(literal)
+            yield MatchData(start, end, (literal,))
+            pos = end
+
+
+def _literalAlternatives(items):
+    """Expand the parsed sequence of regular expression items to the list of literals in the order,
+    in which the regular expression engine tries them.
+    Returns None, if the items are not a literal or an alternation of literals
+    """
+    result = ['']
+    for op, arg in items:
+        if op is sre_parse.LITERAL:
+            options = [chr(arg)]
+        elif op is sre_parse.IN and all(itemOp is sre_parse.LITERAL for itemOp, _itemArg in arg):
+            options = [chr(code) for _itemOp, code in arg]
+        elif op is sre_parse.BRANCH:
+            options = []
+            for branch in arg[1]:
+                branchOptions = _literalAlternatives(branch)
+                if branchOptions is None:
+                    return None
+                options.extend(branchOptions)
+        elif op is sre_parse.SUBPATTERN and arg[:3] == (None, 0, 0):  # not capturing group without flags
+            options = _literalAlternatives(arg[-1])
+            if options is None:
+                return None
+        else:
+            return None
+
+        if len(result) * len(options) > _MAX_LITERAL_COUNT:
+            return None
+        result = [prefix + option for prefix in result for option in options]
+
+    return result
+
+
+def literalMatcher(regExp):
+    """Create LiteralMatcher, if the regular expression is a literal or an alternation of literals.
+    Otherwise returns None
+    """
+    if regExp.flags & re.IGNORECASE or regExp.groups:
+        return None
+
+    try:
+        items = list(sre_parse.parse(regExp.pattern, regExp.flags))
+    except Exception:  # pylint: disable=W0703
+        return None
+
+    boundary = (sre_parse.AT, sre_parse.AT_BOUNDARY)
+    wordStart = bool(items) and items[0] == boundary
+    if wordStart:
+        items = items[1:]
+    wordEnd = bool(items) and items[-1] == boundary
+    if wordEnd:
+        items = items[:-1]
+
+    literals = _literalAlternatives(items)
+    if literals is None or not all(literals):  # empty literal matches everywhere
+        return None
+
+    # Duplicates never win
+    uniqueLiterals = list(collections.OrderedDict.fromkeys(literals))
+
+    return LiteralMatcher(uniqueLiterals, wordStart, wordEnd, bool(regExp.flags & re.ASCII))
+
+
+def _charCount(data):
+    """Count of characters in the UTF-8 bytes
+    """
+    if data.isascii():
+        return len(data)
+    return len(str(data, 'utf8', errors='ignore'))
+
+
+def _decode(data):
+    return str(data, 'utf8', errors='ignore') if data is not None else None
+
+
+def _searchInMapping(regExp, mapping, shouldStop):
+    """Find matches of the bytes regExp in the memory mapped file.
+    Generator. Yields tuples ``(byte position, searchInText() result item)``.
+
+    Results are the same as ``searchInText()`` result for the decoded file.
+    The only difference is for not valid UTF-8 files. Decoded text doesn't contain invalid sequences,
+    and the text around them is joined. Bytes matches never span invalid sequences
+    """
+    lastPos = 0
+    lastCharPos = 0  # Position of lastPos in characters
+    eolCount = 0
+    eol = b"\n"
+
+    for match in regExp.finditer(mapping):
+        start = match.start()
+
+        eolStart = mapping.rfind(eol, 0, start)
+        gap = mapping[lastPos:start]
+        eolCount += gap.count(eol)
+        lastCharPos += _charCount(gap)
+        lastPos = start
+
+        column = _charCount(mapping[eolStart + 1:start])
+        if eolStart == 0:
+            column += 1
+
+        groups = tuple(_decode(group) for group in (match.group(0),) + match.groups())
+        matchData = MatchData(lastCharPos, lastCharPos + len(groups[0]), groups)
+        yield start, (eolCount, column, matchData)
+
+        if shouldStop is not None and shouldStop():
+            break
+
+
+def searchInMappedFile(regExp, fileName, shouldStop=None):
+    """Find all matches of the bytes regExp in the file without reading and decoding all the file.
+    ``regExp`` is a ``bytesRegExp()`` result or an encoded LiteralMatcher.
+
+    Returns the same result as ``searchInText()`` for the file text.
+    Binary and not readable files have no matches
+    """
+    try:
+        with open(fileName, 'rb') as openedFile:
+            if os.fstat(openedFile.fileno()).st_size == 0:
+                return []  # empty file can't be mapped
+            with mmap.mmap(openedFile.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                if mapping.find(b'\0', 0, _BINARY_CHECK_SIZE) != -1:
+                    return []
+                return [result for _pos, result in _searchInMapping(regExp, mapping, shouldStop)]
+    except (IOError, ValueError) as ex:
+        print(ex)
+        return []
+
+
+def _assertionsWidth(items):
+    """Sum of the longest lengths of the lookahead and lookbehind assertions in the parsed items
+    """
+    width = 0
+    for op, arg in items:
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            width += arg[1].getwidth()[1] + _assertionsWidth(arg[1])
+        elif op is sre_parse.SUBPATTERN:
+            width += _assertionsWidth(arg[-1])
+        elif op in _REPEAT_OPS:
+            width += _assertionsWidth(arg[2])
+        elif op is sre_parse.BRANCH:
+            width += max(_assertionsWidth(branch) for branch in arg[1])
+        elif op is sre_parse.GROUPREF_EXISTS:
+            width += max(_assertionsWidth(branch) for branch in arg[1:] if branch is not None)
+    return width
+
+
+def maxMatchWidth(regExp):
+    """Count of characters after the match start, which the regular expression checks to find
+    the match, or which it checks before the match. None if it is not limited, i.e. for ``a+``
+    """
+    if isinstance(regExp, LiteralMatcher):
+        return regExp.maxWidth()
+
+    try:
+        parsed = sre_parse.parse(regExp.pattern, regExp.flags)
+    except Exception:  # pylint: disable=W0703
+        return None
+
+    width = parsed.getwidth()[1]
+    if width >= sre_parse.MAXREPEAT:
+        return None
+    return width + _assertionsWidth(list(parsed)) + 1  # and the char after the match for \b and $
+
+
+def _fileTextChunks(openedFile, chunkSize):
+    """Read and decode the file by chunks. Generator. Yields str
+    """
+    decoder = codecs.getincrementaldecoder('utf8')(errors='ignore')
+    while True:
+        data = openedFile.read(chunkSize)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b'', True)
+
+
+def _searchInChunks(regExp, chunks, overlap, shouldStop=None):
+    """Find matches of regExp in the text, which is given as a sequence of str chunks.
+    Generator. Yields not empty lists of ``searchInText()`` results, a list per chunk.
+
+    Only the current chunk and ``overlap`` characters before it are kept in the memory.
+    A match, which ends in the last ``overlap`` characters of the chunk, might be not complete yet.
+    It is searched again, when the next chunk is appended. Line numbers are counted incrementally.
+    If a match can be longer than ``overlap``, it might be truncated
+    """
+    buffer = ''
+    bufferPos = 0  # position of buffer[0] in the text
+    lastPos = 0  # position in the buffer, up to which the line breaks are counted
+    eolCount = 0  # line number of lastPos
+    lastEolPos = -1  # position of the last line break before the buffer in the text
+    searchPos = 0  # position in the buffer, from which the search continues
+    lastEmptyMatchPos = None  # empty match at this position in the text has already been found
+    eol = "\n"
+
+    chunks = iter(chunks)
+    lastChunk = False
+    while not lastChunk:
+        chunk = next(chunks, None)
+        if chunk is None:
+            lastChunk = True
+        else:
+            buffer += chunk
+
+        bufferLength = len(buffer)
+        results = []
+        resumePos = max(searchPos, bufferLength - overlap)
+        for match in regExp.finditer(buffer, searchPos):
+            start = match.start()
+            end = match.end()
+            if not lastChunk and end > bufferLength - overlap and start >= bufferLength - 2 * overlap:
+                resumePos = start  # the match might change, when the text is continued
+                break
+
+            if start == end:
+                if bufferPos + start == lastEmptyMatchPos:
+                    continue
+                lastEmptyMatchPos = bufferPos + start
+
+            eolCount += buffer.count(eol, lastPos, start)
+            lastPos = start
+
+            eolStart = buffer.rfind(eol, 0, start)
+            eolStart = bufferPos + eolStart if eolStart != -1 else lastEolPos
+            column = bufferPos + start - eolStart - 1
+            if eolStart == 0:
+                column += 1  # as searchInText() does
+
+            results.append((eolCount,
+                            column,
+                            MatchData(bufferPos + start, bufferPos + end,
+                                      (match.group(0),) + match.groups())))
+            resumePos = max(resumePos, end)
+
+            if shouldStop is not None and shouldStop():
+                lastChunk = True
+                break
+
+        if results:
+            yield results
+
+        # Keep the not searched text and the context before it
+        keepFrom = max(0, resumePos - overlap)
+        if lastPos < keepFrom:
+            eolCount += buffer.count(eol, lastPos, keepFrom)
+            lastPos = keepFrom
+        eolBeforeKept = buffer.rfind(eol, 0, keepFrom)
+        if eolBeforeKept != -1:
+            lastEolPos = bufferPos + eolBeforeKept
+
+        buffer = buffer[keepFrom:]
+        bufferPos += keepFrom
+        lastPos -= keepFrom
+        searchPos = resumePos - keepFrom
+
+
+def searchInLargeFile(regExp, fileName, window, bytesRegExp=None, shouldStop=None):
+    """Search in the file, which is too large to read it to the memory at once.
+    Generator. Yields lists of ``searchInText()`` results, as the search goes through the file.
+
+    If ``bytesRegExp`` is not None, the memory mapped file is searched. Otherwise the file is read
+    and decoded by chunks of ``LARGE_FILE_CHUNK_SIZE`` bytes. Chunks overlap by the longest possible match
+    or by ``window`` characters, if the match length is not limited.
+    Binary and not readable files have no matches
+    """
+    try:
+        with open(fileName, 'rb') as openedFile:
+            if bytesRegExp is not None:
+                if os.fstat(openedFile.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(openedFile.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                    if mapping.find(b'\0', 0, _BINARY_CHECK_SIZE) != -1:
+                        return
+                    results = []
+                    nextChunkPos = LARGE_FILE_CHUNK_SIZE
+                    for pos, result in _searchInMapping(bytesRegExp, mapping, shouldStop):
+                        if pos >= nextChunkPos and results:
+                            yield results
+                            results = []
+                            nextChunkPos = pos + LARGE_FILE_CHUNK_SIZE
+                        results.append(result)
+                    if results:
+                        yield results
+            else:
+                if _isBinary(openedFile):
+                    return
+                overlap = maxMatchWidth(regExp)
+                if overlap is None or overlap > window:
+                    overlap = window
+                yield from _searchInChunks(regExp,
+                                           _fileTextChunks(openedFile, LARGE_FILE_CHUNK_SIZE),
+                                           max(overlap, 1),
+                                           shouldStop)
+    except (IOError, ValueError) as ex:
+        print(ex)
+
+
+def isLargeFile(fileName, largeFileSize):
+    """Check if the file is larger than ``largeFileSize`` bytes and shall be searched with
+    ``searchInLargeFile()``
+    """
+    try:
+        return os.path.getsize(fileName) > largeFileSize
+    except OSError:
+        return False
+
+
+def searchInFiles(regExp, items, bytesRegExp=None, largeFileSize=None):
+    """Search in the list of files. Entry point of the search worker process.
+
+    ``items`` is a list of tuples ``(fileName, content)``. ``content`` is a text of opened
+    document or None, if the file shall be read from the disk.
+    ``regExp`` is a compiled regular expression or a LiteralMatcher.
+    ``bytesRegExp`` is a ``bytesRegExp()`` result or an encoded LiteralMatcher. If not None, files on disk
+    are memory mapped and searched without decoding.
+    Files on disk, which are larger than ``largeFileSize`` bytes, are not searched.
+
+    Returns list of tuples ``(fileName, searchInText() result)`` for files, which contain matches.
+    Matches of not searched large files are None
+    """
+    results = []
+    for fileName, content in items:
+        if content is not None:
+            matches = searchInText(regExp, content)
+        elif largeFileSize is not None and isLargeFile(fileName, largeFileSize):
+            matches = None
+        elif bytesRegExp is not None:
+            matches = searchInMappedFile(bytesRegExp, fileName)
+        else:
+            matches = searchInText(regExp, fileContent(fileName))
+        if matches is None or matches:
+            results.append((fileName, matches))
+    return results
@@ -0,0 +1,104 @@
+"""
+searchcache --- Results of the recent searches in directory
+===========================================================
+
+When the same search is repeated, the files, which haven't been changed since the previous search,
+are not searched again. Their results are taken from the cache.
+
+The module doesn't depend on Qt
+"""
+
+import collections
+import os
+import threading
+
+
+class SearchCache:
+    """Results of the recent searches for the current Enki session.
+
+    Search is identified by the key ``(pattern, flags, mask, root)``. For every search the cache
+    stores matches of the files. File entry is valid while file mtime and size are not changed.
+
+    Methods are thread safe
+    """
+    MAX_SEARCH_COUNT = 4  # count of remembered searches
+
+    def __init__(self):
+        self._searches = collections.OrderedDict()  # key: {file name: (mtime, size, matches)}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def searchKey(regExp, mask, root):
+        return (regExp.pattern, regExp.flags, tuple(mask), os.path.abspath(root))
+
+    def session(self, key):
+        """Get the cache of the search
+        """
+        with self._lock:
+            entries = self._searches.get(key, {})
+        return _SearchSession(self, key, entries)
+
+    def _save(self, key, entries):
+        with self._lock:
+            self._searches.pop(key, None)
+            self._searches[key] = entries
+            while len(self._searches) > self.MAX_SEARCH_COUNT:
+                self._searches.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._searches.clear()
+
+
+class _SearchSession:
+    """Cache of one search. Used by one search thread.
+
+    Old entries are read, new entries are collected and replace the old ones on ``save()``.
+    Entries of the files, which haven't been seen by the search, are dropped. Therefore deleted files
+    disappear from the cache
+    """
+
+    def __init__(self, cache, key, entries):
+        self._cache = cache
+        self._key = key
+        self._oldEntries = entries
+        self._newEntries = {}
+
+    @staticmethod
+    def fileStat(fileName):
+        """Get tag of the file state. None if the file doesn't exist
+        """
+        try:
+            stat = os.stat(fileName)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def matches(self, fileName, fileStat):
+        """Get cached matches of the file. None if the file is not cached or changed.
+        Returned matches are remembered for the next search
+        """
+        entry = self._oldEntries.get(fileName)
+        if entry is None or fileStat is None or entry[0] != fileStat:
+            return None
+
+        self._newEntries[fileName] = entry
+        return entry[1]
+
+    def store(self, fileName, fileStat, matches):
+        """Remember matches of the searched file.
+        ``fileStat`` is a ``fileStat()`` result, got before the search
+        """
+        if fileStat is not None:
+            self._newEntries[fileName] = (fileStat, matches)
+
+    def save(self, complete):
+        """Save the entries to the cache.
+        If the search was not ``complete``, not seen entries are kept
+        """
+        if complete:
+            entries = self._newEntries
+        else:
+            entries = dict(self._oldEntries)
+            entries.update(self._newEntries)
+        self._cache._save(self._key, entries)
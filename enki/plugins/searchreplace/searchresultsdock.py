@@ -159,16 +159,16 @@ class SearchResultsDock(DockWidget):
     def _onResultActivated(self, index):
         """Item doubleclicked in the model, opening file
         """
-        result = index.internalPointer()
-        if isinstance(result, searchresultsmodel.Result):
-            fileResults = index.parent().internalPointer()
+        if self._model.isResult(index):
+            fileResults = self._model.fileResultsForIndex(index)
+            result = fileResults.result(index.row())
             core.workspace().goTo(result.fileName,
                                   line=result.line,
                                   column=result.column,
                                   selectionLength=len(result.match.group(0)))
             core.mainWindow().statusBar().showMessage('Match %d of %d' %
-                                                      (fileResults.results.index(result) + 1,
-                                                       len(fileResults.results)), 3000)
+                                                      (index.row() + 1,
+                                                       fileResults.count()), 3000)
             self.setFocus()
 
     def clear(self):
@@ -187,11 +187,9 @@ class SearchResultsDock(DockWidget):
         items = {}
 
         for fileRes in self._model.fileResults:
-            for row, result in enumerate(fileRes.results):
-                if result.checkState == Qt.Checked:
-                    if result.fileName not in items:
-                        items[result.fileName] = []
-                    items[result.fileName].append(result)
+            results = fileRes.checkedResults()
+            if results:
+                items[fileRes.fileName] = results
         return items
 
     def setReplaceMode(self, enabled):
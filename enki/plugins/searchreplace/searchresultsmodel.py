@@ -3,29 +3,185 @@ searchresultsmodel --- Model for search results
 ===============================================
 """
 
+from array import array
+
 from PyQt5.QtCore import pyqtSignal, QAbstractItemModel, QDir, QModelIndex, Qt
 from PyQt5.QtWidgets import QApplication
 
+from enki.core.core import core
 from enki.lib.htmldelegate import htmlEscape
+from . import scanner
+
 
+class Result:
+    """One found by search thread item. Consists coordinates and capture.
 
-class Result:  # pylint: disable=R0902
-    """One found by search thread item. Consists coordinates and capture. Used by SearchResultsModel
+    Results are stored by FileResults in the columnar form. Result objects are created only
+    for the activated item and for the items, which shall be replaced
     """
+    __slots__ = ('fileName', 'line', 'column', 'match')
 
-    def __init__(self, fileName, wholeLine, line, column, match):  # pylint: disable=R0913
+    def __init__(self, fileName, line, column, match):
         self.fileName = fileName
-        self.wholeLine = wholeLine
         self.line = line
         self.column = column
-        self.match = match
+        self.match = match  # scanner.MatchData
+
+
+class FileResults:
+    """Object stores all items, found in the file.
+
+    Items are stored in arrays, one array per field. Text of the lines with matches is not stored
+    by the search thread. It is loaded from the file, when the model shows the first item of the file
+    """
+
+    def __init__(self, baseDir, fileName, matches):
+        """``matches`` is a ``scanner.searchInText()`` result
+        """
+        self.baseDir = baseDir
+        self.fileName = fileName
         self.checkState = Qt.Checked
+        self.row = None  # row in the model. Maintained by the model
+
+        self._lines = array('l', (line for line, _column, _match in matches))
+        self._columns = array('l', (column for _line, column, _match in matches))
+        self._starts = array('q', (match.start() for _line, _column, match in matches))
+        self._ends = array('q', (match.end() for _line, _column, match in matches))
+        self._groups = [(match.group(0),) + match.groups() for _line, _column, match in matches]
+        self._checkStates = bytearray([Qt.Checked]) * len(matches)
+        self._checkedCount = len(matches)
 
-    def text(self):  # pylint: disable=W0613
+        self._lineTexts = None  # dict line number: text. Loaded on demand
+
+    def extend(self, other):
+        """Append items of other FileResults of the same file.
+        Used, when matches of a large file come by parts
+        """
+        self._lines.extend(other._lines)
+        self._columns.extend(other._columns)
+        self._starts.extend(other._starts)
+        self._ends.extend(other._ends)
+        self._groups.extend(other._groups)
+        self._checkStates.extend(other._checkStates)
+        self._checkedCount += other._checkedCount
+        self.updateCheckState()
+
+    def __str__(self):
+        """Convertor to string. Used for debugging
+        """
+        return '%s (%d)' % (self.fileName, self.count())
+
+    def count(self):
+        """Count of found items
+        """
+        return len(self._lines)
+
+    def result(self, row):
+        """Create Result object for the item
+        """
+        groups = self._groups[row]
+        return Result(self.fileName,
+                      self._lines[row],
+                      self._columns[row],
+                      scanner.MatchData(self._starts[row], self._ends[row], groups))
+
+    def checkedResults(self):
+        """List of Result objects for checked items
+        """
+        return [self.result(row)
+                for row in range(self.count())
+                if self._checkStates[row] == Qt.Checked]
+
+    def findRows(self, results):
+        """Find rows of the Result objects, which have been created by this object.
+        Returns list of rows in ascending order
+        """
+        if len(results) == self.count():
+            return list(range(self.count()))  # all results are handled, usual case for replace
+        spans = {(result.match.start(), result.match.end()) for result in results}
+        return [row for row in range(self.count())
+                if (self._starts[row], self._ends[row]) in spans]
+
+    def removeRows(self, row, count):
+        """Remove items
+        """
+        self._checkedCount -= self._checkStates.count(Qt.Checked, row, row + count)
+        for column in (self._lines, self._columns, self._starts, self._ends, self._groups, self._checkStates):
+            del column[row:row + count]
+
+    def resultCheckState(self, row):
+        return Qt.CheckState(self._checkStates[row])
+
+    def setResultCheckState(self, row, state):
+        if self._checkStates[row] == Qt.Checked:
+            self._checkedCount -= 1
+        if state == Qt.Checked:
+            self._checkedCount += 1
+        self._checkStates[row] = state
+        self.updateCheckState()
+
+    def setCheckState(self, state):
+        """Set checked state of the file and of all items
+        """
+        self.checkState = state
+        self._checkStates[:] = bytearray([state]) * self.count()
+        self._checkedCount = self.count() if state == Qt.Checked else 0
+
+    def updateCheckState(self):
+        """Update own checked state after checked state of child result changed or
+        child result removed
+        """
+        if self._checkedCount == self.count():  # if all checked
+            self.checkState = Qt.Checked
+        elif self._checkedCount:  # if any checked
+            self.checkState = Qt.PartiallyChecked
+        else:
+            self.checkState = Qt.Unchecked
+
+    def _loadLineTexts(self):
+        """Load text of the lines with matches, which are not loaded yet, from the opened document or
+        from the file
+        """
+        if self._lineTexts is None:
+            self._lineTexts = {}
+
+        requiredLines = set()
+        for row in range(self.count()):
+            firstLine = self._lines[row]
+            lastLine = firstLine + self._groups[row][0].count('\n')
+            for line in range(firstLine, lastLine + 1):
+                if line not in self._lineTexts:
+                    requiredLines.add(line)
+
+        document = core.workspace().findDocumentForPath(self.fileName)
+        if document is not None:
+            lines = document.qutepart.lines
+            texts = {line: lines[line] for line in requiredLines if line < len(lines)}
+        else:
+            texts = scanner.fileLines(self.fileName, requiredLines)
+
+        for line in requiredLines:
+            self._lineTexts[line] = texts.get(line, '')
+
+    def _wholeLine(self, row):
+        """Text of the line (or lines), which contain the match
+        """
+        firstLine = self._lines[row]
+        lastLine = firstLine + self._groups[row][0].count('\n')
+        if self._lineTexts is None or \
+           firstLine not in self._lineTexts or \
+           lastLine not in self._lineTexts:
+            self._loadLineTexts()
+        return '\n'.join(self._lineTexts[line] for line in range(firstLine, lastLine + 1))
+
+    def resultText(self, row):
         """Displayable text of search result. Shown as line in the search results dock
         """
-        beforeMatch = self.wholeLine[:self.column].lstrip()
-        afterMatch = self.wholeLine[self.column + len(self.match.group(0)):].rstrip()
+        wholeLine = self._wholeLine(row)
+        column = self._columns[row]
+        matchText = self._groups[row][0]
+        beforeMatch = wholeLine[:column].lstrip()
+        afterMatch = wholeLine[column + len(matchText):].rstrip()
 
         if QApplication.instance().palette().base().color().lightnessF() > 0.5:
             backgroundColor = 'yellow'
@@ -39,54 +195,23 @@ class Result:  # pylint: disable=R0902
             '<font style=\'background-color: %s; color: %s\'>%s</font>' \
             '%s' \
                '</html>' % \
-            (self.line + 1,
-             self.column,
+            (self._lines[row] + 1,
+             column,
              htmlEscape(beforeMatch),
              backgroundColor,
              foregroundColor,
-             htmlEscape(self.match.group(0)),
+             htmlEscape(matchText),
              htmlEscape(afterMatch))
 
-    def tooltip(self):
+    def resultTooltip(self, row):
         """Tooltip of the search result"""
-        return self.wholeLine.strip()
-
-    def hasChildren(self):
-        """Check if QAbstractItem has children"""
-        return False
-
-
-class FileResults:
-    """Object stores all items, found in the file
-    """
-
-    def __init__(self, baseDir, fileName, results):
-        self.baseDir = baseDir
-        self.fileName = fileName
-        self.results = results
-        self.checkState = Qt.Checked
-
-    def __str__(self):
-        """Convertor to string. Used for debugging
-        """
-        return '%s (%d)' % (self.fileName, len(self.results))
-
-    def updateCheckState(self):
-        """Update own checked state after checked state of child result changed or
-        child result removed
-        """
-        if all([res.checkState == Qt.Checked for res in self.results]):  # if all checked
-            self.checkState = Qt.Checked
-        elif any([res.checkState == Qt.Checked for res in self.results]):  # if any checked
-            self.checkState = Qt.PartiallyChecked
-        else:
-            self.checkState = Qt.Unchecked
+        return self._wholeLine(row).strip()
 
     def text(self):
         """Displayable text of the file results. Shown as line in the search results dock
         baseDir is base directory of current search operation
         """
-        return '%s (%d)' % (QDir(self.baseDir).relativeFilePath(self.fileName), len(self.results))
+        return '%s (%d)' % (QDir(self.baseDir).relativeFilePath(self.fileName), self.count())
 
     def tooltip(self):
         """Tooltip of the item in the results dock
@@ -96,11 +221,13 @@ class FileResults:
     def hasChildren(self):
         """Check if item has children
         """
-        return 0 != len(self.results)
+        return 0 != self.count()
 
 
 class SearchResultsModel(QAbstractItemModel):
     """AbstractItemodel used for display search results in 'Search in directory' and 'Replace in directory' mode
+
+    Index of a file has no internal pointer. Index of a result points to its FileResults
     """
     firstResultsAvailable = pyqtSignal()
 
@@ -111,6 +238,8 @@ class SearchResultsModel(QAbstractItemModel):
         self._replaceMode = False
 
         self.fileResults = []  # list of FileResults
+        self._fileResultsByName = {}
+        self._matchesCount = 0
 
     def setReplaceMode(self, enabled):
         """When replace mode is enabled, all items are checkState
@@ -118,9 +247,20 @@ class SearchResultsModel(QAbstractItemModel):
         self._replaceMode = enabled
         if self.fileResults:
             self.dataChanged.emit(self.index(0, 0, QModelIndex()),
-                                  self.index(len(self.fileResults) - 1,
-                                             len(self.fileResults[-1].results) - 1,
-                                             QModelIndex()))
+                                  self.index(len(self.fileResults) - 1, 0, QModelIndex()))
+
+    def isResult(self, index):
+        """Check if the index is an index of a result. Otherwise it is a file
+        """
+        return index.isValid() and index.internalPointer() is not None
+
+    def fileResultsForIndex(self, index):
+        """Get FileResults for the index of a file or of a result
+        """
+        if self.isResult(index):
+            return index.internalPointer()
+        else:
+            return self.fileResults[index.row()]
 
     def index(self, row, column, parent):
         """See QAbstractItemModel docs
@@ -129,35 +269,28 @@ class SearchResultsModel(QAbstractItemModel):
             return QModelIndex()
 
         if parent.isValid():  # index for result
-            result = parent.internalPointer().results[row]
-            return self.createIndex(row, column, result)
+            return self.createIndex(row, column, self.fileResults[parent.row()])
         else:  # need index for fileRes
-            return self.createIndex(row, column, self.fileResults[row])
+            return self.createIndex(row, column)
 
     def parent(self, index):
         """See QAbstractItemModel docs
         """
-        if not index.isValid():
+        if not self.isResult(index):  # it is an top level item
             return QModelIndex()
 
-        if not isinstance(index.internalPointer(), Result):  # it is an top level item
-            return QModelIndex()
-
-        result = index.internalPointer()
-        for row, fileRes in enumerate(self.fileResults):
-            if fileRes.fileName == result.fileName:
-                return self.createIndex(row, 0, fileRes)
-        else:
-            assert(0)
+        return self.createIndex(index.internalPointer().row, 0)
 
     def hasChildren(self, item):
         """See QAbstractItemModel docs
         """
         # root parents
-        if item.isValid():
-            return item.internalPointer().hasChildren()
-        else:
+        if not item.isValid():
             return len(self.fileResults) != 0
+        elif self.isResult(item):
+            return False
+        else:
+            return self.fileResults[item.row()].hasChildren()
 
     def columnCount(self, parent):  # pylint: disable=W0613
         """See QAbstractItemModel docs
@@ -169,12 +302,10 @@ class SearchResultsModel(QAbstractItemModel):
         """
         if not parent.isValid():  # root elements
             return len(self.fileResults)
-        elif isinstance(parent.internalPointer(), Result):  # result
+        elif self.isResult(parent):  # result
             return 0
-        elif isinstance(parent.internalPointer(), FileResults):  # file
-            return len(parent.internalPointer().results)
-        else:
-            assert(0)
+        else:  # file
+            return self.fileResults[parent.row()].count()
 
     def flags(self, index):
         """See QAbstractItemModel docs
@@ -192,15 +323,25 @@ class SearchResultsModel(QAbstractItemModel):
         if not index.isValid():
             return None
 
-        # Common code for file and result
-        result = index.internalPointer()
-        if role == Qt.DisplayRole:
-            return result.text()
-        elif role == Qt.ToolTipRole:
-            return result.tooltip()
-        elif role == Qt.CheckStateRole:
-            if self.flags(index) & Qt.ItemIsUserCheckable:
-                return result.checkState
+        if self.isResult(index):
+            fileRes = index.internalPointer()
+            row = index.row()
+            if role == Qt.DisplayRole:
+                return fileRes.resultText(row)
+            elif role == Qt.ToolTipRole:
+                return fileRes.resultTooltip(row)
+            elif role == Qt.CheckStateRole:
+                if self.flags(index) & Qt.ItemIsUserCheckable:
+                    return fileRes.resultCheckState(row)
+        else:
+            fileRes = self.fileResults[index.row()]
+            if role == Qt.DisplayRole:
+                return fileRes.text()
+            elif role == Qt.ToolTipRole:
+                return fileRes.tooltip()
+            elif role == Qt.CheckStateRole:
+                if self.flags(index) & Qt.ItemIsUserCheckable:
+                    return fileRes.checkState
 
         return None
 
@@ -210,38 +351,29 @@ class SearchResultsModel(QAbstractItemModel):
         If file unchecked - we need uncheck all items,
         if item unchecked...
         """
-        if isinstance(index.internalPointer(), Result):  # it is a Result
-            if role == Qt.CheckStateRole:
-                # update own state
-                index.internalPointer().checkState = value
-                self.dataChanged.emit(index, index)  # own checked state changed
-                # update parent state
-                fileRes = index.parent().internalPointer()
-                assert(isinstance(fileRes, FileResults))
-                fileRes.updateCheckState()
-                self.dataChanged.emit(index.parent(), index.parent())  # parent checked state might be changed
-        elif isinstance(index.internalPointer(), FileResults):  # it is a FileResults
-            if role == Qt.CheckStateRole:
-                fileRes = index.internalPointer()
-                fileRes.checkState = value
-                for res in fileRes.results:
-                    res.checkState = value
-                firstChildIndex = self.index(0, 0, index)
-                lastChildIndex = self.index(len(fileRes.results) - 1, 0, index)
-                self.dataChanged.emit(firstChildIndex, lastChildIndex)
-        else:
-            assert(0)
+        if role != Qt.CheckStateRole:
+            return True
+
+        if self.isResult(index):  # it is a Result
+            # update own state and parent state
+            index.internalPointer().setResultCheckState(index.row(), value)
+            self.dataChanged.emit(index, index)  # own checked state changed
+            self.dataChanged.emit(index.parent(), index.parent())  # parent checked state might be changed
+        else:  # it is a FileResults
+            fileRes = self.fileResults[index.row()]
+            fileRes.setCheckState(value)
+            firstChildIndex = self.index(0, 0, index)
+            lastChildIndex = self.index(fileRes.count() - 1, 0, index)
+            self.dataChanged.emit(firstChildIndex, lastChildIndex)
         return True
 
     def setCheckStateForAll(self, state):
         """Check all items
         """
         for fileRes in self.fileResults:
-            fileRes.checkState = state
-            for match in fileRes.results:
-                match.checkState = state
-        self.dataChanged.emit(self.createIndex(0, 0, self.fileResults[0]),
-                              self.createIndex(len(self.fileResults) - 1, 0, self.fileResults[-1]))
+            fileRes.setCheckState(state)
+        self.dataChanged.emit(self.createIndex(0, 0),
+                              self.createIndex(len(self.fileResults) - 1, 0))
 
     def isFirstMatchChecked(self):
         """Check if first file in the search results is expanded
@@ -255,50 +387,96 @@ class SearchResultsModel(QAbstractItemModel):
         """
         self.beginRemoveRows(QModelIndex(), 0, len(self.fileResults) - 1)
         self.fileResults = []
+        self._fileResultsByName = {}
+        self._matchesCount = 0
         self.endRemoveRows()
 
     def appendResults(self, fileResultList):
         """Handler of signal from the search thread.
         New result is available, add it to the model
         """
+        if not fileResultList:
+            return
+
         if not self.fileResults:  # appending first
             self.firstResultsAvailable.emit()
+
+        # Next parts of the already shown large files
+        newFileResultList = []
+        for fileRes in fileResultList:
+            shownFileRes = self._fileResultsByName.get(fileRes.fileName)
+            if shownFileRes is not None:
+                self._extendFileResults(shownFileRes, fileRes)
+            else:
+                newFileResultList.append(fileRes)
+        fileResultList = newFileResultList
+        if not fileResultList:
+            return
+
+        # One insertion for the whole batch
+        firstRow = len(self.fileResults)
+        for row, fileRes in enumerate(fileResultList, firstRow):
+            fileRes.row = row
+            self._fileResultsByName[fileRes.fileName] = fileRes
+            self._matchesCount += fileRes.count()
+
         self.beginInsertRows(QModelIndex(),
-                             len(self.fileResults),
-                             len(self.fileResults) + len(fileResultList) - 1)
+                             firstRow,
+                             firstRow + len(fileResultList) - 1)
         self.fileResults.extend(fileResultList)
         self.endInsertRows()
 
+    def _extendFileResults(self, shownFileRes, fileRes):
+        """Append items of the next part of the file results
+        """
+        fileIndex = self.createIndex(shownFileRes.row, 0)
+        firstRow = shownFileRes.count()
+        self.beginInsertRows(fileIndex, firstRow, firstRow + fileRes.count() - 1)
+        shownFileRes.extend(fileRes)
+        self._matchesCount += fileRes.count()
+        self.endInsertRows()
+        self.dataChanged.emit(fileIndex, fileIndex)  # count of items in the text and the check state
+
+    def _removeFileResults(self, fileRes):
+        """Remove the file and all its items
+        """
+        row = fileRes.row
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.fileResults.pop(row)
+        del self._fileResultsByName[fileRes.fileName]
+        self._matchesCount -= fileRes.count()
+        for movedFileRes in self.fileResults[row:]:
+            movedFileRes.row -= 1
+        self.endRemoveRows()
+
     def onResultsHandledByReplaceThread(self, fileName, results):
         """Replace thread has processed result, need to it from the model
         """
-        for index, fileRes in enumerate(self.fileResults):  # try to find FileResults
-            if fileRes.fileName == fileName:  # found
-                fileResIndex = self.createIndex(index, 0, fileRes)
-                if len(results) == len(fileRes.results):  # removing all
-                    self.beginRemoveRows(QModelIndex(), index, index)
-                    self.fileResults.pop(index)
-                    self.endRemoveRows()
-                else:
-                    for res in results:
-                        resIndex = fileRes.results.index(res)
-                        self.beginRemoveRows(fileResIndex, resIndex, resIndex)
-                        fileRes.results.pop(resIndex)
-                        self.endRemoveRows()
-                    if not fileRes.results:  # no results left
-                        self.beginRemoveRows(QModelIndex(), index, index)
-                        self.fileResults.pop(index)
-                        self.endRemoveRows()
-                    else:
-                        fileRes.updateCheckState()
-                return
-        else:  # not found
-            assert(0)
+        fileRes = self._fileResultsByName[fileName]
+        rows = fileRes.findRows(results)
+        if len(rows) == fileRes.count():  # removing all
+            self._removeFileResults(fileRes)
+            return
+
+        fileResIndex = self.createIndex(fileRes.row, 0)
+        # Remove ranges of sequential rows, starting from the end
+        rangeEnd = None
+        for rowIndex in range(len(rows) - 1, -1, -1):
+            row = rows[rowIndex]
+            if rangeEnd is None:
+                rangeEnd = row
+            if rowIndex == 0 or rows[rowIndex - 1] != row - 1:
+                self.beginRemoveRows(fileResIndex, row, rangeEnd)
+                fileRes.removeRows(row, rangeEnd - row + 1)
+                self._matchesCount -= rangeEnd - row + 1
+                self.endRemoveRows()
+                rangeEnd = None
+        fileRes.updateCheckState()
 
     def matchesCount(self):
         """Get count of matches, stored by the model
         """
-        return sum([len(fileRes.results) for fileRes in self.fileResults])
+        return self._matchesCount
 
     def empty(self):
         """Check if have some items
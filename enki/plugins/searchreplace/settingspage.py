@@ -0,0 +1,36 @@
+"""
+settingspage --- Search and Replace settings page
+=================================================
+"""
+
+from PyQt5.QtWidgets import QCheckBox, QFormLayout, QLabel, QSpinBox, QWidget
+
+
+class SettingsPage(QWidget):
+    """Settings page for Search and Replace plugin
+    """
+
+    def __init__(self, parent):
+        QWidget.__init__(self, parent)
+
+        self._label = QLabel("<html>Search in directory is done by a pool of worker processes.<br/>"
+                             "Set 0 to use a process per CPU core, 1 to search without worker processes.</html>",
+                             self)
+        self.sbWorkers = QSpinBox(self)
+        self.sbWorkers.setRange(0, 256)
+        self.sbWorkers.setSpecialValueText("Auto")
+
+        self.cbUseIndex = QCheckBox("Use trigram index for search in the project directory", self)
+        self.cbUseIndex.setToolTip("Index is stored on disk and updated for changed files before the search.\n"
+                                   "Only files, which contain the literal parts of the pattern, are searched")
+
+        self.sbLargeFileSize = QSpinBox(self)
+        self.sbLargeFileSize.setRange(1, 65536)
+        self.sbLargeFileSize.setSuffix(" MB")
+        self.sbLargeFileSize.setToolTip("Larger files are not read to the memory at once, but searched by chunks")
+
+        self._layout = QFormLayout(self)
+        self._layout.addRow(self._label)
+        self._layout.addRow("Worker processes:", self.sbWorkers)
+        self._layout.addRow(self.cbUseIndex)
+        self._layout.addRow("Search by chunks files larger than:", self.sbLargeFileSize)
@@ -5,6 +5,8 @@ threads --- Search and Replace threads
 This threads are used for asynchronous search and replace
 """
 
+import concurrent.futures
+import os
 import os.path
 import re
 import time
@@ -13,16 +15,12 @@ import fnmatch
 from PyQt5.QtCore import pyqtSignal, QThread
 
 from enki.core.core import core
+from enki.lib.dirwalker import walk
+from enki.lib.ignorefiles import IgnoreRules
+from . import scanner
+from . import replacer
 from . import searchresultsmodel
-from . import substitutions
-
-
-def _isBinary(fileObject):
-    """Expects, that file position is 0, when exits, file position is 0
-    """
-    binary = b'\0' in fileObject.read(4096)
-    fileObject.seek(0)
-    return binary
+from . import trigramindex
 
 
 class StopableThread(QThread):
@@ -52,10 +50,20 @@ class SearchThread(StopableThread):
     """
     RESULTS_EMIT_TIMEOUT = 1.0
 
+    PROCESS_POOL_MIN_FILES = 64  # use worker processes only if have at least this count of files
+    PROCESS_POOL_CHUNK_SIZE = 64  # count of files, which are sent to a worker process at once
+    PROCESS_POOL_POLL_TIMEOUT = 0.1  # how often check the stop flag while waiting for the workers
+
     resultsAvailable = pyqtSignal(list)  # list of searchresultsmodel.FileResults
     progressChanged = pyqtSignal(int, int)  # int value, int total
     error = pyqtSignal(str)
 
+    def __init__(self, cache=None):
+        """``cache`` is a searchcache.SearchCache. Results of not changed files are taken from it
+        """
+        StopableThread.__init__(self)
+        self._cache = cache
+
     def search(self, regExp, mask, inOpenedFiles, searchPath):
         """Start search process.
         context stores search text, directory and other parameters
@@ -63,9 +71,30 @@ class SearchThread(StopableThread):
         self.stop()
 
         self._regExp = regExp
+        # Literals and alternations of literals are found without the regular expression engine
+        literalMatcher = scanner.literalMatcher(regExp)
+        if literalMatcher is not None:
+            self._matcher = literalMatcher
+            self._bytesMatcher = literalMatcher.encoded()
+        else:
+            self._matcher = regExp
+            self._bytesMatcher = scanner.bytesRegExp(regExp)  # None if files must be decoded before search
         self._mask = mask
         self._inOpenedFiles = inOpenedFiles
         self._searchPath = searchPath
+        self._workerCount = core.config()['SearchReplace']['Workers'] or os.cpu_count() or 1
+        self._largeFileSize = core.config()['SearchReplace']['LargeFileSize'] * 1024 * 1024
+        self._largeFileWindow = core.config()['SearchReplace']['LargeFileWindow']
+        self._indexRoot = self._projectRootForIndex()
+        # Files, ignored by .gitignore, are not searched, if they are excluded from the project
+        self._useIgnoreFiles = not inOpenedFiles and \
+            self._searchedProjectRoot() is not None and \
+            core.project().useIgnoreFiles()
+
+        if self._cache is not None and not inOpenedFiles:
+            self._cacheSession = self._cache.session(self._cache.searchKey(regExp, mask, searchPath))
+        else:
+            self._cacheSession = None
 
         self._openedFiles = {}
         for document in core.workspace().documents():
@@ -74,6 +103,34 @@ class SearchThread(StopableThread):
 
         self.start()
 
+    def _projectRootForIndex(self):
+        """Get project root, if the trigram index shall be used for the search. Otherwise None
+        """
+        if self._inOpenedFiles or \
+           not core.config()['SearchReplace']['UseIndex']:
+            return None
+
+        return self._searchedProjectRoot()
+
+    def _searchedProjectRoot(self):
+        """Get project root, if the search path is inside the project. Otherwise None
+        """
+        projectPath = core.project().path()
+        if projectPath is None:
+            return None
+
+        projectPath = os.path.abspath(projectPath)
+        try:
+            searchPath = os.path.abspath(self._searchPath)
+        except OSError:  # current dir deleted
+            return None
+
+        if searchPath == projectPath or \
+           searchPath.startswith(projectPath.rstrip(os.path.sep) + os.path.sep):
+            return projectPath
+        else:
+            return None
+
     def _getFiles(self, path, maskRegExp, filterRegExp):
         """Get recursive list of files from directory.
         maskRegExp is regExp object for check if file matches mask
@@ -86,32 +143,18 @@ class SearchThread(StopableThread):
             return []
 
         try:
-            for root, dirs, files in os.walk(absPath, followlinks=True):  # pylint: disable=W0612
-                if root.startswith('.') or (os.path.sep + '.') in root:
-                    continue
-
-                # remove not interesting directories
-                for dirname in dirs[:]:
-                    if filterRegExp.match(dirname):
-                        dirs.remove(dirname)
-
-                for fileName in files:
-                    if fileName.startswith('.'):
-                        continue
-                    if maskRegExp and not maskRegExp.match(fileName):
-                        continue
-
-                    if filterRegExp.match(fileName):
-                        continue
-
-                    fullPath = os.path.join(root, fileName)
-                    if not os.path.isfile(fullPath):
-                        continue
-                    retFiles.append(root + os.path.sep + fileName)
-
-                if self._exit:
-                    break
-        except UnicodeDecodeError:  # from os.walk()
+            walker = walk(absPath, filterRegExp,
+                          followLinks=True, regularFilesOnly=True, skipHidden=True,
+                          ignoreRules=IgnoreRules(absPath) if self._useIgnoreFiles else None,
+                          shouldStop=lambda: self._exit)
+            for batch in walker:
+                for directory in batch:
+                    root = os.path.join(absPath, directory.relPath) if directory.relPath else absPath
+                    for fileName in directory.fileNames:
+                        if maskRegExp and not maskRegExp.match(fileName):
+                            continue
+                        retFiles.append(os.path.join(root, fileName))
+        except UnicodeDecodeError:  # from os.scandir()
             self.error.emit('Failed to build list of files. Unicode decode error. Is correct locale set?')
             return []
 
@@ -145,14 +188,7 @@ class SearchThread(StopableThread):
         if fileName in self._openedFiles:
             return self._openedFiles[fileName]
 
-        try:
-            with open(fileName, 'rb') as openedFile:
-                if _isBinary(openedFile):
-                    return ''
-                return str(openedFile.read(), 'utf8', errors='ignore')
-        except IOError as ex:
-            print(ex)
-            return ''
+        return scanner.fileContent(fileName)
 
     def run(self):
         """Start point of the code, running in thread.
@@ -165,19 +201,32 @@ class SearchThread(StopableThread):
         if self._exit:
             return
 
+        if self._indexRoot is not None:
+            files = self._filterFilesWithIndex(files)
+            if self._exit:
+                return
+
         self.progressChanged.emit(0, len(files))
 
+        if self._cacheSession is not None:
+            fileResultsIter = self._searchWithCache(files)
+        else:
+            fileResultsIter = self._searchFiles(files)
+
         # Prepare data for search process
         lastResultsEmitTime = time.clock()
         notEmittedFileResults = []
-        # Search for all files
-        for fileIndex, fileName in enumerate(files):
-            results = self._searchInFile(fileName)
-            if results:
-                newFileRes = searchresultsmodel.FileResults(self._searchPath,
-                                                            fileName,
-                                                            results)
-                notEmittedFileResults.append(newFileRes)
+        handledFileCount = 0
+        # Search for all files. Matches of a large file come by parts
+        for fileIndex, fileName, matches, complete in fileResultsIter:
+            if complete:
+                handledFileCount += 1
+            if matches:
+                fileResults = searchresultsmodel.FileResults(self._searchPath, fileName, matches)
+                if notEmittedFileResults and notEmittedFileResults[-1].fileName == fileName:
+                    notEmittedFileResults[-1].extend(fileResults)
+                else:
+                    notEmittedFileResults.append(fileResults)
 
             if notEmittedFileResults and \
                (time.clock() - lastResultsEmitTime) > self.RESULTS_EMIT_TIMEOUT:
@@ -190,50 +239,174 @@ class SearchThread(StopableThread):
                 self.progressChanged.emit(fileIndex, len(files))
                 break
 
+        fileResultsIter.close()  # stop worker processes, if still running
+
+        if self._cacheSession is not None:
+            self._cacheSession.save(complete=handledFileCount == len(files))
+
         if notEmittedFileResults:
             self.resultsAvailable.emit(notEmittedFileResults)
 
-    def _searchInFile(self, fileName):
-        """Search in the file and return searchresultsmodel.Result s
+    def _filterFilesWithIndex(self, files):
+        """Leave only files, which might contain matches, according to the trigram index.
+        Index is updated for new and changed files.
+        Opened documents are always searched, because their text might be not saved
+        """
+        requiredTrigrams = trigramindex.requiredTrigrams(self._regExp)
+        if requiredTrigrams is None:  # no usable literals, full scan
+            return files
+
+        index = trigramindex.indexForRoot(self._indexRoot)
+        if self._mask:
+            removedPrefix = None  # files, which don't match the mask, are not in the list, but exist
+        else:
+            removedPrefix = os.path.abspath(self._searchPath).rstrip(os.path.sep) + os.path.sep
+        completed = index.update(files, removedPrefix, lambda: self._exit, self._workerCount)
+        index.save()
+        if not completed:
+            return files
+
+        candidates = set(index.candidates(files, requiredTrigrams))
+        return [fileName for fileName in files
+                if fileName in candidates or fileName in self._openedFiles]
+
+    def _searchWithCache(self, files):
+        """Take matches of not changed files from the cache, search in other files.
+        Opened documents are always searched, because their text might be not saved.
+        Generator. Yields the same tuples as _searchFiles()
         """
-        lastPos = 0
-        eolCount = 0
-        results = []
-        eol = "\n"
-
-        content = self._fileContent(fileName)
-
-        # Process result for all occurrences
-        for match in self._regExp.finditer(content):
-            start = match.start()
-
-            eolStart = content.rfind(eol, 0, start)
-            eolEnd = content.find(eol, start + len(match.group(0)))
-            eolCount += content[lastPos:start].count(eol)
-            lastPos = start
-
-            wholeLine = content[eolStart + 1: eolEnd]
-            column = start - eolStart
-            if eolStart != 0:
-                column -= 1
-
-            result = searchresultsmodel.Result(fileName=fileName,
-                                               wholeLine=wholeLine,
-                                               line=eolCount,
-                                               column=column,
-                                               match=match)
-            results.append(result)
+        session = self._cacheSession
+        fileStats = {}
+        cachedMatches = {}
+        filesToScan = []
+        for fileName in files:
+            if fileName not in self._openedFiles:
+                fileStats[fileName] = session.fileStat(fileName)
+                matches = session.matches(fileName, fileStats[fileName])
+                if matches is not None:
+                    cachedMatches[fileName] = matches
+                    continue
+            filesToScan.append(fileName)
 
             if self._exit:
-                break
-        return results
+                return
+
+        scannedIter = self._searchFiles(filesToScan)
+        try:
+            for fileIndex, fileName in enumerate(files):
+                if fileName in cachedMatches:
+                    yield fileIndex, fileName, cachedMatches[fileName], True
+                    continue
+
+                fileMatches = []
+                complete = False
+                while not complete:
+                    scanned = next(scannedIter, None)
+                    if scanned is None:  # interrupted
+                        return
+                    _scannedIndex, _scannedFileName, matches, complete = scanned
+                    fileMatches.extend(matches)
+                    yield fileIndex, fileName, matches, complete
+
+                if fileName not in self._openedFiles:
+                    session.store(fileName, fileStats[fileName], fileMatches)
+        finally:
+            scannedIter.close()
+
+    def _searchFiles(self, files):
+        """Search in the files. Use worker processes, if have many files.
+        Generator. Yields tuples (file index, file name, matches, complete) in order of files.
+        Matches of a large file are yielded by parts, ``complete`` is True for the last part of a file
+        """
+        if self._workerCount > 1 and len(files) >= self.PROCESS_POOL_MIN_FILES:
+            return self._searchWithProcessPool(files)
+        else:
+            return self._searchInThread(files)
+
+    def _searchInThread(self, files):
+        """Search in the files one by one in this thread.
+        Generator. Yields the same tuples as _searchFiles()
+        """
+        for fileIndex, fileName in enumerate(files):
+            if fileName not in self._openedFiles and \
+               scanner.isLargeFile(fileName, self._largeFileSize):
+                yield from self._searchInLargeFile(fileIndex, fileName)
+            else:
+                yield fileIndex, fileName, self._searchInFile(fileName), True
+
+    def _searchWithProcessPool(self, files):
+        """Split the files to chunks and search in them with a pool of worker processes.
+        Generator. Yields the same tuples as _searchFiles()
+
+        Opened documents are searched in the text, which is passed to a worker.
+        Large files are skipped by the workers and searched in this thread
+        """
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._workerCount)
+        futures = []
+        try:
+            for chunkStart in range(0, len(files), self.PROCESS_POOL_CHUNK_SIZE):
+                items = [(fileName, self._openedFiles.get(fileName))
+                         for fileName in files[chunkStart:chunkStart + self.PROCESS_POOL_CHUNK_SIZE]]
+                futures.append(executor.submit(scanner.searchInFiles, self._matcher, items, self._bytesMatcher,
+                                               self._largeFileSize))
+
+            # Process chunks in the order of submitting to keep files sorted
+            for chunkIndex, future in enumerate(futures):
+                chunkResults = None
+                while chunkResults is None:
+                    if self._exit:
+                        return
+                    try:
+                        chunkResults = future.result(timeout=self.PROCESS_POOL_POLL_TIMEOUT)
+                    except concurrent.futures.TimeoutError:
+                        pass
+
+                chunkStart = chunkIndex * self.PROCESS_POOL_CHUNK_SIZE
+                chunkMatches = dict(chunkResults)  # contains only files with matches
+                for fileIndex in range(chunkStart, min(len(files), chunkStart + self.PROCESS_POOL_CHUNK_SIZE)):
+                    matches = chunkMatches.get(files[fileIndex], [])
+                    if matches is None:  # large file
+                        yield from self._searchInLargeFile(fileIndex, files[fileIndex])
+                    else:
+                        yield fileIndex, files[fileIndex], matches, True
+        except concurrent.futures.process.BrokenProcessPool:
+            self.error.emit('Search failed. A search worker process has terminated unexpectedly')
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _searchInFile(self, fileName):
+        """Search in the file and return scanner.searchInText() result
+        Not opened files are memory mapped and searched without decoding, if the pattern allows it
+        """
+        if self._bytesMatcher is not None and fileName not in self._openedFiles:
+            return scanner.searchInMappedFile(self._bytesMatcher, fileName, lambda: self._exit)
+        else:
+            content = self._fileContent(fileName)
+            return scanner.searchInText(self._matcher, content, lambda: self._exit)
+
+    def _searchInLargeFile(self, fileIndex, fileName):
+        """Search in the file, which is too large to read it to the memory at once.
+        Generator. Yields the same tuples as _searchFiles(), matches come by parts as the file is searched
+        """
+        for matches in scanner.searchInLargeFile(self._matcher, fileName, self._largeFileWindow,
+                                                 self._bytesMatcher, lambda: self._exit):
+            yield fileIndex, fileName, matches, False
+        if not self._exit:  # interrupted file is not complete
+            yield fileIndex, fileName, [], True
 
 
 class ReplaceThread(StopableThread):
     """Thread does replacements in the directory according to checked items
 
-    Replacements in opened documents are done by GUI thread, in other - by new thread
+    Replacements in opened documents are done by GUI thread, in other - by new thread.
+    If have many files, the thread passes them to a pool of worker processes
     """
+    PROCESS_POOL_MIN_FILES = 16  # use worker processes only if have at least this count of files
+    PROCESS_POOL_CHUNK_SIZE = 8  # count of files, which are sent to a worker process at once
+    PROCESS_POOL_POLL_TIMEOUT = 0.1  # how often check the stop flag while waiting for the workers
+
     resultsHandled = pyqtSignal(str, list)
     finalStatus = pyqtSignal(str)
     error = pyqtSignal(str)
@@ -245,6 +418,7 @@ class ReplaceThread(StopableThread):
 
         self._replaceText = replaceText
         self._totalCount = sum([len(v) for v in results.values()])
+        self._workerCount = core.config()['SearchReplace']['Workers'] or os.cpu_count() or 1
 
         # do replacements in opened files, prepare for replacing in not opened
         self._results = {}
@@ -263,79 +437,68 @@ class ReplaceThread(StopableThread):
         """
         pos = document.qutepart.cursorPosition
         oldText = document.qutepart.text
-        document.qutepart.text = self._doReplacements(document.qutepart.text, matches)
+        document.qutepart.text = replacer.doReplacements(document.qutepart.text, matches, self._replaceText)
         if oldText != document.qutepart.text:
             document.qutepart.document().setModified(True)
         document.qutepart.cursorPosition = pos
 
-    def _saveContent(self, fileName, content):
-        """Write text to the file
-        """
-        try:
-            content = content.encode('utf8')
-        except UnicodeEncodeError as ex:
-            pattern = self.tr("Failed to encode file to utf8: %s")
-            text = str(ex)
-            self.error.emit(pattern % text)
-            return
-
-        try:
-            with open(fileName, 'wb') as openFile:
-                openFile.write(content)
-        except IOError as ex:
-            pattern = self.tr("Error while saving replaced content: %s")
-            text = str(ex)
-            self.error.emit(pattern % text)
-
-    def _fileContent(self, fileName):
-        """Read file
-        """
-        try:
-            with open(fileName, 'rb') as openFile:
-                content = openFile.read()
-        except IOError as ex:
-            self.error.emit(self.tr("Error opening file: %s" % str(ex)))
-            return ''
-
-        try:
-            return str(content, 'utf8')
-        except UnicodeDecodeError as ex:
-            self.error.emit(self.tr("File %s not read: unicode error '%s'. File may be corrupted" %
-                                    (fileName, str(ex))))
-            return None
-
     def run(self):
         """Start point of the code, running i thread
         Does thread job
         """
         startTime = time.clock()
 
-        for fileName in self._results.keys():
-            content = self._fileContent(fileName)
-            if content is None:  # if failed to read file
-                continue
-
-            matches = self._results[fileName]
+        fileNames = list(self._results.keys())
+        if self._workerCount > 1 and len(fileNames) >= self.PROCESS_POOL_MIN_FILES:
+            self._replaceWithProcessPool(fileNames)
+        else:
+            self._replaceInThread(fileNames)
 
-            content = self._doReplacements(content, matches)
+        self.finalStatus.emit("%d replacements in %d second(s)" %
+                              (self._totalCount,
+                               time.clock() - startTime))
 
-            self._saveContent(fileName, content)
+    def _onFileProcessed(self, fileName, handled, error):
+        """Replacements in the file has been done or failed
+        """
+        if error is not None:
+            self.error.emit(error)
+        if handled:
+            self.resultsHandled.emit(fileName, self._results[fileName])
 
-            self.resultsHandled.emit(fileName, matches)
+    def _replaceInThread(self, fileNames):
+        """Do replacements in the files one by one in this thread
+        """
+        for fileName in fileNames:
+            handled, error = replacer.replaceInFile(fileName, self._results[fileName], self._replaceText)
+            self._onFileProcessed(fileName, handled, error)
 
             if self._exit:
                 break
 
-        self.finalStatus.emit("%d replacements in %d second(s)" %
-                              (self._totalCount,
-                               time.clock() - startTime))
-
-    def _doReplacements(self, content, matches):
-        """Do replacements for one file
+    def _replaceWithProcessPool(self, fileNames):
+        """Split the files to chunks and do replacements with a pool of worker processes
         """
-        for result in matches[::-1]:  # count from end to begin because we are replacing by offset in content
-            replaceTextWithMatches = substitutions.makeSubstitutions(self._replaceText,
-                                                                     result.match)
-            content = content[:result.match.start()] + replaceTextWithMatches + content[result.match.end():]
-
-        return content
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._workerCount)
+        futures = []
+        try:
+            for chunkStart in range(0, len(fileNames), self.PROCESS_POOL_CHUNK_SIZE):
+                items = [(fileName, self._results[fileName])
+                         for fileName in fileNames[chunkStart:chunkStart + self.PROCESS_POOL_CHUNK_SIZE]]
+                futures.append(executor.submit(replacer.replaceInFiles, items, self._replaceText))
+
+            notDone = set(futures)
+            while notDone and not self._exit:
+                done, notDone = concurrent.futures.wait(notDone,
+                                                        timeout=self.PROCESS_POOL_POLL_TIMEOUT,
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    for fileName, handled, error in future.result():
+                        self._onFileProcessed(fileName, handled, error)
+        except concurrent.futures.process.BrokenProcessPool:
+            self.error.emit('Replace failed. A replace worker process has terminated unexpectedly')
+        finally:
+            # Files, which are being processed, are completed, but not started ones are cancelled
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
@@ -0,0 +1,433 @@
+"""
+trigramindex --- Persistent trigram index of the project files
+==============================================================
+
+The index maps every 3-character substring (trigram) of the file text to the list of files,
+which contain it. Before a search, the trigrams, which every match of the regular expression
+must contain, are extracted from the pattern. Only the files, which contain all of them,
+are read and searched.
+
+The text is folded (lowercased) before indexing, therefore the same index serves case sensitive
+and case insensitive searches. The index never drops a file, which might contain a match.
+If the pattern has no usable literals, ``requiredTrigrams()`` returns ``None`` and the caller shall
+do a full scan.
+
+Index is stored in the ``searchindex`` directory under ``CONFIG_DIR``, one file per project root.
+Files are validated by mtime and size and reindexed if changed.
+
+The module doesn't depend on Qt.
+"""
+
+import array
+import concurrent.futures
+import hashlib
+import os
+import os.path
+import pickle
+import re
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from enki.core.defines import CONFIG_DIR
+from . import scanner
+
+
+_INDEX_DIR = os.path.join(CONFIG_DIR, 'searchindex')
+_FORMAT_VERSION = 1
+
+MAX_INDEXED_FILE_SIZE = 4 * 1024 * 1024  # bigger files are not indexed and always searched
+_MAX_ALTERNATIVES = 64  # limit of alternatives count, when expanding nested branches of a pattern
+_POOL_MIN_FILES = 256  # index files with worker processes, if have at least this count of changed files
+_POOL_CHUNK_SIZE = 64
+
+# Possessive repeats and atomic groups appeared in Python 3.11
+_REPEAT_OPS = tuple(getattr(sre_parse, name)
+                    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                    if hasattr(sre_parse, name))
+_ATOMIC_GROUP_OPS = tuple(getattr(sre_parse, name)
+                          for name in ('ATOMIC_GROUP',)
+                          if hasattr(sre_parse, name))
+
+
+def _caseEquivalences():
+    """Get sets of characters, which ``re`` treats as equal when ignoring case, but which
+    ``str.lower()`` doesn't make equal. I.e. ``i`` and dotless ``i``
+    """
+    try:
+        from re import _casefix  # Python 3.11+
+        equivalences = set()
+        for char, others in _casefix._EXTRA_CASES.items():
+            equivalences.add(tuple(sorted((char,) + others)))
+        return equivalences
+    except ImportError:
+        pass
+
+    try:
+        import sre_compile
+        return sre_compile._equivalences
+    except (ImportError, AttributeError):
+        return None
+
+
+def _makeFoldTable():
+    equivalences = _caseEquivalences()
+    if equivalences is None:
+        return None
+
+    # str.lower() converts capital I with dot above to 2 characters, but re - to small i
+    table = {ord('\u0130'): ord('i')}
+    for codes in equivalences:
+        representative = min(codes)
+        for code in codes:
+            table[code] = representative
+    return table
+
+_FOLD_TABLE = _makeFoldTable()
+
+
+def _fold(text):
+    """Convert text to the form, in which it is indexed
+    """
+    if _FOLD_TABLE is None:
+        return text.lower()
+    return text.translate(_FOLD_TABLE).lower().translate(_FOLD_TABLE)
+
+
+def _trigrams(text):
+    """Set of trigrams of the folded text
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _and(first, second):
+    """Combine two requirements, both of which must be met.
+
+    Requirement is ``None`` (any text matches) or a list of alternatives.
+    Alternative is a list of literal strings, all of which must be in the text
+    """
+    if first is None:
+        return second
+    if second is None:
+        return first
+    if len(first) * len(second) > _MAX_ALTERNATIVES:
+        # Too many combinations. Keep the requirement with less alternatives, it is stronger
+        return first if len(first) <= len(second) else second
+    return [a + b for a in first for b in second]
+
+
+def _or(alternatives):
+    """Combine requirements, at least one of which must be met
+    """
+    result = []
+    for alternative in alternatives:
+        if alternative is None:
+            return None
+        result.extend(alternative)
+    if len(result) > _MAX_ALTERNATIVES:
+        return None
+    return result
+
+
+def _sequenceRequirement(items):
+    """Requirement for the parsed sequence of regular expression items
+    """
+    requirement = None
+    literal = []
+
+    def flushLiteral():
+        nonlocal requirement
+        if literal:
+            requirement = _and(requirement, [[''.join(literal)]])
+            del literal[:]
+
+    for op, arg in items:
+        if op is sre_parse.LITERAL:
+            literal.append(chr(arg))
+            continue
+
+        flushLiteral()
+        if op is sre_parse.SUBPATTERN:
+            requirement = _and(requirement, _sequenceRequirement(arg[-1]))
+        elif op in _REPEAT_OPS:
+            minCount, maxCount, subItems = arg
+            if minCount > 0:
+                requirement = _and(requirement, _sequenceRequirement(subItems))
+        elif op is sre_parse.BRANCH:
+            requirement = _and(requirement,
+                               _or([_sequenceRequirement(branch) for branch in arg[1]]))
+        elif op in _ATOMIC_GROUP_OPS:
+            requirement = _and(requirement, _sequenceRequirement(arg))
+        # Other items (character classes, anchors, back references, lookarounds)
+        # don't give any literal, but break the literal sequence
+
+    flushLiteral()
+    return requirement
+
+
+def requiredTrigrams(regExp):
+    """Extract trigrams from the compiled regular expression.
+
+    Returns list of alternatives. Every alternative is a set of folded trigrams.
+    Text can match the pattern only if it contains all trigrams of at least one alternative.
+    Returns ``None``, if the pattern has no usable literals and all files must be searched
+    """
+    if _FOLD_TABLE is None and regExp.flags & re.IGNORECASE:
+        return None  # unknown case equivalences. Can't guarantee, that index doesn't miss matches
+
+    try:
+        parsed = sre_parse.parse(regExp.pattern, regExp.flags)
+    except Exception:  # pylint: disable=W0703
+        return None
+
+    requirement = _sequenceRequirement(list(parsed))
+    if requirement is None:
+        return None
+
+    result = []
+    for literals in requirement:
+        trigrams = set()
+        for literal in literals:
+            trigrams.update(_trigrams(_fold(literal)))
+        if not trigrams:
+            return None  # at least one alternative can match any file
+        result.append(trigrams)
+
+    return result
+
+
+def textTrigrams(text):
+    """Get trigrams of the text, as they are stored in the index
+    """
+    return _trigrams(_fold(text))
+
+
+def fileTrigrams(fileName):
+    """Get trigrams of the file. Returns ``None`` if the file is too big for indexing.
+    Entry point of the indexing worker process
+    """
+    try:
+        if os.path.getsize(fileName) > MAX_INDEXED_FILE_SIZE:
+            return None
+    except OSError:
+        return None
+
+    # Binary files are never searched, they don't have trigrams
+    return textTrigrams(scanner.fileContent(fileName))
+
+
+def _filesTrigrams(fileNames):
+    return [fileTrigrams(fileName) for fileName in fileNames]
+
+
+class TrigramIndex:
+    """Trigram index of the files in the project directory
+    """
+
+    def __init__(self, root):
+        self._root = root
+        self._path = os.path.join(_INDEX_DIR,
+                                  hashlib.sha1(root.encode('utf8', errors='ignore')).hexdigest())
+        self._files = {}  # file path: (mtime, size, file ID). ID is None, if file is not indexed
+        self._postings = {}  # trigram: set of file IDs
+        self._nextId = 0
+        self._deadIdCount = 0
+        self._modified = False
+
+    def root(self):
+        return self._root
+
+    def load(self):
+        """Load the index from disk. Index is empty, if failed to load
+        """
+        try:
+            with open(self._path, 'rb') as indexFile:
+                data = pickle.load(indexFile)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return
+        except Exception:  # pylint: disable=W0703
+            return  # corrupted file
+
+        if not isinstance(data, dict) or \
+           data.get('version') != _FORMAT_VERSION or \
+           data.get('root') != self._root:
+            return
+
+        self._files = data['files']
+        self._postings = {trigram: set(ids) for trigram, ids in data['postings'].items()}
+        self._nextId = data['nextId']
+        self._deadIdCount = data['deadIdCount']
+
+    def save(self):
+        """Save the index to disk, if it has been modified
+        """
+        if not self._modified:
+            return
+
+        data = {'version': _FORMAT_VERSION,
+                'root': self._root,
+                'files': self._files,
+                'postings': {trigram: array.array('L', sorted(ids)) for trigram, ids in self._postings.items()},
+                'nextId': self._nextId,
+                'deadIdCount': self._deadIdCount}
+
+        tmpPath = self._path + '.tmp'
+        try:
+            if not os.path.isdir(_INDEX_DIR):
+                os.makedirs(_INDEX_DIR)
+            with open(tmpPath, 'wb') as indexFile:
+                pickle.dump(data, indexFile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath, self._path)
+        except (IOError, OSError) as ex:
+            print('Failed to save search index: {}'.format(ex))
+            return
+
+        self._modified = False
+
+    def _removeFile(self, fileName):
+        _mtime, _size, fileId = self._files.pop(fileName)
+        if fileId is not None:
+            # Posting lists are not cleaned immediately. IDs of removed files are ignored
+            self._deadIdCount += 1
+        self._modified = True
+
+    def _addFile(self, fileName, stat, trigrams):
+        if trigrams is None:
+            fileId = None
+        else:
+            fileId = self._nextId
+            self._nextId += 1
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, set()).add(fileId)
+        self._files[fileName] = (stat.st_mtime_ns, stat.st_size, fileId)
+        self._modified = True
+
+    def _compact(self):
+        """Drop IDs of removed and changed files from the posting lists
+        """
+        aliveIds = {fileId for _mtime, _size, fileId in self._files.values() if fileId is not None}
+        postings = {}
+        for trigram, ids in self._postings.items():
+            ids &= aliveIds
+            if ids:
+                postings[trigram] = ids
+        self._postings = postings
+        self._deadIdCount = 0
+
+    def update(self, files, removedPrefix=None, shouldStop=None, workerCount=1):
+        """Reindex new and changed files from ``files``.
+
+        Files, which are in the index, but not in ``files``, are removed, if their path starts with
+        ``removedPrefix``.
+        ``shouldStop`` is an optional callable. Update is interrupted, when it returns True.
+        Returns ``False``, if has been interrupted
+        """
+        if removedPrefix is not None:
+            fileSet = set(files)
+            for fileName in [f for f in self._files if f.startswith(removedPrefix) and f not in fileSet]:
+                self._removeFile(fileName)
+
+        changed = []
+        for fileName in files:
+            try:
+                stat = os.stat(fileName)
+            except OSError:
+                if fileName in self._files:
+                    self._removeFile(fileName)
+                continue
+
+            indexed = self._files.get(fileName)
+            if indexed is not None:
+                if indexed[:2] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                self._removeFile(fileName)
+            changed.append((fileName, stat))
+
+            if shouldStop is not None and shouldStop():
+                return False
+
+        if workerCount > 1 and len(changed) >= _POOL_MIN_FILES:
+            completed = self._indexWithProcessPool(changed, shouldStop, workerCount)
+        else:
+            completed = True
+            for fileName, stat in changed:
+                self._addFile(fileName, stat, fileTrigrams(fileName))
+                if shouldStop is not None and shouldStop():
+                    completed = False
+                    break
+
+        if self._deadIdCount > len(self._files):
+            self._compact()
+
+        return completed
+
+    def _indexWithProcessPool(self, changed, shouldStop, workerCount):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workerCount) as executor:
+            futures = []
+            for chunkStart in range(0, len(changed), _POOL_CHUNK_SIZE):
+                chunk = changed[chunkStart:chunkStart + _POOL_CHUNK_SIZE]
+                futures.append((chunk,
+                                executor.submit(_filesTrigrams, [fileName for fileName, _stat in chunk])))
+
+            try:
+                for chunk, future in futures:
+                    while True:
+                        if shouldStop is not None and shouldStop():
+                            return False
+                        try:
+                            chunkTrigrams = future.result(timeout=0.1)
+                            break
+                        except concurrent.futures.TimeoutError:
+                            pass
+
+                    for (fileName, stat), trigrams in zip(chunk, chunkTrigrams):
+                        self._addFile(fileName, stat, trigrams)
+            finally:
+                for _chunk, future in futures:
+                    future.cancel()
+
+        return True
+
+    def candidates(self, files, trigramAlternatives):
+        """Filter list of files. Leave only files, which might match the pattern.
+
+        ``trigramAlternatives`` is a ``requiredTrigrams()`` result.
+        Files, which are not indexed, are always candidates
+        """
+        candidateIds = set()
+        for trigrams in trigramAlternatives:
+            ids = None
+            # Start from the rarest trigram. Intersection is never bigger than it
+            for trigram in sorted(trigrams, key=lambda t: len(self._postings.get(t, ()))):
+                posting = self._postings.get(trigram)
+                if posting is None:
+                    ids = set()
+                    break
+                ids = set(posting) if ids is None else ids & posting
+                if not ids:
+                    break
+            candidateIds.update(ids)
+
+        result = []
+        for fileName in files:
+            indexed = self._files.get(fileName)
+            if indexed is None or \
+               indexed[2] is None or \
+               indexed[2] in candidateIds:
+                result.append(fileName)
+        return result
+
+
+_loadedIndexes = {}
+
+
+def indexForRoot(root):
+    """Get the index of the project. Index is loaded from disk on first use and kept in memory
+    """
+    if root not in _loadedIndexes:
+        index = TrigramIndex(root)
+        index.load()
+        _loadedIndexes[root] = index
+    return _loadedIndexes[root]
@@ -24,6 +24,9 @@ class Plugin(QObject):
 
         core.actionManager().action("mFile/aOpen").triggered.connect(self._onFileOpenTriggered)
         core.actionManager().action("mFile/aOpenProject").triggered.connect(self._onProjectOpenTriggered)
+        core.actionManager().action("mFile/aUseIgnoreFiles").triggered.connect(self._onUseIgnoreFilesTriggered)
+        core.project().changed.connect(self._onProjectChanged)
+        self._onProjectChanged()
         core.actionManager().action("mFile/mReload/aCurrent").triggered.connect(self._onFileReloadTriggered)
         core.actionManager().action("mFile/mReload/aAll").triggered.connect(self._onFileReloadAllTriggered)
         core.actionManager().action("mFile/aNew").triggered.connect(
@@ -54,6 +57,7 @@ class Plugin(QObject):
         core.workspace().currentDocumentChanged.disconnect(self._onCurrentDocumentChanged)
         core.workspace().documentOpened.disconnect(self._onDocumentOpenedOrClosed)
         core.workspace().documentClosed.disconnect(self._onDocumentOpenedOrClosed)
+        core.project().changed.disconnect(self._onProjectChanged)
 
     def _onCurrentDocumentChanged(self, oldDocument, newDocument):
         """Update actions enabled state
@@ -93,6 +97,14 @@ class Plugin(QObject):
         if dirPath:
             core.project().open(dirPath)
 
+    def _onProjectChanged(self):
+        core.actionManager().action("mFile/aUseIgnoreFiles").setChecked(core.project().useIgnoreFiles())
+
+    def _onUseIgnoreFilesTriggered(self, checked):
+        """Handler of File->Hide files ignored by .gitignore
+        """
+        core.project().setUseIgnoreFiles(checked)
+
     def _onFileOpenTriggered(self):
         """Handler of File->Open
         """
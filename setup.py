@@ -142,5 +142,6 @@ if __name__ == '__main__':
               'Python Linting': ["flake8"],
               'Build Sphinx documentation': ['Sphinx'],
               'Python REPL': ['qtconsole'],
+              'Fast fuzzy open': ['numpy'],
           },
     )
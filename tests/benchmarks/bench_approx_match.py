@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# *************************************************************************
+# bench_approx_match.py - Benchmark of the preview synchronization matching
+# *************************************************************************
+#
+# Times ``refineSearchResult``, the LCS step of the source to preview
+# synchronization, for search and target strings of several lengths. The
+# target is the source with some markup inserted, as the preview text usually
+# is. Run from any directory::
+#
+#     python3 tests/benchmarks/bench_approx_match.py [repeat count]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.plugins.preview.approx_match import refineSearchResult  # noqa: E402
+
+
+WORDS = ['the', 'of', 'and', 'to', 'in', 'is', 'document', 'system', 'manual',
+         'gives', 'a', 'broad', 'overview', 'implementation', 'specifics']
+
+
+def generateTexts(length):
+    searchText = ''
+    while len(searchText) < length:
+        searchText += random.choice(WORDS) + ' '
+    searchText = searchText[:length]
+
+    targetText = list(searchText)
+    for _ in range(length // 10):
+        targetText.insert(random.randrange(len(targetText) + 1), random.choice('<>/="#*`'))
+    return searchText, ''.join(targetText)
+
+
+def main():
+    repeatCount = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    random.seed(0)
+
+    # findApproxTextInTarget searches 60 or 90 characters around the anchor
+    for length in (60, 90, 200, 1000):
+        searchText, targetText = generateTexts(length)
+        start = time.perf_counter()
+        for _ in range(repeatCount):
+            refineSearchResult(searchText, length // 2, targetText)
+        print('%5d characters %8.3f ms' % (length, (time.perf_counter() - start) / repeatCount * 1000))
+
+
+if __name__ == '__main__':
+    main()
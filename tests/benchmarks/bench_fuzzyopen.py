@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# *********************************************************
+# bench_fuzzyopen.py - Benchmark of the fuzzy open locator
+# *********************************************************
+#
+# Types a pattern character by character on a generated list of project files
+# and prints time of every key press. The vectorized search is used, if NumPy is installed.
+# Run from any directory::
+#
+#     python3 tests/benchmarks/bench_fuzzyopen.py [file count] [pattern]
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.plugins.fuzzyopen.fuzzyindex import FuzzyIndex  # noqa: E402
+
+
+WORDS = ['core', 'widget', 'model', 'view', 'test', 'util', 'parser', 'plugin',
+         'search', 'project', 'lib', 'doc', 'src', 'build', 'main', 'config']
+
+
+def generateFiles(fileCount):
+    random.seed(0)
+    files = []
+    for index in range(fileCount):
+        dirs = [random.choice(WORDS) + str(random.randint(0, 50)) for _ in range(random.randint(1, 5))]
+        fileName = '%s_%s%d%s' % (random.choice(WORDS), random.choice(WORDS), index % 1000,
+                                  random.choice(['.py', '.c', '.h', '.txt']))
+        files.append(os.sep.join(dirs + [fileName]))
+    return files
+
+
+def main():
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    pattern = sys.argv[2] if len(sys.argv) > 2 else 'cowoy.py'
+
+    files = generateFiles(fileCount)
+    openFiles = files[:10]
+    index = FuzzyIndex(files)
+    stopEvent = threading.Event()
+
+    for length in range(1, len(pattern) + 1):
+        start = time.perf_counter()
+        items = index.search(pattern[:length], openFiles, 32, stopEvent)
+        print('%-20s %8.1f ms   (%d shown)' % (pattern[:length], (time.perf_counter() - start) * 1000, len(items)))
+
+
+if __name__ == '__main__':
+    main()
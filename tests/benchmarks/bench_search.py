@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# ***************************************************************
+# bench_search.py - Benchmark of the search in directory scanners
+# ***************************************************************
+#
+# Compares the regular expression path and the literal path of the search
+# on a generated tree of source-like files. Run from any directory::
+#
+#     python3 tests/benchmarks/bench_search.py [file count]
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.plugins.searchreplace import scanner  # noqa: E402
+
+
+def generateTree(path, fileCount, identifiers):
+    random.seed(0)
+    fileNames = []
+    for index in range(fileCount):
+        lines = []
+        for _ in range(200):
+            words = random.sample(identifiers, 6)
+            lines.append('    %s = %s(%s, %s) + %s.%s' % tuple(words))
+        fileName = os.path.join(path, 'file%05d.py' % index)
+        with open(fileName, 'w') as file_:
+            file_.write('\n'.join(lines))
+        fileNames.append(fileName)
+    return fileNames
+
+
+def searchAll(fileNames, matcher, bytesMatcher):
+    matchCount = 0
+    start = time.perf_counter()
+    for fileName in fileNames:
+        if bytesMatcher is not None:
+            matches = scanner.searchInMappedFile(bytesMatcher, fileName)
+        else:
+            matches = scanner.searchInText(matcher, scanner.fileContent(fileName))
+        matchCount += len(matches)
+    return time.perf_counter() - start, matchCount
+
+
+def benchmark(title, regExp, fileNames):
+    literalMatcher = scanner.literalMatcher(regExp)
+    assert literalMatcher is not None, 'Not a literal pattern'
+
+    regExpTime, regExpCount = searchAll(fileNames, regExp, scanner.bytesRegExp(regExp))
+    literalTime, literalCount = searchAll(fileNames, literalMatcher, literalMatcher.encoded())
+    assert regExpCount == literalCount
+
+    print('%-40s regexp %6.3f s   literal %6.3f s   x%.1f   (%d matches)' %
+          (title, regExpTime, literalTime, regExpTime / literalTime, literalCount))
+
+
+def main():
+    fileCount = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    random.seed(1)
+    identifiers = ['%s_%s%d' % (random.choice(['get', 'set', 'is', 'make', 'on']),
+                                random.choice(['value', 'item', 'widget', 'path', 'text', 'index']),
+                                number)
+                   for number in range(3000)]
+
+    with tempfile.TemporaryDirectory() as path:
+        fileNames = generateTree(path, fileCount, identifiers)
+
+        benchmark('Single identifier', re.compile(re.escape(identifiers[42])), fileNames)
+        benchmark('Whole word', re.compile(r'\b%s\b' % re.escape(identifiers[42])), fileNames)
+        for count in (10, 100, 500):
+            pattern = '|'.join(re.escape(identifier) for identifier in identifiers[:count])
+            benchmark('Alternation of %d identifiers' % count, re.compile(pattern), fileNames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# ****************************************************************
+# bench_walk.py - Benchmark of the directory walker
+# ****************************************************************
+#
+# Compares the ``os.walk()`` loops, which were used to build list of the project files and list of files
+# for search in directory, with ``enki.lib.dirwalker.walk()`` on a generated tree. The tree is
+# in the OS cache, therefore the difference on a cold cache or on a network file system is larger.
+# Run from any directory::
+#
+#     python3 tests/benchmarks/bench_walk.py [directory count] [existing tree path]
+import os
+import os.path
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.lib.dirwalker import walk  # noqa: E402
+
+
+FILTER_RE = re.compile(r'(\.git$)|(.*\.pyc$)|(__pycache__$)')
+
+
+def generateTree(path, dirCount):
+    random.seed(0)
+    dirs = ['']
+    for index in range(dirCount):
+        relDir = os.path.join(random.choice(dirs), 'dir%05d' % index)
+        os.mkdir(os.path.join(path, relDir))
+        dirs.append(relDir)
+        for fileIndex in range(random.randint(5, 30)):
+            extension = random.choice(['.py', '.pyc', '.txt', '.c'])
+            open(os.path.join(path, relDir, 'file%02d%s' % (fileIndex, extension)), 'w').close()
+
+
+def osWalkProject(path):
+    files = []
+    for root, dirs, fileNames in os.walk(path):
+        relRoot = os.path.relpath(root, path)
+        dirs[:] = [name for name in dirs if not FILTER_RE.match(name)]
+        files.extend(os.path.join(relRoot, name) for name in fileNames if not FILTER_RE.match(name))
+    return len(files)
+
+
+def osWalkSearch(path):
+    files = []
+    for root, dirs, fileNames in os.walk(path, followlinks=True):
+        dirs[:] = [name for name in dirs if not FILTER_RE.match(name)]
+        for fileName in fileNames:
+            if fileName.startswith('.') or FILTER_RE.match(fileName):
+                continue
+            if not os.path.isfile(os.path.join(root, fileName)):
+                continue
+            files.append(root + os.path.sep + fileName)
+    return len(files)
+
+
+def walkerProject(path, workerCount):
+    count = 0
+    for batch in walk(path, FILTER_RE, cachedDirs={}, workerCount=workerCount):
+        count += sum(len(directory.fileNames) for directory in batch)
+    return count
+
+
+def walkerSearch(path, workerCount):
+    files = []
+    for batch in walk(path, FILTER_RE, followLinks=True, regularFilesOnly=True, skipHidden=True,
+                      workerCount=workerCount):
+        for directory in batch:
+            root = os.path.join(path, directory.relPath)
+            files.extend(os.path.join(root, name) for name in directory.fileNames)
+    return len(files)
+
+
+def measure(title, function, *args):
+    bestTime = None
+    for _ in range(3):
+        start = time.perf_counter()
+        count = function(*args)
+        elapsed = time.perf_counter() - start
+        bestTime = elapsed if bestTime is None else min(bestTime, elapsed)
+    print('%-40s %7.3f s   (%d files)' % (title, bestTime, count))
+    return count
+
+
+def benchmark(path):
+    expected = measure('os.walk, project scan', osWalkProject, path)
+    for workerCount in (1, 8):
+        count = measure('walker, project scan, %d thread(s)' % workerCount, walkerProject, path, workerCount)
+        assert count == expected
+
+    expected = measure('os.walk + isfile, search in directory', osWalkSearch, path)
+    for workerCount in (1, 8):
+        count = measure('walker, search in directory, %d thread(s)' % workerCount,
+                        walkerSearch, path, workerCount)
+        assert count == expected
+
+
+def main():
+    dirCount = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    if len(sys.argv) > 2:
+        benchmark(sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as path:
+            generateTree(path, dirCount)
+            benchmark(path)
+
+
+if __name__ == '__main__':
+    main()
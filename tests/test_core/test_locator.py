@@ -4,12 +4,16 @@ import unittest
 
 import os.path
 import sys
+import time
 
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
 sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
 
 # Import this to set the SIP API correctly. It is otherwise not used in these
 # tests.
-from enki.core.locator import splitLine
+import base
+
+from enki.core.locator import splitLine, AbstractCompleter, CompleterTimings, _CompleterLoaderThread
 
 
 class Test(unittest.TestCase):
@@ -31,5 +35,78 @@ class Test(unittest.TestCase):
         self.assertEqual(splitLine('\\x'), ['x'])
 
 
+class _SlowCompleter(AbstractCompleter):
+    mustBeLoaded = True
+
+    def __init__(self, count, delay):
+        self._count = count
+        self._delay = delay
+        self.items = []
+
+    def load(self, stopEvent):
+        for item in range(self._count):
+            if stopEvent.is_set():
+                return
+            time.sleep(self._delay)
+            self.items.append(item)
+            self.publishPartialResults(self._snapshot)
+
+    def _snapshot(self):
+        snapshot = _SlowCompleter(0, 0)
+        snapshot.items = list(self.items)
+        return snapshot
+
+    def rowCount(self):
+        return len(self.items)
+
+
+class _Command:
+    pass
+
+
+class LoaderThreadTest(base.TestCase):
+
+    def setUp(self):
+        base.TestCase.setUp(self)
+        self.loaded = []
+        self.partial = []
+        self.timings = CompleterTimings()
+        self.thread = _CompleterLoaderThread(self, self.timings)
+
+    def tearDown(self):
+        self.thread.terminate()
+        base.TestCase.tearDown(self)
+
+    def onCompleterLoaded(self, command, completer):
+        self.loaded.append(completer)
+
+    def onCompleterPartiallyLoaded(self, command, snapshot):
+        self.partial.append(snapshot)
+
+    def test_supersede(self):
+        """ A new completer stops the previous one without waiting. Only the last one is delivered
+        """
+        slow = _SlowCompleter(1000, 0.01)
+        self.thread.loadCompleter(_Command(), slow)
+        self.waitUntilPassed(2000, lambda: self.assertTrue(self.partial))
+
+        start = time.time()
+        fast = _SlowCompleter(3, 0)
+        self.thread.loadCompleter(_Command(), fast)
+        self.assertLess(time.time() - start, 0.1)
+
+        self.waitUntilPassed(2000, lambda: self.assertEqual(self.loaded, [fast]))
+        self.assertEqual(list(self.timings.summary().keys()), ['_Command'])
+        self.assertEqual(self.timings.summary()['_Command']['count'], 1)
+
+    def test_cancel(self):
+        self.thread.loadCompleter(_Command(), _SlowCompleter(20, 0.01))
+        self.thread.cancel()
+        base._processPendingEvents()
+        time.sleep(0.3)
+        base._processPendingEvents()
+        self.assertEqual(self.loaded, [])
+
+
 if __name__ == '__main__':
     unittest.main()
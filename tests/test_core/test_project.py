@@ -3,7 +3,9 @@
 import unittest
 
 import os.path
+import shutil
 import sys
+import tempfile
 
 sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
 sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
@@ -12,7 +14,9 @@ sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."
 # tests.
 import base
 
+import enki.core.defines
 from enki.core.core import core
+from enki.core.filelistcache import FileListCache
 
 
 PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'enki'))
@@ -20,6 +24,10 @@ PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..',
 
 class Test(base.TestCase):
 
+    def setUp(self):
+        shutil.rmtree(os.path.join(enki.core.defines.CONFIG_DIR, 'projectfiles'), ignore_errors=True)
+        base.TestCase.setUp(self)
+
     def test_1(self):
         """ Parse words
         """
@@ -48,6 +56,84 @@ class Test(base.TestCase):
         self.assertEqual(proj.path(), newPath)
         self.assertEqual(proj.files(), None)
 
+    def test_files_from_cache(self):
+        """ Files of the previous scan are available immediately, and revalidated
+        """
+        with tempfile.TemporaryDirectory() as projPath:
+            os.makedirs(os.path.join(projPath, 'sub'))
+            for path in ('a.txt', os.path.join('sub', 'b.txt')):
+                open(os.path.join(projPath, path), 'w').close()
+
+            proj = core.project()
+            proj.open(projPath)
+            proj.startLoadingFiles()
+            self.waitUntilPassed(5000, lambda: self.assertIsNotNone(proj.files()))
+            self.waitUntilPassed(5000, lambda: self.assertFalse(proj.isScanning()))
+
+            proj.open(os.path.dirname(projPath))
+            proj.open(projPath)
+            self.assertEqual(sorted(proj.files()), ['a.txt', os.path.join('sub', 'b.txt')])
+
+            open(os.path.join(projPath, 'sub', 'c.txt'), 'w').close()
+            proj.startLoadingFiles()
+            self.waitUntilPassed(5000, lambda: self.assertEqual(len(proj.files()), 3))
+
+    def test_files_changed(self):
+        """ Created and removed files are applied to the list of the scanned project
+        """
+        with tempfile.TemporaryDirectory() as projPath:
+            os.makedirs(os.path.join(projPath, 'sub'))
+            open(os.path.join(projPath, 'a.txt'), 'w').close()
+
+            proj = core.project()
+            proj.open(projPath)
+            proj.startLoadingFiles()
+            self.waitUntilPassed(5000, lambda: self.assertFalse(proj.isScanning()))
+            self.assertEqual(proj.files(), ['a.txt'])
+
+            changes = []
+            proj.filesChanged.connect(lambda added, removed: changes.append((added, removed)))
+
+            open(os.path.join(projPath, 'sub', 'b.txt'), 'w').close()
+            self.waitUntilPassed(5000, lambda: self.assertEqual(changes, [([os.path.join('sub', 'b.txt')], [])]))
+
+            os.rename(os.path.join(projPath, 'sub'), os.path.join(projPath, 'moved'))
+            self.waitUntilPassed(5000, lambda: self.assertEqual(len(changes), 2))
+            self.assertEqual(changes[1], ([os.path.join('moved', 'b.txt')], [os.path.join('sub', 'b.txt')]))
+            self.assertEqual(sorted(proj.files()), ['a.txt', os.path.join('moved', 'b.txt')])
+
+    def test_ignore_files(self):
+        """ Files, ignored by .gitignore, are excluded, if the option is enabled for the project
+        """
+        with tempfile.TemporaryDirectory() as projPath:
+            os.makedirs(os.path.join(projPath, 'build'))
+            for path in ('a.txt', 'b.log', os.path.join('build', 'c.txt')):
+                open(os.path.join(projPath, path), 'w').close()
+            with open(os.path.join(projPath, '.gitignore'), 'w') as ignoreFile:
+                ignoreFile.write('build/\n*.log\n')
+
+            proj = core.project()
+            proj.open(projPath)
+            self.assertTrue(proj.useIgnoreFiles())
+            proj.startLoadingFiles()
+            self.waitUntilPassed(5000, lambda: self.assertEqual(proj.files(), ['a.txt']))
+
+            proj.setUseIgnoreFiles(False)
+            proj.startLoadingFiles()
+            self.waitUntilPassed(5000, lambda: self.assertEqual(len(proj.files() or []), 3))
+
+
+class FileListCacheTest(unittest.TestCase):
+
+    def test_files_order(self):
+        cache = FileListCache('/proj')
+        cache.dirs = {'': (1, ['a', 'b'], ['x', 'y']),
+                      'x': (2, ['c'], ['z']),
+                      os.path.join('x', 'z'): (None, ['d'], []),
+                      'y': (3, ['e'], [])}
+        self.assertEqual(cache.files(),
+                         ['a', 'b', os.path.join('x', 'c'), os.path.join('x', 'z', 'd'), os.path.join('y', 'e')])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import os
+import os.path
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.lib.dirwalker import walk
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self.root = self._tmpDir.name
+        for relPath in ('a.txt', 'b.pyc', '.hidden', 'sub/c.txt', 'sub/deep/d.txt',
+                        'sub/.git/config', 'other/e.txt', 'other/f.pyc'):
+            absPath = os.path.join(self.root, relPath)
+            os.makedirs(os.path.dirname(absPath), exist_ok=True)
+            with open(absPath, 'w') as file_:
+                file_.write('text')
+        os.symlink(os.path.join(self.root, 'other'), os.path.join(self.root, 'link'))
+        os.mkfifo(os.path.join(self.root, 'fifo'))
+
+    def tearDown(self):
+        self._tmpDir.cleanup()
+
+    def _walkedFiles(self, **kwargs):
+        files = set()
+        for batch in walk(self.root, **kwargs):
+            for directory in batch:
+                files.update(os.path.join(directory.relPath, name) for name in directory.fileNames)
+        return files
+
+    def test_same_as_os_walk(self):
+        expected = set()
+        for root, _dirs, files in os.walk(self.root):
+            relRoot = os.path.relpath(root, self.root)
+            expected.update(os.path.normpath(os.path.join(relRoot, name)) for name in files)
+
+        for workerCount in (1, 4):
+            self.assertEqual(self._walkedFiles(workerCount=workerCount), expected)
+
+    def test_options(self):
+        files = self._walkedFiles(filterRe=re.compile(r'.*\.pyc$'),
+                                  followLinks=True, regularFilesOnly=True, skipHidden=True)
+        self.assertEqual(files, {'a.txt', 'sub/c.txt', 'sub/deep/d.txt', 'other/e.txt', 'link/e.txt'})
+
+    def test_cached_dirs(self):
+        """ Directories with the same mtime are not listed again
+        """
+        cachedDirs = {}
+        for batch in walk(self.root, cachedDirs={}):
+            for directory in batch:
+                self.assertIsNotNone(directory.mtime)
+                cachedDirs[directory.relPath] = (directory.mtime, ['cached'], directory.dirNames)
+
+        files = self._walkedFiles(cachedDirs=cachedDirs)
+        self.assertIn('sub/deep/cached', files)
+        self.assertNotIn('sub/deep/d.txt', files)
+
+    def test_stop(self):
+        walked = []
+        for batch in walk(self.root, shouldStop=lambda: bool(walked), workerCount=1):
+            walked.append(batch)
+        self.assertEqual(len(walked), 1)
+
+        walker = walk(self.root)
+        next(walker)
+        walker.close()  # doesn't hang
+
+
+if __name__ == '__main__':
+    unittest.main()
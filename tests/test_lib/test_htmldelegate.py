@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import os.path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+import base  # creates QApplication
+
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QTreeView
+
+from enki.lib.htmldelegate import HTMLDelegate, _isPlainText
+
+
+class Test(unittest.TestCase):
+
+    def test_plain_text(self):
+        self.assertTrue(_isPlainText('core/workspace.py'))
+        self.assertTrue(_isPlainText('a b'))
+        self.assertFalse(_isPlainText('<b>a</b>'))
+        self.assertFalse(_isPlainText('a&amp;b'))
+        self.assertFalse(_isPlainText('a  b'))
+        self.assertFalse(_isPlainText(' a'))
+        self.assertFalse(_isPlainText('a\tb'))
+
+    def test_cache(self):
+        """ Documents are reused, the cache is dropped, when the view font changes
+        """
+        view = QTreeView()
+        delegate = HTMLDelegate(view)
+        doc, size = delegate._document('<b>bold</b>')
+        self.assertIs(delegate._document('<b>bold</b>')[0], doc)
+        self.assertEqual(doc.toPlainText(), 'bold')
+
+        view.setFont(QFont('Sans', 30))
+        self.assertIsNot(delegate._document('<b>bold</b>')[0], doc)
+
+    def test_cache_size(self):
+        delegate = HTMLDelegate()
+        for index in range(HTMLDelegate._CACHE_SIZE + 10):
+            delegate._document(str(index))
+        self.assertEqual(len(delegate._documents), HTMLDelegate._CACHE_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
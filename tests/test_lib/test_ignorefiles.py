@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import os
+import os.path
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.lib.dirwalker import walk
+from enki.lib.ignorefiles import IgnoreRules, parseRules
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self.root = self._tmpDir.name
+        os.makedirs(os.path.join(self.root, '.git', 'info'))
+
+    def tearDown(self):
+        self._tmpDir.cleanup()
+
+    def _write(self, relPath, text=''):
+        absPath = os.path.join(self.root, relPath)
+        os.makedirs(os.path.dirname(absPath), exist_ok=True)
+        with open(absPath, 'w') as file_:
+            file_.write(text)
+
+    def _files(self, relRoot=''):
+        root = os.path.join(self.root, relRoot)
+        files = set()
+        for batch in walk(root, ignoreRules=IgnoreRules(root)):
+            for directory in batch:
+                files.update(os.path.join(directory.relPath, name) for name in directory.fileNames)
+        return {name for name in files if not os.path.basename(name).startswith('.')}
+
+    def test_parse(self):
+        rules = parseRules(['# comment', '', '!keep', 'dir/', '\\#hash', 'trailing   '])
+        self.assertEqual([(negated, dirOnly) for _text, negated, dirOnly in rules],
+                         [(True, False), (False, True), (False, False), (False, False)])
+
+    def test_rules(self):
+        self._write('.gitignore', 'build/\n*.log\n!keep.log\n/top.txt\ndocs/**/*.tmp\n**/gen\nfoo[0-9].c\n')
+        self._write('.git/info/exclude', 'secret\n')
+        self._write('a/.gitignore', '*.dat\n!b/ok.dat\n')
+        self._write('a/b/.ignore', 'x.txt\n')
+        for relPath in ('build/o.o', 'x.log', 'a/keep.log', 'top.txt', 'a/top.txt', 'docs/q/w.tmp', 'docs/w.txt',
+                        'a/b/ok.dat', 'a/b/no.dat', 'a/b/x.txt', 'a/x.txt', 'gen/g.c', 'a/gen/g.c',
+                        'foo1.c', 'fooa.c', 'secret', 'a/secret'):
+            self._write(relPath)
+
+        self.assertEqual(self._files(),
+                         {'a/keep.log', 'a/top.txt', 'docs/w.txt', 'a/b/ok.dat', 'a/x.txt', 'fooa.c'})
+
+    def test_rules_of_parent_directories(self):
+        """ Rules of the repository root are applied, when a subdirectory is walked
+        """
+        self._write('.gitignore', 'a/b/*.c\n*.o\n')
+        for relPath in ('a/b/x.c', 'a/b/x.h', 'a/b/x.o', 'a/c/x.c'):
+            self._write(relPath)
+
+        self.assertEqual(self._files('a'), {'b/x.h', 'c/x.c'})
+
+
+if __name__ == '__main__':
+    unittest.main()
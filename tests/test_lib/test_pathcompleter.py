@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import os
+import os.path
+import re
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.lib.pathcompleter import _DirectoryListingCache, iterGlob
+
+
+class ListingCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self.root = self._tmpDir.name
+        os.mkdir(os.path.join(self.root, 'sub'))
+        open(os.path.join(self.root, 'a.txt'), 'w').close()
+        os.symlink(os.path.join(self.root, 'sub'), os.path.join(self.root, 'link'))
+        self._makeOld()
+
+    def tearDown(self):
+        self._tmpDir.cleanup()
+
+    def _makeOld(self):
+        oldTime = time.time() - 100
+        os.utime(self.root, (oldTime, oldTime))
+
+    def test_listing(self):
+        cache = _DirectoryListingCache()
+        listing = cache.listing(self.root)
+        self.assertEqual(listing, {'sub': True, 'a.txt': False, 'link': True})
+        self.assertIs(cache.listing(self.root), listing)
+
+        self.assertTrue(cache.isDirectory(os.path.join(self.root, 'sub')))
+        self.assertFalse(cache.isDirectory(os.path.join(self.root, 'a.txt')))
+        self.assertFalse(cache.isDirectory(os.path.join(self.root, 'missing')))
+
+        self.assertRaises(FileNotFoundError, cache.listing, os.path.join(self.root, 'missing'))
+        self.assertRaises(NotADirectoryError, cache.listing, os.path.join(self.root, 'a.txt'))
+
+    def test_revalidation(self):
+        """ Expired listing is reused, if the directory mtime is the same
+        """
+        cache = _DirectoryListingCache()
+        cache._TRUST_TIME = 0
+        listing = cache.listing(self.root)
+        self.assertIs(cache.listing(self.root), listing)
+
+        open(os.path.join(self.root, 'b.txt'), 'w').close()
+        self.assertIn('b.txt', cache.listing(self.root))
+
+
+class GlobTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpDir = tempfile.TemporaryDirectory()
+        self.root = self._tmpDir.name
+        for relPath in ('a.py', 'b.txt', '.hidden.py', 'sub/c.py', 'sub/deep/d.py', 'sub/build/e.py',
+                        '.git/f.py'):
+            absPath = os.path.join(self.root, relPath)
+            os.makedirs(os.path.dirname(absPath), exist_ok=True)
+            open(absPath, 'w').close()
+
+    def tearDown(self):
+        self._tmpDir.cleanup()
+
+    def _glob(self, pattern, filterRe=None):
+        return [(os.path.relpath(path, self.root), isDir)
+                for path, isDir in iterGlob(os.path.join(self.root, pattern), filterRe)]
+
+    def test_glob(self):
+        self.assertEqual(self._glob('*'), [('a.py', False), ('b.txt', False), ('sub', True)])
+        self.assertEqual(self._glob('.h*'), [('.hidden.py', False)])
+        self.assertEqual(self._glob('s*/*.py'), [('sub/c.py', False)])
+        self.assertEqual(self._glob('sub/deep'), [('sub/deep', True)])
+
+    def test_recursive(self):
+        """ ** matches any count of directories. Filtered directories are not walked
+        """
+        self.assertEqual(self._glob('**/*.py'),
+                         [('a.py', False), ('sub/c.py', False), ('sub/build/e.py', False), ('sub/deep/d.py', False)])
+        self.assertEqual(self._glob('**/*.py', re.compile('^build$')),
+                         [('a.py', False), ('sub/c.py', False), ('sub/deep/d.py', False)])
+        self.assertEqual(self._glob('sub/**/d*'), [('sub/deep', True), ('sub/deep/d.py', False)])
+
+    def test_stop(self):
+        stopEvent = threading.Event()
+        stopEvent.set()
+        self.assertEqual(list(iterGlob(os.path.join(self.root, '**/*'), stopEvent=stopEvent)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# .. -*- coding: utf-8 -*-
+#
+# ************************************
+# test_alignment_map.py - Unit testing
+# ************************************
+#
+# Imports
+# =======
+# Library imports
+# ---------------
+import unittest
+import os.path
+import sys
+#
+# Local application imports
+# -------------------------
+# Insert path to base before importing.
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+import base
+# Base will insert path to enki, so its modules that we want to test can now be
+# imported.
+from enki.plugins.preview.alignment_map import AlignmentMap
+#
+# Test data
+# =========
+# A ReST-like source and the plain text it renders to. The words are numbered,
+# so that most strings occur once.
+WORDS = ['word%d' % index for index in range(200)]
+SOURCE = ' '.join('**%s**' % word if index % 7 == 0 else word
+                  for index, word in enumerate(WORDS))
+TARGET = ' '.join(WORDS)
+#
+# Tests for AlignmentMap
+# ======================
+class TestAlignmentMap(unittest.TestCase):
+    # Every index in the source text is mapped to the corresponding index in
+    # the target text.
+    def test_1(self):
+        alignmentMap = AlignmentMap(SOURCE, TARGET)
+        for word in ('word1', 'word8', 'word150', 'word199'):
+            self.assertEqual(alignmentMap.sourceToTarget(SOURCE.index(word) + 2),
+                             TARGET.index(word) + 2)
+            self.assertEqual(alignmentMap.targetToSource(TARGET.index(word) + 2),
+                             SOURCE.index(word) + 2)
+
+    # An index inside markup, which isn't rendered, is mapped next to the
+    # rendered text.
+    def test_2(self):
+        alignmentMap = AlignmentMap(SOURCE, TARGET)
+        # Place the index between ``**`` and ``word14**``.
+        index = alignmentMap.sourceToTarget(SOURCE.index('word14'))
+        self.assertEqual(index, TARGET.index('word14'))
+        # Place the index between ``**word14*`` and ``*``.
+        index = alignmentMap.sourceToTarget(SOURCE.index('word14') + 7)
+        self.assertEqual(index, TARGET.index('word14') + 6)
+
+    # A long stretch of text without a counterpart isn't mapped.
+    def test_3(self):
+        alignmentMap = AlignmentMap('=' * 1000 + SOURCE, TARGET)
+        self.assertIsNone(alignmentMap.sourceToTarget(500))
+        self.assertEqual(alignmentMap.sourceToTarget(1000 + SOURCE.index('word100')),
+                         TARGET.index('word100'))
+
+    # A map of edited texts reuses the old map, and gives the same results as a
+    # new map.
+    def test_4(self):
+        oldMap = AlignmentMap(SOURCE, TARGET)
+        source = SOURCE.replace('word100', 'new text')
+        target = TARGET.replace('word100', 'new text')
+        alignmentMap = AlignmentMap(source, target, oldMap)
+        for word in ('word1', 'word99', 'new text', 'word101', 'word199'):
+            self.assertEqual(alignmentMap.sourceToTarget(source.index(word) + 1),
+                             target.index(word) + 1)
+        self.assertEqual(alignmentMap._sourceStarts, AlignmentMap(source, target)._sourceStarts)
+
+    # Empty texts.
+    def test_5(self):
+        self.assertIsNone(AlignmentMap('', '').sourceToTarget(0))
+        self.assertIsNone(AlignmentMap('abc', '').sourceToTarget(1))
+#
+# Main
+# ====
+if __name__ == '__main__':
+    unittest.main()
@@ -37,6 +37,16 @@ class TestFindApproxText(unittest.TestCase):
         self.assertTrue(mo)
         self.assertEqual(mo.start(), 3)
         self.assertEqual(mo.end(), 4)
+
+    # A close match near the expected position is preferred to an exact match
+    # far from it.
+    def test_2(self):
+        targetText = 'abcdefgh' + '=' * 5000 + 'abcxefgh'
+        self.assertEqual(g(searchText='abcdefgh', targetText=targetText).start(), 0)
+        mo = g(searchText='abcdefgh', targetText=targetText,
+               expectedPosition=len(targetText) - 10)
+        self.assertTrue(mo)
+        self.assertEqual(mo.start(), 5008)
 #
 # Tests for findApproxTextInTarget
 # ================================
@@ -306,6 +316,15 @@ class TestRefineSearchResult(unittest.TestCase):
             targetText='for a list of supported languages.##language = None exclude_patterns: List of patterns, re')[1]
         self.assertEqual(string, 'a  o upte ngg.lnaexclude_patterns: List of patterns, re')
 
+    # Strings longer than a machine word, since table rows are stored as bits
+    # of an integer.
+    def test_10(self):
+        string = lcs(
+            searchAnchor=0, returnLcsString=True,
+            searchText='ab' * 100,
+            targetText='a-b' * 100)[1]
+        self.assertEqual(string, 'ab' * 100)
+
     # Bug during testing.
     def test_13(self):
         index = lcs(searchAnchor=30,
@@ -7,6 +7,7 @@ import unittest
 import os.path
 import os
 import sys
+import threading
 
 
 sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
@@ -17,6 +18,8 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtTest import QTest
 
 from enki.core.core import core
+from enki.plugins.fuzzyopen import packedpaths
+from enki.plugins.fuzzyopen.fuzzyindex import FuzzyIndex
 
 
 PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'enki'))
@@ -126,5 +129,61 @@ class Test(base.TestCase):
         self._waitFiles()
         self.assertFalse(core.project().isScanning())
 
+
+class FuzzyIndexTest(unittest.TestCase):
+    FILES = ['core/workspace.py', 'core/mainwindow.py', 'lib/Widgets.py', 'plugins/preview/preview.py',
+             'plugins/workspace_actions.py', 'tests/test_workspace.py']
+
+    def _search(self, index, pattern, openFiles=[], maxCount=3):
+        items = index.search(pattern, openFiles, maxCount, threading.Event())
+        return [path for path, _score, _indexes in items]
+
+    def test_search(self):
+        index = FuzzyIndex(self.FILES)
+        self.assertEqual(self._search(index, 'cowo'), ['core/workspace.py', 'core/mainwindow.py'])
+        self.assertEqual(self._search(index, 'W'), ['lib/Widgets.py'])
+        self.assertEqual(self._search(index, 'wo', ['core/mainwindow.py']),
+                         ['core/mainwindow.py', 'core/workspace.py', 'tests/test_workspace.py'])
+
+    def test_narrowing(self):
+        """ Growing pattern checks only files, which have matched the previous pattern
+        """
+        index = FuzzyIndex(self.FILES)
+        self._search(index, 'pre')
+        self.assertEqual(len(index._lastCandidates), 2)
+        self.assertEqual(self._search(index, 'prevw'), ['plugins/preview/preview.py'])
+        self.assertEqual(self._search(index, 'ws'), ['lib/Widgets.py', 'core/workspace.py', 'plugins/workspace_actions.py'])
+
+    def test_stop(self):
+        stopEvent = threading.Event()
+        stopEvent.set()
+        self.assertIsNone(FuzzyIndex(self.FILES).search('py', [], 3, stopEvent))
+
+    def test_first_files(self):
+        index = FuzzyIndex(self.FILES)
+        self.assertEqual(index.firstFiles(['lib/Widgets.py'], 3),
+                         ['lib/Widgets.py', 'core/workspace.py', 'core/mainwindow.py'])
+
+    @unittest.skipUnless(packedpaths.numpy, 'requires NumPy')
+    def test_packed_paths(self):
+        """ Vectorized search returns the same scores and indexes as the pure Python one
+        """
+        files = [os.path.join(dirName, fileName)
+                 for dirName in ('core', 'lib', 'plugins', 'tests', 'Ä')
+                 for fileName in ('workspace.py', 'Widgets.py', 'preview.py', 'wo', 'ö.txt')]
+        packedIndex = FuzzyIndex(files)
+        packedIndex._PACK_MIN_COUNT = 0
+        packedIndex._VECTORIZE_MIN_COUNT = 0
+        packedIndex._VECTORIZE_CHUNK_SIZE = 4
+        pythonIndex = FuzzyIndex(files)
+        pythonIndex._PACK_MIN_COUNT = len(files) + 1
+
+        for pattern in ('w', 'wo', 'wop', 'wopy', 'W', 'ä', 'äö', 'x', 'ws'):
+            for openFiles in ([], [os.path.join('lib', 'wo')]):
+                expected = pythonIndex.search(pattern, openFiles, 3, threading.Event())
+                self.assertEqual(packedIndex.search(pattern, openFiles, 3, threading.Event()), expected)
+        self.assertTrue(packedIndex._packed)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# .. -*- coding: utf-8 -*-
+#
+# *********************************
+# test_html_cache.py - Unit testing
+# *********************************
+#
+# Imports
+# =======
+# Library imports
+# ---------------
+import unittest
+import os.path
+import sys
+#
+# Local application imports
+# -------------------------
+# Insert path to base before importing.
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+import base
+# Base will insert path to enki, so its modules that we want to test can now be
+# imported.
+from enki.plugins.preview.html_cache import HtmlCache, htmlCacheKey
+#
+# Tests for HtmlCache
+# ===================
+class TestHtmlCache(unittest.TestCase):
+    # Results are found by the text and the settings.
+    def test_1(self):
+        cache = HtmlCache(10000)
+        key = htmlCacheKey('*text*', 'Markdown', '/a.md', False)
+        result = ('/a.md', '<em>text</em>', None, None)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, result)
+        self.assertIs(cache.get(htmlCacheKey('*text*', 'Markdown', '/a.md', False)),
+                      result)
+        self.assertIsNone(cache.get(htmlCacheKey('*text!*', 'Markdown', '/a.md', False)))
+        self.assertIsNone(cache.get(htmlCacheKey('*text*', 'Markdown', '/b.md', False)))
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    # The least recently used results are dropped to keep the size limit.
+    def test_2(self):
+        html = 'x' * 1000
+        cache = HtmlCache(3500)
+        for index in range(3):
+            cache.put(index, ('', html, None, None))
+        # Use the oldest result, so that the second one is dropped.
+        self.assertIsNotNone(cache.get(0))
+        cache.put(3, ('', html, None, None))
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get(1))
+        self.assertIsNotNone(cache.get(0))
+        self.assertIsNotNone(cache.get(3))
+
+    # A result larger than the cache isn't cached. Replacing a result doesn't
+    # count it twice.
+    def test_3(self):
+        cache = HtmlCache(3500)
+        cache.put(0, ('', 'x' * 5000, None, None))
+        self.assertEqual(len(cache), 0)
+        for index in range(10):
+            cache.put(1, ('', 'x' * 1000, None, None))
+        cache.put(2, ('', 'x' * 1000, None, None))
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertIsNone(cache.get(1))
+#
+# Main
+# ====
+if __name__ == '__main__':
+    unittest.main()
@@ -1173,6 +1173,65 @@ head
             self.assertIn(includeText, f.read())
 
 
+# AfterLoaded tests
+# =================
+# A page which answers ``toPlainText`` requests when told to.
+class FakePage(QObject):
+    loadStarted = pyqtSignal()
+    loadFinished = pyqtSignal(bool)
+
+    def __init__(self):
+        super().__init__()
+        self.text = ''
+        self.requests = []
+
+    def toPlainText(self, callback):
+        self.requests.append(callback)
+
+    def reply(self):
+        while self.requests:
+            self.requests.pop(0)(self.text)
+
+
+class TestAfterLoaded(unittest.TestCase):
+    def test_plain_text_cache(self):
+        """The plain text is fetched once per page load."""
+        from enki.plugins.preview.preview import AfterLoaded
+        page = FakePage()
+        afterLoaded = AfterLoaded(page)
+        results = []
+
+        page.loadStarted.emit()
+        page.text = 'one'
+        page.loadFinished.emit(True)
+        afterLoaded.plainText(results.append)
+        afterLoaded.plainText(results.append)
+        self.assertEqual(len(page.requests), 1)
+        page.reply()
+        afterLoaded.plainText(results.append)
+        self.assertEqual(results, ['one', 'one', 'one'])
+        self.assertEqual((afterLoaded.plainTextHits, afterLoaded.plainTextMisses), (2, 1))
+
+        # The next load invalidates the text.
+        page.loadStarted.emit()
+        page.text = 'two'
+        page.loadFinished.emit(True)
+        afterLoaded.plainText(results.append)
+        page.reply()
+        self.assertEqual(results[-1], 'two')
+        self.assertEqual(afterLoaded.plainTextMisses, 2)
+
+        # Text requested while loading isn't kept.
+        page.loadStarted.emit()
+        afterLoaded.plainText(results.append)
+        page.reply()
+        page.text = 'three'
+        page.loadFinished.emit(True)
+        afterLoaded.plainText(results.append)
+        page.reply()
+        self.assertEqual(results[-1], 'three')
+        self.assertEqual(afterLoaded.plainTextMisses, 4)
+
 
 #
 # Main
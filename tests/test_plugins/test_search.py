@@ -1,20 +1,30 @@
 #!/usr/bin/env python3
 
 import unittest
+import concurrent.futures
 import os
 import os.path
+import pickle
+import re
 import sys
 import platform
+import tempfile
 
 sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
 
 import base
 
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import QModelIndex, Qt, QTimer
 from PyQt5.QtTest import QTest
 
 from enki.core.core import core
 import enki.plugins.searchreplace
+from enki.plugins.searchreplace import highlighter
+from enki.plugins.searchreplace import replacer
+from enki.plugins.searchreplace import scanner
+from enki.plugins.searchreplace import searchcache
+from enki.plugins.searchreplace import searchresultsmodel
+from enki.plugins.searchreplace import trigramindex
 
 _TEXT = """middle_underscore
 abc ab4d a@cd8 a@
@@ -295,5 +305,348 @@ class Gui(base.TestCase):
             self.assertEqual(cbPath.currentText(), expected)
 
 
+class Scanner(unittest.TestCase):
+
+    def test_search_in_text(self):
+        matches = scanner.searchInText(re.compile('a(b)'), 'xyz\n  ab cd\nab')
+        self.assertEqual([(line, column, match.group(0), match.group(1), match.start())
+                          for line, column, match in matches],
+                         [(1, 2, 'ab', 'b', 6),
+                          (2, 0, 'ab', 'b', 12)])
+
+    def test_match_data_pickle(self):
+        match = scanner.MatchData.fromMatch(re.search('f(o)(x)?', 'a fo'))
+        restored = pickle.loads(pickle.dumps(match))
+        self.assertEqual((restored.start(), restored.end()), (2, 4))
+        self.assertEqual(restored.group(0), 'fo')
+        self.assertEqual(restored.groups(), ('o', None))
+        self.assertRaises(IndexError, restored.group, 3)
+
+    def test_search_in_files_with_process_pool(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            notOpenedFilePath = os.path.join(tempDir, 'file.txt')
+            with open(notOpenedFilePath, 'w') as file_:
+                file_.write('one\nfoo bar\n')
+
+            items = [(notOpenedFilePath, None),
+                     ('opened.txt', 'foo in the buffer'),
+                     ('empty.txt', 'nothing here')]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                results = executor.submit(scanner.searchInFiles, re.compile('foo'), items).result()
+
+        self.assertEqual([(fileName, [(line, column) for line, column, _ in matches])
+                          for fileName, matches in results],
+                         [(notOpenedFilePath, [(1, 0)]),
+                          ('opened.txt', [(0, 0)])])
+
+    def test_bytes_reg_exp(self):
+        self.assertIsNotNone(scanner.bytesRegExp(re.compile('def [a-z_]+\\(.*\\):')))
+        self.assertIsNotNone(scanner.bytesRegExp(re.compile(r'(?a)\bfoo\w*', re.IGNORECASE)))
+        # Might match non-ASCII characters or empty string
+        for pattern, flags in (('\\w+', 0),
+                               ('caf\u00e9', 0),
+                               ('a.b', 0),
+                               ('[^a]', 0),
+                               ('x*', 0),
+                               ('kill', re.IGNORECASE)):
+            self.assertIsNone(scanner.bytesRegExp(re.compile(pattern, flags)), pattern)
+
+    def test_search_in_mapped_file(self):
+        text = '\u00e9t\u00e9 foo\n\nfoo bar\u00e9 foo\nlast foo'
+        with tempfile.TemporaryDirectory() as tempDir:
+            path = os.path.join(tempDir, 'file.txt')
+            with open(path, 'wb') as file_:
+                file_.write(text.encode('utf8'))
+
+            regExp = re.compile('(f)oo.*')
+            expected = scanner.searchInText(regExp, text)
+            found = scanner.searchInMappedFile(scanner.bytesRegExp(regExp), path)
+
+        def summary(matches):
+            return [(line, column, match.start(), match.end(), match.group(0), match.groups())
+                    for line, column, match in matches]
+        self.assertEqual(summary(found), summary(expected))
+        self.assertEqual(len(found), 3)
+
+    def test_literal_matcher(self):
+        text = 'foobar foo_bar foo, bar \u00e9foo fo'
+        for pattern in ('foo', 'foo|foobar|bar', 'foobar|foo', r'\bfoo\b', r'\b(?:foo|bar)', 'fo[ox]|ba[rz]'):
+            regExp = re.compile(pattern)
+            matcher = scanner.literalMatcher(regExp)
+            self.assertIsNotNone(matcher, pattern)
+            self.assertEqual([(match.start(), match.end(), match.group(0)) for match in matcher.finditer(text)],
+                             [(match.start(), match.end(), match.group(0)) for match in regExp.finditer(text)],
+                             pattern)
+
+            encodedText = text.encode('utf8')
+            self.assertEqual([match.group(0) for match in matcher.encoded().finditer(encodedText)],
+                             [match.group(0).encode('utf8') for match in regExp.finditer(text)],
+                             pattern)
+
+        for pattern, flags in (('foo', re.IGNORECASE), ('(foo)', 0), ('fo+', 0), ('foo|', 0)):
+            self.assertIsNone(scanner.literalMatcher(re.compile(pattern, flags)), pattern)
+
+    def test_max_match_width(self):
+        self.assertEqual(scanner.maxMatchWidth(re.compile('ab{2,3}')), 5)
+        self.assertEqual(scanner.maxMatchWidth(re.compile('(?<=xy)a')), 4)
+        self.assertEqual(scanner.maxMatchWidth(scanner.literalMatcher(re.compile('foo|fooba'))), 6)
+        self.assertIsNone(scanner.maxMatchWidth(re.compile('a+')))
+
+    def test_search_in_large_file(self):
+        text = ''.join('line %d \u00e9t\u00e9 foo\n%s\n' % (index, 'x' * (index % 7))
+                       for index in range(100))
+        oldChunkSize = scanner.LARGE_FILE_CHUNK_SIZE
+        scanner.LARGE_FILE_CHUNK_SIZE = 50
+        try:
+            with tempfile.TemporaryDirectory() as tempDir:
+                path = os.path.join(tempDir, 'file.txt')
+                with open(path, 'wb') as file_:
+                    file_.write(text.encode('utf8'))
+
+                for pattern in ('(\\d+) .t', 'x+$', '(?m)x+$', 'foo|t\u00e9'):
+                    regExp = re.compile(pattern)
+                    expected = scanner.searchInText(regExp, text)
+                    for bytesRegExp in (None, scanner.bytesRegExp(regExp)):
+                        parts = list(scanner.searchInLargeFile(regExp, path, 20, bytesRegExp))
+                        if len(expected) > 1:  # came by parts
+                            self.assertGreater(len(parts), 1)
+                        found = [result for part in parts for result in part]
+                        self.assertEqual([(line, column, match.start(), match.end(), match.groups())
+                                          for line, column, match in found],
+                                         [(line, column, match.start(), match.end(), match.groups())
+                                          for line, column, match in expected],
+                                         pattern)
+        finally:
+            scanner.LARGE_FILE_CHUNK_SIZE = oldChunkSize
+
+    def test_file_lines(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            path = os.path.join(tempDir, 'file.txt')
+            with open(path, 'w') as file_:
+                file_.write('zero\none\ntwo\nthree')
+            self.assertEqual(scanner.fileLines(path, {1, 3, 7}), {1: 'one', 3: 'three'})
+
+
+class FileResults(unittest.TestCase):
+
+    def _fileResults(self):
+        matches = scanner.searchInText(re.compile('f(o+)'), 'foo\nxfo\n\nfooo')
+        return searchresultsmodel.FileResults('/base', '/base/file', matches)
+
+    def test_result(self):
+        fileRes = self._fileResults()
+        self.assertEqual(fileRes.count(), 3)
+        result = fileRes.result(1)
+        self.assertEqual((result.fileName, result.line, result.column), ('/base/file', 1, 1))
+        self.assertEqual((result.match.start(), result.match.end()), (5, 7))
+        self.assertEqual((result.match.group(0), result.match.group(1)), ('fo', 'o'))
+
+    def test_check_state(self):
+        fileRes = self._fileResults()
+        fileRes.setResultCheckState(0, Qt.Unchecked)
+        self.assertEqual(fileRes.checkState, Qt.PartiallyChecked)
+        self.assertEqual([result.line for result in fileRes.checkedResults()], [1, 3])
+
+        fileRes.setCheckState(Qt.Unchecked)
+        self.assertEqual(fileRes.checkedResults(), [])
+        fileRes.setResultCheckState(2, Qt.Checked)
+        fileRes.setResultCheckState(1, Qt.Checked)
+        fileRes.setResultCheckState(0, Qt.Checked)
+        self.assertEqual(fileRes.checkState, Qt.Checked)
+
+    def test_remove_rows(self):
+        fileRes = self._fileResults()
+        rows = fileRes.findRows([fileRes.result(2), fileRes.result(0)])
+        self.assertEqual(rows, [0, 2])
+        fileRes.removeRows(2, 1)
+        fileRes.removeRows(0, 1)
+        self.assertEqual(fileRes.count(), 1)
+        self.assertEqual(fileRes.result(0).match.group(0), 'fo')
+
+    def test_extend(self):
+        fileRes = self._fileResults()
+        fileRes.setResultCheckState(0, Qt.Unchecked)
+        fileRes.extend(self._fileResults())
+        self.assertEqual(fileRes.count(), 6)
+        self.assertEqual(fileRes.result(4).line, 1)
+        self.assertEqual(len(fileRes.checkedResults()), 5)
+        self.assertEqual(fileRes.checkState, Qt.PartiallyChecked)
+
+
+class SearchResultsModel(unittest.TestCase):
+
+    def _fileResults(self, fileName, text):
+        matches = scanner.searchInText(re.compile('x'), text)
+        return searchresultsmodel.FileResults('/base', fileName, matches)
+
+    def test_parent_and_remove(self):
+        model = searchresultsmodel.SearchResultsModel(None)
+        model.appendResults([self._fileResults('/base/a', 'x'),
+                             self._fileResults('/base/b', 'xxxxxx')])
+        model.appendResults([self._fileResults('/base/c', 'xx')])
+        self.assertEqual(model.matchesCount(), 9)
+
+        fileIndex = model.index(2, 0, QModelIndex())
+        self.assertEqual(model.parent(model.index(1, 0, fileIndex)).row(), 2)
+
+        fileRes = model.fileResults[1]
+        model.onResultsHandledByReplaceThread('/base/b', [fileRes.result(row) for row in (0, 2, 3, 5)])
+        self.assertEqual([fileRes.result(row).match.start() for row in range(fileRes.count())], [1, 4])
+        self.assertEqual(model.matchesCount(), 5)
+
+        model.onResultsHandledByReplaceThread('/base/a', model.fileResults[0].checkedResults())
+        self.assertEqual([fileRes.fileName for fileRes in model.fileResults], ['/base/b', '/base/c'])
+        fileIndex = model.index(1, 0, QModelIndex())
+        self.assertEqual(model.parent(model.index(0, 0, fileIndex)).row(), 1)
+        self.assertEqual(model.matchesCount(), 4)
+
+    def test_append_parts_of_file(self):
+        model = searchresultsmodel.SearchResultsModel(None)
+        model.appendResults([self._fileResults('/base/a', 'x'),
+                             self._fileResults('/base/big', 'xx')])
+        model.appendResults([self._fileResults('/base/big', 'xxx'),
+                             self._fileResults('/base/c', 'x')])
+        self.assertEqual([fileRes.fileName for fileRes in model.fileResults],
+                         ['/base/a', '/base/big', '/base/c'])
+        fileIndex = model.index(1, 0, QModelIndex())
+        self.assertEqual(model.rowCount(fileIndex), 5)
+        self.assertEqual(model.matchesCount(), 7)
+
+
+class Replacer(unittest.TestCase):
+
+    def _results(self, pattern, text):
+        return [searchresultsmodel.Result('file', line, column, match)
+                for line, column, match in scanner.searchInText(re.compile(pattern), text)]
+
+    def test_do_replacements(self):
+        text = 'a1 b22 c333'
+        results = self._results('([a-z])(\\d+)', text)
+        self.assertEqual(replacer.doReplacements(text, results, '\\2\\1'),
+                         '1a 22b 333c')
+        self.assertEqual(replacer.doReplacements(text, results[::-2], '-'),
+                         '- b22 -')
+
+    def test_replace_in_file(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            path = os.path.join(tempDir, 'file.txt')
+            with open(path, 'w') as file_:
+                file_.write('foo bar foo')
+            os.chmod(path, 0o640)
+
+            results = self._results('foo', 'foo bar foo')
+            self.assertEqual(replacer.replaceInFile(path, results, 'baz'), (True, None))
+
+            with open(path) as file_:
+                self.assertEqual(file_.read(), 'baz bar baz')
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+            self.assertEqual(os.listdir(tempDir), ['file.txt'])  # temporary file has been renamed
+
+            handled, error = replacer.replaceInFile(os.path.join(tempDir, 'missing.txt'), results, 'baz')
+            self.assertFalse(handled)
+            self.assertIsNotNone(error)
+
+
+class SearchCache(unittest.TestCase):
+
+    def test_reuse_not_changed_files(self):
+        cache = searchcache.SearchCache()
+        regExp = re.compile('foo')
+        with tempfile.TemporaryDirectory() as tempDir:
+            key = cache.searchKey(regExp, ['*.txt'], tempDir)
+            path = os.path.join(tempDir, 'file.txt')
+            deletedPath = os.path.join(tempDir, 'deleted.txt')
+            for filePath in (path, deletedPath):
+                with open(filePath, 'w') as file_:
+                    file_.write('foo')
+
+            session = cache.session(key)
+            self.assertIsNone(session.matches(path, session.fileStat(path)))
+            session.store(path, session.fileStat(path), ['matches'])
+            session.store(deletedPath, session.fileStat(deletedPath), [])
+            session.save(complete=True)
+
+            os.unlink(deletedPath)
+            session = cache.session(key)
+            self.assertEqual(session.matches(path, session.fileStat(path)), ['matches'])
+            self.assertIsNone(session.matches(deletedPath, session.fileStat(deletedPath)))
+            session.save(complete=True)
+
+            self.assertIsNone(cache.session(cache.searchKey(regExp, [], tempDir)).matches(path, session.fileStat(path)))
+
+            with open(path, 'a') as file_:
+                file_.write(' bar')
+            session = cache.session(key)
+            self.assertIsNone(session.matches(path, session.fileStat(path)))
+
+
+class TrigramIndex(unittest.TestCase):
+
+    def test_required_trigrams(self):
+        self.assertEqual(trigramindex.requiredTrigrams(re.compile('Hello')),
+                         [{'hel', 'ell', 'llo'}])
+        self.assertEqual(trigramindex.requiredTrigrams(re.compile('foo.*bar|xyz')),
+                         [{'foo', 'bar'}, {'xyz'}])
+        self.assertEqual(trigramindex.requiredTrigrams(re.compile('(abc)?def')),
+                         [{'def'}])
+
+    def test_no_usable_literals(self):
+        for pattern in ('ab', '[a-z]+', 'foo|x', '(abc)*', r'\w+\d'):
+            self.assertIsNone(trigramindex.requiredTrigrams(re.compile(pattern)), pattern)
+
+    def test_ignore_case_equivalences(self):
+        """re treats dotless i as i, when ignores case. Index must not miss such matches
+        """
+        trigrams = trigramindex.requiredTrigrams(re.compile('this', re.IGNORECASE))
+        self.assertTrue(trigrams[0] <= trigramindex.textTrigrams('TH\u0131S'))
+
+    def test_candidates(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            files = []
+            for name, text in (('a.txt', 'def foo():\n    pass'),
+                               ('b.txt', 'bar = 1'),
+                               ('binary.bin', 'foo\0bar')):
+                path = os.path.join(tempDir, name)
+                with open(path, 'w') as file_:
+                    file_.write(text)
+                files.append(path)
+
+            index = trigramindex.TrigramIndex(tempDir)
+            self.assertTrue(index.update(files))
+            trigrams = trigramindex.requiredTrigrams(re.compile('FOO', re.IGNORECASE))
+            self.assertEqual(index.candidates(files, trigrams), files[:1])
+
+            with open(files[1], 'a') as file_:
+                file_.write('\nfoo = 2')
+            index.update(files)
+            self.assertEqual(index.candidates(files, trigrams), files[:2])
+
+            newFile = os.path.join(tempDir, 'new.txt')  # not indexed yet
+            self.assertEqual(index.candidates(files + [newFile], trigrams), files[:2] + [newFile])
+
+
+class Highlighter(unittest.TestCase):
+
+    def test_line_local(self):
+        for pattern in ('foo', r'\bfoo\b', 'a.b', '(?m)^a$', '[a-z]+', r'(?<=a)b', 'x*'):
+            self.assertTrue(highlighter.isLineLocal(re.compile(pattern)), pattern)
+        for pattern in (r'\s+', '(?s)a.b', '^a', 'a$', r'\Aa', 'a\nb', '[^a]', r'\W', r'\D'):
+            self.assertFalse(highlighter.isLineLocal(re.compile(pattern)), pattern)
+
+    def test_line_by_line_matches_whole_text(self):
+        lines = _TEXT.split('\n')
+        for pattern in (r'\w+', '(?m)^.', '(?m).$', 'a*', r'\b', '(?<!a)b'):
+            regExp = re.compile(pattern)
+            self.assertTrue(highlighter.isLineLocal(regExp))
+            wholeText = [(match.start(), match.end()) for match in regExp.finditer(_TEXT)]
+            lineByLine = []
+            pos = 0
+            for line in lines:
+                lineByLine.extend((pos + match.start(), pos + match.end())
+                                  for match in regExp.finditer(line))
+                pos += len(line) + 1
+            self.assertEqual(wholeText, lineByLine, pattern)
+
+
 if __name__ == '__main__':
     unittest.main()